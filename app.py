@@ -1,15 +1,25 @@
 import streamlit as st
 import json
 import os
-import pandas as pd
-import re
-import time
+import sys
 from datetime import datetime
 import uuid
 
+# Backend modules use flat imports (``services.*``); importing them through
+# ``backend.*`` as well would load them twice, with separate singletons
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+from services.job_service import analyse_property_rows
+from services.postcode_service import load_postcode_index
+
 # --- LOAD DATA ---
-postcode_df = pd.read_csv("postcode_to_datazone.csv")
-postcode_df["Postcode"] = postcode_df["Postcode"].str.strip().str.upper().str.replace(" ", "")
+@st.cache_resource
+def get_postcode_index():
+    # Built once per server process instead of on every script rerun
+    return load_postcode_index("postcode_to_datazone.csv")
+
+postcode_index = get_postcode_index()
 
 # --- SESSION STATE INIT ---
 if "user_logged_in" not in st.session_state:
@@ -273,9 +283,7 @@ if st.session_state.show_form:
         elif bedrooms == "Select" or bathrooms == "Select":
             st.warning("Please select bedrooms and bathrooms.")
         else:
-            postcode_clean = re.sub(r"\s+", "", postcode.strip().upper())
-            dz_match = postcode_df[postcode_df["Postcode"] == postcode_clean]
-            dz_code = dz_match.iloc[0]["DataZone2011Code"] if not dz_match.empty else None
+            dz_code = postcode_index.lookup(postcode)
 
             prop = {
                 "timestamp": datetime.now().isoformat(),
@@ -341,13 +349,25 @@ if st.session_state.show_form:
 if "analyse_now" in st.session_state and st.session_state.analyse_now and st.session_state.property_list:
     st.info("🔍 Analysing all your properties. Please give us a moment...")
     progress = st.progress(0)
-    for i in range(1, 101):
-        time.sleep(0.01)
-        progress.progress(i)
+    # Large lists are analysed in chunks on the backend's job worker
+    # processes; the bar advances as each chunk finishes
+    analysis = analyse_property_rows(
+        st.session_state.property_list, on_progress=lambda done: progress.progress(done)
+    )
     user_dir = os.path.join("data", st.session_state.user_name.replace(" ", "_"), "batch")
     os.makedirs(user_dir, exist_ok=True)
-    batch_file = f"all_properties_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    with open(os.path.join(user_dir, batch_file), "w") as f:
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    with open(os.path.join(user_dir, f"all_properties_{timestamp}.json"), "w") as f:
         json.dump(st.session_state.property_list, f, indent=4)
-    st.success("✅ Analysis complete. Your results will appear here soon.")
+    with open(os.path.join(user_dir, f"analysis_{timestamp}.json"), "w") as f:
+        json.dump(analysis.model_dump(), f, indent=4)
+    st.success("✅ Analysis complete.")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Average EPC", analysis.avg_epc_rating or "n/a")
+    col2.metric("Investment score", analysis.investment_score)
+    col3.metric("Risk", analysis.risk_assessment)
+    if analysis.total_value_estimate is not None:
+        st.write(f"Estimated portfolio value: £{analysis.total_value_estimate:,.0f}")
+    for recommendation in analysis.recommendations:
+        st.write(f"- {recommendation}")
     st.session_state.analyse_now = False
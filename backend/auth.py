@@ -1,15 +1,43 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Set
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
+from sqlalchemy import event, inspect
+from models import User
+import asyncio
 import os
+import threading
+import time
 
 # Security configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Token -> user cache; bounds are per process
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+
+# Threads reserved for bcrypt; bounds how many CPU-heavy hashes run at once
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+
+# Accounts allowed to run global maintenance (dataset reloads, stats rebuilds);
+# defaults to the development admin when that account is created at startup
+def _default_admin_emails() -> str:
+    if os.getenv("ENABLE_DEFAULT_ADMIN", "true").lower() in {"1", "true", "yes"}:
+        return os.getenv("DEFAULT_ADMIN_EMAIL", "admin@local.com")
+    return ""
+
+ADMIN_EMAILS = {
+    email.strip().lower()
+    for email in os.getenv("ADMIN_EMAILS", _default_admin_emails()).split(",")
+    if email.strip()
+}
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -18,6 +46,22 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+# bcrypt is deliberately slow (~50-250 ms per call). Running it on the event
+# loop stalls every other request on the worker, and running it on the shared
+# request threadpool lets a login storm starve DB endpoints of threads, so it
+# gets its own small pool and excess logins queue here instead.
+password_hash_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_hash_executor, verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_hash_executor, get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -29,7 +73,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str) -> str:
+def decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
@@ -38,9 +82,125 @@ def verify_token(token: str) -> str:
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials"
             )
-        return email
+        return payload
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials"
         )
+
+def verify_token(token: str) -> str:
+    return decode_token(token)["sub"]
+
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """Identity of the caller, detached from any DB session so it can be cached"""
+    id: int
+    email: str
+    full_name: str
+    is_active: bool
+
+    @property
+    def is_admin(self) -> bool:
+        return self.email.lower() in ADMIN_EMAILS
+
+    @classmethod
+    def from_user(cls, user: User) -> "AuthenticatedUser":
+        return cls(id=user.id, email=user.email, full_name=user.full_name, is_active=bool(user.is_active))
+
+
+class TokenCache:
+    """Thread-safe TTL + LRU cache of bearer token -> AuthenticatedUser.
+
+    Entries expire after ``ttl`` seconds or when the JWT itself expires,
+    whichever is sooner, and the least recently used entry is evicted once
+    ``max_size`` is reached.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tokens_by_email: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[AuthenticatedUser]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            user, expires_at = entry
+            if expires_at <= time.time():
+                self._remove(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return user
+
+    def put(self, token: str, user: AuthenticatedUser, token_expires_at: Optional[float] = None):
+        if self.max_size <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (user, expires_at)
+            self._tokens_by_email.setdefault(user.email, set()).add(token)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_user(self, email: str):
+        with self._lock:
+            for token in list(self._tokens_by_email.get(email, ())):
+                self._remove(token)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_email.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _remove(self, token: str):
+        user, _ = self._entries.pop(token)
+        tokens = self._tokens_by_email.get(user.email)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_email[user.email]
+
+
+token_cache = TokenCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL_SECONDS)
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_updated_user(mapper, connection, target):
+    # Covers deactivation and email changes made through the ORM
+    email_history = inspect(target).attrs.email.history
+    for email in {target.email, *(email_history.deleted or ())}:
+        token_cache.invalidate_user(email)
+
+
+@event.listens_for(User, "after_delete")
+def _invalidate_deleted_user(mapper, connection, target):
+    token_cache.invalidate_user(target.email)
@@ -0,0 +1,57 @@
+"""Dashboard refresh cost with and without the analysis cache.
+
+For one portfolio, times each report uncached, as a cache hit (memory and
+file backends) and the version lookup behind a ``304 Not Modified``.
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.common import sqlite_session, synthetic_properties, timed
+from models import Property
+from services.analysis_service import AnalysisService
+from services.cache_service import AnalysisCache, FileCacheBackend, MemoryCacheBackend
+from services.portfolio_service import portfolio_version, rebuild_portfolio_aggregates
+from services.property_service import PropertyService
+
+REPORTS = {
+    "analyze_portfolio": lambda db, cache: PropertyService(db, cache).analyze_portfolio(1),
+    "market_analysis": lambda db, cache: AnalysisService(db, cache).market_analysis(1),
+    "portfolio_optimization": lambda db, cache: AnalysisService(db, cache).portfolio_optimization(1),
+}
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    return min(timed(fn)[1] for _ in range(repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = sqlite_session(os.path.join(tmp, "cache.db"), "tuned")
+        db.execute(Property.__table__.insert(), synthetic_properties(args.rows).to_dict("records"))
+        rebuild_portfolio_aggregates(db)
+
+        caches = {
+            "memory": AnalysisCache(MemoryCacheBackend(64)),
+            "file": AnalysisCache(FileCacheBackend(os.path.join(tmp, "cache"))),
+        }
+        print(f"{args.rows:,} properties")
+        print(f"{'report':<24} {'uncached ms':>12} {'memory hit ms':>14} {'file hit ms':>12}")
+        for name, report in REPORTS.items():
+            uncached = best_of(lambda: report(db, AnalysisCache()))
+            hits = []
+            for cache in caches.values():
+                report(db, cache)
+                hits.append(best_of(lambda: report(db, cache), repeat=50))
+            print(f"{name:<24} {uncached * 1000:>12.2f} {hits[0] * 1000:>14.3f} {hits[1] * 1000:>12.3f}")
+        revalidate = best_of(lambda: portfolio_version(db, 1), repeat=50)
+        print(f"{'304 revalidation':<24} {'':>12} {revalidate * 1000:>14.3f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""API-process responsiveness while heavy analyses run.
+
+Times a loop of small keyset-page queries (what listing endpoints do) on
+its own, while ``--jobs`` full analyses run on threads inside the process
+(the old synchronous path), and while the same analyses run as background
+jobs on the worker processes.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+# Workers open their own engine from DATABASE_URL, so set it before any app
+# import; spawned workers re-import this module and must keep the parent's
+if "BENCH_ANALYSIS_JOBS_DIR" not in os.environ:
+    os.environ["BENCH_ANALYSIS_JOBS_DIR"] = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(os.environ['BENCH_ANALYSIS_JOBS_DIR'], 'jobs.db')}"
+
+from benchmarks.common import synthetic_properties  # noqa: E402
+from database import SessionLocal, engine  # noqa: E402
+from models import AnalysisJob, Base, Property  # noqa: E402
+from services.job_service import REPORTS, JOB_REPORTS, analysis_jobs, new_job, run_job  # noqa: E402
+from services.portfolio_service import rebuild_portfolio_aggregates  # noqa: E402
+from services.property_service import PropertyService  # noqa: E402
+from services.cache_service import analysis_cache  # noqa: E402
+
+
+def page_latencies(stop: threading.Event, minimum: int = 200):
+    db = SessionLocal()
+    latencies = []
+    try:
+        while not stop.is_set() or len(latencies) < minimum:
+            start = time.perf_counter()
+            PropertyService(db).get_properties_page(1, limit=50, after_id=(len(latencies) * 50) % 100_000)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        db.close()
+    return latencies
+
+
+def summary(label: str, latencies, seconds: float):
+    latencies = sorted(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{label:<22} {len(latencies):>8} {statistics.median(latencies) * 1000:>9.2f} {p99 * 1000:>9.2f} {seconds:>10.2f}")
+
+
+def run_inline(jobs: int):
+    def analyse(user_id: int):
+        db = SessionLocal()
+        try:
+            for name in JOB_REPORTS["full"]:
+                REPORTS[name](db, user_id, {})
+        finally:
+            db.close()
+    threads = [threading.Thread(target=analyse, args=(user_id,)) for user_id in range(1, jobs + 1)]
+    for thread in threads:
+        thread.start()
+    return lambda: [thread.join() for thread in threads]
+
+
+def run_queued(jobs: int):
+    db = SessionLocal()
+    futures = []
+    for user_id in range(1, jobs + 1):
+        job = new_job(user_id, "full")
+        db.add(job)
+        db.commit()
+        futures.append(analysis_jobs.submit(job.id))
+    db.close()
+    return lambda: [future.result() for future in futures]
+
+
+def measure(label: str, start_work):
+    analysis_cache.clear()
+    stop = threading.Event()
+    result = {}
+    sampler = threading.Thread(target=lambda: result.setdefault("latencies", page_latencies(stop)))
+    started = time.perf_counter()
+    sampler.start()
+    if start_work is None:
+        stop.set()
+    else:
+        wait = start_work()
+        wait()
+        stop.set()
+    sampler.join()
+    summary(label, result["latencies"], time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=400_000)
+    parser.add_argument("--jobs", type=int, default=4)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.execute(Property.__table__.insert(), synthetic_properties(args.rows, users=args.jobs).to_dict("records"))
+    rebuild_portfolio_aggregates(db)
+    db.close()
+
+    # Start the worker processes up front so spawn time is not counted
+    for future in [analysis_jobs.run(run_job, "warm-up") for _ in range(analysis_jobs.max_workers)]:
+        future.result()
+
+    print(f"{args.rows:,} properties over {args.jobs} users, {analysis_jobs.max_workers} job workers")
+    print(f"{'page queries while':<22} {'queries':>8} {'p50 ms':>9} {'p99 ms':>9} {'elapsed s':>10}")
+    measure("idle", None)
+    measure("analyses in-process", lambda: run_inline(args.jobs))
+    measure("analyses as jobs", lambda: run_queued(args.jobs))
+
+    db = SessionLocal()
+    statuses = [status for (status,) in db.query(AnalysisJob.status)]
+    db.close()
+    analysis_jobs.shutdown(wait=True)
+    print(f"jobs: {statuses.count('succeeded')} succeeded, {len(statuses) - statuses.count('succeeded')} other")
+    engine.dispose()
+    shutil.rmtree(os.environ["BENCH_ANALYSIS_JOBS_DIR"], ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Batch re-analysis throughput against worker count.
+
+Builds ``--users`` portfolios (``--properties`` each, with datazones and
+datazone stats), runs ``services.batch_analysis_service`` with 1, 2, 4, ...
+workers up to ``--max-workers`` and reports users per second and speedup
+over one worker. A sample of stored results is checked against
+``PropertyService.analyze_portfolio``. Speedup is bounded by the cores
+available (printed first) and, on SQLite, by the single-writer lock.
+"""
+import argparse
+import json
+import os
+import tempfile
+
+from benchmarks.common import postcode_frame, sqlite_session, synthetic_properties, timed
+from models import PortfolioAnalysisResult, Property, User
+from services.batch_analysis_service import run_batch_analysis
+from services.cache_service import AnalysisCache
+from services.datazone_service import rebuild_datazone_stats
+from services.property_service import PropertyService
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--properties", type=int, default=30, help="per user")
+    parser.add_argument("--max-workers", type=int, default=max(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    rows = args.users * args.properties
+    frame = synthetic_properties(rows, users=args.users)
+    datazones = postcode_frame().set_index("Postcode")["DataZone2011Code"]
+    frame["datazone"] = frame["postcode"].map(datazones)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "batch.db")
+        db = sqlite_session(path, "tuned")
+        db.execute(User.__table__.insert(), [
+            {"id": user_id, "email": f"user{user_id}@example.com", "full_name": "Bench", "hashed_password": "x"}
+            for user_id in range(1, args.users + 1)
+        ])
+        for start in range(0, rows, 100_000):
+            db.execute(Property.__table__.insert(), frame.iloc[start:start + 100_000].to_dict("records"))
+        db.commit()
+        rebuild_datazone_stats(db)
+
+        print(f"{args.users:,} users, {rows:,} properties, {os.cpu_count()} CPU(s)")
+        print(f"{'workers':>8} {'seconds':>9} {'users/s':>9} {'speedup':>8}")
+        workers, baseline, last_run = 1, None, None
+        while workers <= args.max_workers:
+            last_run, seconds = timed(run_batch_analysis, f"sqlite:///{path}", workers)
+            baseline = baseline or seconds
+            print(f"{workers:>8} {seconds:>9.2f} {last_run.users / seconds:>9.0f} {baseline / seconds:>8.2f}")
+            workers *= 2
+
+        service = PropertyService(db, AnalysisCache())
+        mismatches = 0
+        for user_id in range(1, args.users + 1, max(1, args.users // 50)):
+            stored = db.get(PortfolioAnalysisResult, (last_run.id, user_id))
+            if json.loads(stored.result) != service.analyze_portfolio(user_id).model_dump():
+                mismatches += 1
+        print(f"cross-check against analyze_portfolio: {mismatches} of 50 users differ")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Comparable-property search over the whole book.
+
+Builds the k-NN index for ``--rows`` properties spread over ``--users``
+portfolios, cross-checks a sample of answers against an exact float64
+scan of every property, then times queries scoped to one portfolio and
+to the whole book, and the incremental resync after a single edit.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from benchmarks.common import postcode_frame, sqlite_session, synthetic_properties, timed
+from models import Property
+from services.comparables_service import (
+    DATAZONE_PENALTY, INDEX_COLUMNS, TYPE_PENALTY, ComparablesIndex,
+)
+from services.portfolio_service import rebuild_portfolio_aggregates
+
+
+def exact_nearest(frame, position: int, k: int):
+    """Distances of the ``k`` nearest rows by a plain float64 scan"""
+    matrix = ComparablesIndex.encode(frame).astype(np.float64)
+    dist = ((matrix - matrix[position]) ** 2).sum(axis=1)
+    types = frame["property_type"].to_numpy()
+    zones = frame["datazone"].to_numpy()
+    dist += TYPE_PENALTY * (types != types[position])
+    dist += DATAZONE_PENALTY * (zones != zones[position])
+    dist[position] = np.inf
+    return np.sort(np.sqrt(dist))[:k]
+
+
+def percentiles(fn, repeat: int):
+    times = sorted(timed(fn)[1] for _ in range(repeat))
+    return statistics.median(times) * 1000, times[int(len(times) * 0.99) - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    frame = synthetic_properties(args.rows, users=args.users)
+    postcodes = postcode_frame().set_index("Postcode")["DataZone2011Code"]
+    frame["datazone"] = frame["postcode"].map(postcodes)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = sqlite_session(os.path.join(tmp, "comparables.db"), "tuned")
+        for start in range(0, args.rows, 100_000):
+            db.execute(Property.__table__.insert(), frame.iloc[start:start + 100_000].to_dict("records"))
+        db.commit()
+        rebuild_portfolio_aggregates(db)
+
+        index = ComparablesIndex()
+        _, build = timed(index.sync, db)
+        print(f"{args.rows:,} properties over {args.users:,} portfolios; index built in {build:.2f} s, {index.stats()}")
+
+        result = db.execute(select(*INDEX_COLUMNS).order_by(Property.id))
+        stored = pd.DataFrame(result.all(), columns=list(result.keys()))
+        ids = stored["id"].to_numpy()
+        mismatches = 0
+        for position in rng.integers(0, len(stored), 20):
+            got = np.array([d for _, _, d in index.nearest(int(ids[position]), args.k)])
+            expected = exact_nearest(stored, int(position), args.k)
+            if not np.allclose(got, expected, atol=1e-3):
+                mismatches += 1
+        print(f"cross-check against an exact scan: {mismatches} of 20 queries differ")
+
+        sample = [int(i) for i in rng.choice(ids, args.queries)]
+        owners = {property_id: index.owner(property_id) for property_id in sample}
+        queries = iter(sample * 2)
+        print(f"{'k=' + str(args.k) + ' query':<26} {'p50 ms':>9} {'p99 ms':>9}")
+        for label, scoped in (("one portfolio", True), ("whole book", False)):
+            def query():
+                property_id = next(queries)
+                index.nearest(property_id, args.k, owners[property_id] if scoped else None)
+            p50, p99 = percentiles(query, args.queries)
+            print(f"{label:<26} {p50:>9.2f} {p99:>9.2f}")
+
+        edited = sample[0]
+        db.execute(Property.__table__.update().where(Property.id == edited).values(bedrooms=9))
+        rebuild_portfolio_aggregates(db, [owners[edited]])
+        reloaded, resync = timed(index.sync, db)
+        print(f"resync after one edit: {reloaded} portfolio reloaded in {resync * 1000:.1f} ms "
+              f"(full build {build * 1000:.0f} ms)")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Area benchmarks from the precomputed datazone stats vs computing them
+per request.
+
+Times a stats rebuild over the whole book, then one portfolio's area
+benchmarks read through the ``datazone_stats`` join and computed on the
+fly by aggregating every property in that portfolio's datazones (what an
+analysis would otherwise have to do), and checks the two agree. Finally
+rebuilds again while another connection inserts a property every 10 ms
+and reports how long those writes waited.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+from sqlalchemy import func, select
+
+from benchmarks.common import postcode_frame, sqlite_session, synthetic_properties, timed
+from models import Property
+from services.datazone_service import (
+    DATAZONE_STATS_MIN_PROPERTIES, _stats_columns, area_benchmark, portfolio_area_benchmarks,
+    rebuild_datazone_stats,
+)
+
+
+def on_the_fly_benchmarks(db, user_id: int, limit: int):
+    """Aggregate other users' rows in the user's datazones at request time"""
+    counts = {}
+    for (datazone,) in db.execute(
+        select(Property.datazone).where(Property.user_id == user_id, Property.datazone.is_not(None))
+    ):
+        counts[datazone] = counts.get(datazone, 0) + 1
+    top = sorted(counts, key=lambda dz: (-counts[dz], dz))[:limit]
+    rows = db.execute(
+        select(*_stats_columns()).where(Property.datazone.in_(top)).group_by(Property.datazone)
+        .having(func.count() >= DATAZONE_STATS_MIN_PROPERTIES)
+    ).mappings().all()
+    medians = {}
+    for datazone in top:
+        sizes = sorted(size for (size,) in db.execute(
+            select(Property.size_sqft).where(Property.datazone == datazone, Property.size_sqft > 0)
+        ))
+        middle = len(sizes) // 2
+        medians[datazone] = (sizes[middle] if len(sizes) % 2 else (sizes[middle - 1] + sizes[middle]) / 2) if sizes else None
+    by_zone = {
+        row["datazone"]: {**area_benchmark(SimpleNamespace(**row, median_size_sqft=medians[row["datazone"]])),
+                          "your_properties": counts[row["datazone"]]}
+        for row in rows
+    }
+    return [by_zone[dz] for dz in top if dz in by_zone]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    frame = synthetic_properties(args.rows, users=args.users)
+    datazones = postcode_frame().set_index("Postcode")["DataZone2011Code"]
+    frame["datazone"] = frame["postcode"].map(datazones)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = sqlite_session(os.path.join(tmp, "datazones.db"), "tuned")
+        for start in range(0, args.rows, 100_000):
+            db.execute(Property.__table__.insert(), frame.iloc[start:start + 100_000].to_dict("records"))
+        db.commit()
+
+        run, rebuild = timed(rebuild_datazone_stats, db)
+        print(f"{args.rows:,} properties over {args.users} portfolios")
+        print(f"stats rebuild: {run.datazones:,} datazones in {rebuild:.2f} s")
+
+        stored, joined = timed(portfolio_area_benchmarks, db, 1, args.limit)
+        fresh, scanned = timed(on_the_fly_benchmarks, db, 1, args.limit)
+        print(f"{'area benchmarks (top ' + str(args.limit) + ')':<30} {'ms':>9}")
+        print(f"{'datazone_stats join':<30} {joined * 1000:>9.2f}")
+        print(f"{'aggregated per request':<30} {scanned * 1000:>9.2f}")
+        print(f"results match: {stored == fresh}")
+
+        writer = sqlite_session(os.path.join(tmp, "datazones.db"), "tuned")
+        row = frame.iloc[0].to_dict()
+        waits, done = [], threading.Event()
+
+        def write_while_rebuilding():
+            while not done.is_set():
+                started = time.perf_counter()
+                writer.execute(Property.__table__.insert(), [row])
+                writer.commit()
+                waits.append(time.perf_counter() - started)
+                time.sleep(0.01)
+
+        thread = threading.Thread(target=write_while_rebuilding)
+        thread.start()
+        _, rebuild = timed(rebuild_datazone_stats, db)
+        done.set()
+        thread.join()
+        print(f"rebuild under writes: {rebuild:.2f} s, {len(waits)} writes, "
+              f"slowest waited {max(waits) * 1000:.1f} ms")
+        writer.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Mixed read/write throughput on SQLite: default engine vs the tuned profile.
+
+Writer threads insert and update single properties, one commit each (like
+the create/edit endpoints); reader threads run keyset pages and filters.
+Each profile gets a fresh database file seeded with the same rows.
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.common import sqlite_session, synthetic_properties
+from models import Property, User
+from services.property_service import PropertyService
+
+USERS = 50
+
+
+def seed(db, rows: int):
+    db.execute(User.__table__.insert(), [
+        {"id": i, "email": f"user{i}@example.com", "full_name": "Bench", "hashed_password": "x"}
+        for i in range(1, USERS + 1)
+    ])
+    frame = synthetic_properties(rows, users=USERS)
+    db.execute(Property.__table__.insert(), frame.to_dict("records"))
+    db.commit()
+
+
+def run_profile(profile: str, rows: int, readers: int, writers: int, seconds: float):
+    with tempfile.TemporaryDirectory() as tmp:
+        seed_db = sqlite_session(os.path.join(tmp, "mixed.db"), profile)
+        seed(seed_db, rows)
+        bind = seed_db.get_bind()
+        seed_db.close()
+
+        make_session = sessionmaker(bind=bind, autoflush=False)
+        counts = {"reads": 0, "writes": 0, "errors": 0}
+        lock = threading.Lock()
+        stop = time.perf_counter() + seconds
+
+        def reader(seed_value):
+            rng = random.Random(seed_value)
+            while time.perf_counter() < stop:
+                db = make_session()
+                try:
+                    service = PropertyService(db)
+                    user_id = rng.randint(1, USERS)
+                    service.get_properties_page(user_id, 50, 0)
+                    service.filter_properties(user_id, {"bedrooms_min": 2, "epc_ratings": ["A", "B", "C"]}, limit=50)
+                    outcome = "reads"
+                except Exception:
+                    outcome = "errors"
+                finally:
+                    db.close()
+                with lock:
+                    counts[outcome] += 1
+
+        def writer(seed_value):
+            rng = random.Random(seed_value)
+            while time.perf_counter() < stop:
+                db = make_session()
+                try:
+                    user_id = rng.randint(1, USERS)
+                    db.add(Property(user_id=user_id, house_number="1", street_name="Bench Street",
+                                    postcode="EH1 1AA", property_type="flat", bedrooms=2))
+                    db.commit()
+                    db.query(Property).filter(Property.id == rng.randint(1, rows)).update(
+                        {"bedrooms": rng.randint(1, 5)}, synchronize_session=False
+                    )
+                    db.commit()
+                    outcome = "writes"
+                except Exception:
+                    db.rollback()
+                    outcome = "errors"
+                finally:
+                    db.close()
+                with lock:
+                    counts[outcome] += 1
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+        threads += [threading.Thread(target=writer, args=(1000 + i,)) for i in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        bind.dispose()
+
+    print(
+        f"{profile:>8} {counts['reads'] / seconds:>12.0f} {counts['writes'] / seconds:>12.0f} "
+        f"{counts['errors']:>8}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    print(f"rows: {args.rows:,}  readers: {args.readers}  writers: {args.writers}  {args.seconds:.0f} s per profile")
+    print(f"{'profile':>8} {'reads/s':>12} {'writes/s':>12} {'errors':>8}")
+    for profile in ("default", "tuned"):
+        run_profile(profile, args.rows, args.readers, args.writers, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""GET /api/properties latency while a storm of logins hits the same worker.
+
+Runs the app in-process on one event loop (like a single uvicorn worker)
+via httpx's ASGI transport.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/storm.db"
+os.environ["ENABLE_DEFAULT_ADMIN"] = "false"
+
+import httpx  # noqa: E402
+
+from main import app  # noqa: E402
+
+
+async def main(logins: int, concurrency: int, reads: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        credentials = {"email": "storm@example.com", "password": "storm-password"}
+        response = await client.post("/api/auth/register", json={**credentials, "full_name": "Storm"})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        for i in range(20):
+            await client.post("/api/properties", headers=headers, json={
+                "house_number": str(i), "street_name": "High Street", "postcode": "EH1 1AA", "property_type": "flat",
+            })
+
+        failures = []
+
+        async def login_worker(count):
+            for _ in range(count):
+                try:
+                    await client.post("/api/auth/login", json=credentials)
+                except Exception as exc:  # e.g. pool timeouts when the loop is blocked
+                    failures.append(exc)
+
+        latencies = []
+
+        async def reader():
+            for _ in range(reads):
+                start = time.perf_counter()
+                await client.get("/api/properties", headers=headers)
+                latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.005)
+
+        start = time.perf_counter()
+        await asyncio.gather(reader(), *(login_worker(logins // concurrency) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{logins} logins x{concurrency} concurrent, {reads} reads in {elapsed:.1f} s")
+    if failures:
+        print(f"{len(failures)} logins failed: {failures[0]!r}")
+    print(f"GET /api/properties p50 {statistics.median(latencies) * 1000:.1f} ms  p99 {p99 * 1000:.1f} ms  max {latencies[-1] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--reads", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.concurrency, args.reads))
@@ -0,0 +1,147 @@
+"""Portfolio market analysis: per-object Python loops vs the columnar engine.
+
+The legacy path is the pre-vectorisation AnalysisService code, run on
+plain objects carrying the same fields (including the derived
+``estimated_value``). Results are cross-checked before timing.
+"""
+import argparse
+import math
+import os
+import statistics
+import tempfile
+from collections import defaultdict
+from types import SimpleNamespace
+
+from benchmarks.common import sqlite_session, synthetic_properties, timed
+from models import Property
+from services.analysis_service import AnalysisService, load_portfolio_frame, portfolio_frame
+from services.portfolio_service import ESTIMATED_VALUE_PER_SQFT
+
+
+class LegacyAnalysis:
+    """The list-based market analysis that AnalysisService used to run"""
+
+    def market_analysis(self, properties):
+        return {
+            "market_trends": self._analyze_market_trends(properties),
+            "price_analysis": self._analyze_prices(properties),
+            "recommendations": self._generate_recommendations(properties),
+        }
+
+    def _analyze_market_trends(self, properties):
+        type_analysis = defaultdict(list)
+        for prop in properties:
+            if prop.property_type and prop.estimated_value:
+                type_analysis[prop.property_type].append(prop.estimated_value)
+        return {
+            prop_type: {
+                "average_value": statistics.mean(values),
+                "median_value": statistics.median(values),
+                "value_range": {"min": min(values), "max": max(values)},
+            }
+            for prop_type, values in type_analysis.items()
+        }
+
+    def _analyze_prices(self, properties):
+        values = [p.estimated_value for p in properties if p.estimated_value]
+        if not values:
+            return {}
+        price_per_sqft = [p.estimated_value / p.size_sqft for p in properties if p.estimated_value and p.size_sqft]
+        return {
+            "value_statistics": {
+                "mean": statistics.mean(values),
+                "median": statistics.median(values),
+                "std_dev": statistics.stdev(values) if len(values) > 1 else 0,
+                "range": {"min": min(values), "max": max(values)},
+            },
+            "price_per_sqft": {
+                "mean": statistics.mean(price_per_sqft) if price_per_sqft else 0,
+                "median": statistics.median(price_per_sqft) if price_per_sqft else 0,
+            },
+        }
+
+    def _generate_recommendations(self, properties):
+        recommendations = []
+        type_counts = defaultdict(int)
+        for prop in properties:
+            if prop.property_type:
+                type_counts[prop.property_type] += 1
+        if len(type_counts) == 1:
+            recommendations.append("Consider diversifying your portfolio with different property types")
+        poor_epc = [p for p in properties if p.epc_rating in ['E', 'F', 'G']]
+        if poor_epc:
+            recommendations.append(f"Consider improving EPC ratings for {len(poor_epc)} properties to increase value")
+        if len(set(p.postcode for p in properties if p.postcode)) == 1:
+            recommendations.append("Consider geographical diversification across different areas")
+        if len([p for p in properties if p.solar_panels == 'No']) > len(properties) * 0.7:
+            recommendations.append("Consider solar panel installations to improve sustainability and reduce costs")
+        return recommendations
+
+
+def as_objects(frame):
+    objects = []
+    for row in frame.astype(object).where(frame.notna(), None).to_dict("records"):
+        size = int(row["size_sqft"]) if row["size_sqft"] else None
+        objects.append(SimpleNamespace(
+            **dict(row, size_sqft=size),
+            estimated_value=size * ESTIMATED_VALUE_PER_SQFT if size else None,
+        ))
+    return objects
+
+
+def vectorised(service, frame):
+    return {
+        "market_trends": service._analyze_market_trends(frame),
+        "price_analysis": service._analyze_prices(frame),
+        "recommendations": service._generate_recommendations(frame),
+    }
+
+
+def check(legacy, new):
+    assert legacy["recommendations"] == new["recommendations"]
+    for key in ("mean", "median", "std_dev"):
+        assert math.isclose(legacy["price_analysis"]["value_statistics"][key],
+                            new["price_analysis"]["value_statistics"][key], rel_tol=1e-9)
+    for prop_type, trend in legacy["market_trends"].items():
+        assert math.isclose(trend["median_value"], new["market_trends"][prop_type]["median_value"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--load-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    service = AnalysisService(db=None)
+    legacy = LegacyAnalysis()
+    # "frame" is the one-off conversion of loaded rows into typed columns;
+    # "numpy" is the analysis itself, and the speedup counts both
+    print(f"{'rows':>10} {'legacy ms':>12} {'frame ms':>10} {'numpy ms':>10} {'speedup':>9}")
+    for rows in args.sizes:
+        raw = synthetic_properties(rows).drop(columns=["user_id"])
+        raw.loc[::9, "size_sqft"] = None
+        objects = as_objects(raw)
+        legacy_result, legacy_seconds = timed(legacy.market_analysis, objects)
+        frame, frame_seconds = timed(portfolio_frame, raw)
+        new_result, new_seconds = timed(vectorised, service, frame)
+        check(legacy_result, new_result)
+        print(
+            f"{rows:>10,} {legacy_seconds * 1000:>12.1f} {frame_seconds * 1000:>10.1f} {new_seconds * 1000:>10.1f} "
+            f"{legacy_seconds / (frame_seconds + new_seconds):>8.1f}x"
+        )
+
+    # Loading: ORM objects (what the old code fetched) vs one columnar query
+    with tempfile.TemporaryDirectory() as tmp:
+        db = sqlite_session(os.path.join(tmp, "analysis.db"))
+        db.execute(Property.__table__.insert(), synthetic_properties(args.load_rows).to_dict("records"))
+        db.commit()
+        _, orm_seconds = timed(lambda: db.query(Property).filter(Property.user_id == 1).all())
+        db.expunge_all()
+        _, frame_seconds = timed(load_portfolio_frame, db, 1)
+        print(f"load {args.load_rows:,} rows: ORM objects {orm_seconds * 1000:.0f} ms, "
+              f"DataFrame {frame_seconds * 1000:.0f} ms")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Portfolio statistics and analysis: ORM hydration vs SQL aggregates.
+
+The hydration path loads every Property of the portfolio and computes the
+same numbers in Python (the pre-push-down code, without its 100-row cap).
+"""
+import argparse
+import os
+import statistics
+import tempfile
+
+from benchmarks.check_portfolio_accumulator import legacy_analyze_portfolio
+from benchmarks.common import sqlite_session, synthetic_properties, timed
+from database import create_missing_indexes
+from models import Property
+from services.property_service import ESTIMATED_VALUE_PER_SQFT, PropertyService
+
+
+def legacy_statistics(properties):
+    values = [p.size_sqft * ESTIMATED_VALUE_PER_SQFT for p in properties if p.size_sqft]
+    sizes = [p.size_sqft for p in properties if p.size_sqft]
+    return {
+        'value_statistics': {'min': min(values), 'max': max(values),
+                             'median': statistics.median(values), 'mean': statistics.mean(values)},
+        'size_statistics': {'min': min(sizes), 'max': max(sizes),
+                            'median': statistics.median(sizes), 'mean': statistics.mean(sizes)},
+        'feature_counts': {feature: sum(1 for p in properties if getattr(p, feature) == 'Yes')
+                           for feature in ('parking', 'garden', 'solar_panels', 'new_build')},
+        'total_properties': len(properties),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--users", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = sqlite_session(os.path.join(tmp, "statistics.db"), profile="tuned")
+        create_missing_indexes(db.get_bind())
+        frame = synthetic_properties(args.rows, users=args.users)
+        for start in range(0, len(frame), 50_000):
+            db.execute(Property.__table__.insert(), frame.iloc[start:start + 50_000].to_dict("records"))
+        db.commit()
+        service = PropertyService(db)
+        portfolio = int((frame["user_id"] == 1).sum())
+
+        def hydrated():
+            properties = db.query(Property).filter(Property.user_id == 1).all()
+            result = legacy_statistics(properties), legacy_analyze_portfolio(properties)
+            db.expunge_all()
+            return result
+
+        def aggregated():
+            return service.get_property_statistics(1), service.analyze_portfolio(1)
+
+        (legacy_stats, legacy_analysis), hydrated_seconds = timed(hydrated)
+        (stats, analysis), aggregated_seconds = timed(aggregated)
+        assert analysis == legacy_analysis
+        assert stats["size_statistics"]["median"] == legacy_stats["size_statistics"]["median"]
+        assert stats["feature_counts"] == legacy_stats["feature_counts"]
+
+        print(f"table rows: {args.rows:,}  portfolio: {portfolio:,} properties")
+        print(f"ORM hydration + Python: {hydrated_seconds * 1000:>8.0f} ms")
+        print(f"SQL aggregates:         {aggregated_seconds * 1000:>8.0f} ms  ({hydrated_seconds / aggregated_seconds:.1f}x)")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
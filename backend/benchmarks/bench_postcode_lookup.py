@@ -0,0 +1,38 @@
+"""Single-postcode lookup latency: pandas boolean mask vs PostcodeIndex"""
+import numpy as np
+
+from benchmarks.common import postcode_frame, timed
+from services.postcode_service import PostcodeIndex, normalise_postcode
+
+
+def main():
+    raw = postcode_frame()
+    df = raw.copy()
+    df["Postcode"] = df["Postcode"].str.strip().str.upper().str.replace(" ", "")
+    index, build_seconds = timed(PostcodeIndex.from_frame, raw)
+
+    rng = np.random.default_rng(1)
+    queries = rng.choice(raw["Postcode"].to_numpy(), 2_000).tolist()
+
+    def mask_lookup(postcodes):
+        for postcode in postcodes:
+            match = df[df["Postcode"] == normalise_postcode(postcode)]
+            match.iloc[0]["DataZone2011Code"] if not match.empty else None
+
+    def index_lookup(postcodes):
+        for postcode in postcodes:
+            index.lookup(postcode)
+
+    mask_queries = queries[:200]
+    _, mask_seconds = timed(mask_lookup, mask_queries)
+    _, index_seconds = timed(index_lookup, queries)
+
+    mask_us = mask_seconds / len(mask_queries) * 1e6
+    index_us = index_seconds / len(queries) * 1e6
+    print(f"rows: {len(index):,}  index build: {build_seconds * 1000:.0f} ms")
+    print(f"pandas mask : {mask_us:10.1f} us/lookup")
+    print(f"index lookup: {index_us:10.1f} us/lookup  ({mask_us / index_us:,.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""Bulk postcode resolution throughput: per-row lookups vs PostcodeIndex.resolve_many"""
+import numpy as np
+
+from benchmarks.common import postcode_frame, timed
+from services.postcode_service import PostcodeIndex
+
+
+def main():
+    raw = postcode_frame()
+    index = PostcodeIndex.from_frame(raw)
+    rng = np.random.default_rng(2)
+    population = raw["Postcode"].to_numpy()
+
+    print(f"{'batch':>10} {'per-row lookup':>18} {'resolve_many':>18}")
+    for size in (10_000, 100_000, 1_000_000):
+        # ~5% unknown postcodes and mixed formatting, like real address files
+        batch = rng.choice(population, size).astype(object)
+        batch[::20] = "ZZ99 9ZZ"
+        batch[1::3] = np.char.lower(batch[1::3].astype(str))
+        batch = batch.tolist()
+
+        _, loop_seconds = timed(lambda: [index.lookup(p) for p in batch])
+        _, bulk_seconds = timed(index.resolve_many, batch)
+        print(
+            f"{size:>10,} {size / loop_seconds:>14,.0f} /s {size / bulk_seconds:>14,.0f} /s"
+        )
+
+
+if __name__ == "__main__":
+    main()
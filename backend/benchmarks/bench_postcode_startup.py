@@ -0,0 +1,29 @@
+"""Cold-start cost: parsing the postcode CSV vs opening the compiled mmap index"""
+import os
+import tempfile
+
+from benchmarks.common import postcode_frame, timed
+from services.postcode_service import PostcodeIndex, compile_postcode_index
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "postcode_to_datazone.csv")
+        postcode_frame().to_csv(csv_path, index=False)
+
+        csv_index, csv_seconds = timed(PostcodeIndex.from_csv, csv_path)
+        idx_path, compile_seconds = timed(compile_postcode_index, csv_path)
+        mmap_index, mmap_seconds = timed(PostcodeIndex.open, idx_path)
+
+        sample = csv_index.keys[::997]
+        assert all(csv_index.lookup(k.decode()) == mmap_index.lookup(k.decode()) for k in sample)
+
+        print(f"rows: {len(csv_index):,}")
+        print(f"csv size    : {os.path.getsize(csv_path) / 1e6:8.1f} MB")
+        print(f"index size  : {os.path.getsize(idx_path) / 1e6:8.1f} MB  (compiled in {compile_seconds * 1000:.0f} ms)")
+        print(f"csv parse   : {csv_seconds * 1000:8.1f} ms")
+        print(f"mmap open   : {mmap_seconds * 1000:8.1f} ms  ({csv_seconds / mmap_seconds:,.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""Bulk property import throughput into SQLite"""
+import io
+import os
+import tempfile
+
+from benchmarks.common import postcode_frame, sqlite_session, synthetic_properties, timed
+from services.import_service import PropertyImportService
+from services.postcode_service import PostcodeIndex
+
+ROWS = 50_000
+
+
+def main():
+    index = PostcodeIndex.from_frame(postcode_frame())
+    frame = synthetic_properties(ROWS).drop(columns=["user_id"])
+    csv_bytes = frame.to_csv(index=False).encode()
+    jsonl_bytes = frame.to_json(orient="records", lines=True).encode()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, payload in (("csv", csv_bytes), ("jsonl", jsonl_bytes)):
+            db = sqlite_session(os.path.join(tmp, f"{fmt}.db"))
+            service = PropertyImportService(db, index)
+            report, seconds = timed(service.import_file, io.BytesIO(payload), fmt, 1)
+            db.close()
+            print(f"{fmt:>5}: {report['imported']:,} rows in {seconds:.2f} s ({report['imported'] / seconds:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Property search latency on a large table: ILIKE scans vs the FTS5 index"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+from benchmarks.common import sqlite_session, synthetic_properties, timed
+from models import Property
+from services import search_service
+
+QUERIES = ["high", "station ro", "12", "eh1", "church lane 4"]
+
+
+def legacy_search(db, user_id, query):
+    # The pre-FTS implementation: three leading-wildcard ILIKEs
+    return db.query(Property).filter(
+        Property.user_id == user_id,
+        (Property.street_name.ilike(f"%{query}%")) |
+        (Property.postcode.ilike(f"%{query}%")) |
+        (Property.house_number.ilike(f"%{query}%"))
+    ).all()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = sqlite_session(os.path.join(tmp, "search.db"))
+        frame = synthetic_properties(args.rows, users=args.users)
+        for start in range(0, len(frame), 50_000):
+            db.execute(Property.__table__.insert(), frame.iloc[start:start + 50_000].to_dict("records"))
+        db.commit()
+
+        _, build_seconds = timed(search_service.ensure_search_index, db.get_bind())
+        print(f"rows: {args.rows:,}  users: {args.users:,}  FTS backfill: {build_seconds:.1f} s")
+
+        rng = np.random.default_rng(3)
+        users = rng.integers(1, args.users + 1, 20).tolist()
+        print(f"{'query':>16} {'ILIKE ms':>10} {'FTS ms':>10}")
+        for query in QUERIES:
+            _, legacy_seconds = timed(lambda: [legacy_search(db, u, query) for u in users])
+            _, fts_seconds = timed(lambda: [search_service.search_properties(db, u, query, 50) for u in users])
+            print(f"{query:>16} {legacy_seconds / len(users) * 1000:>10.2f} {fts_seconds / len(users) * 1000:>10.2f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Check bulk update and bulk delete never widen to the whole portfolio.
+
+Sends selections that are empty or only look like filters (zero, blank
+strings, empty lists) through the API and checks each one is rejected or
+matches just the rows it names. Exits non-zero if any request touches other rows.
+"""
+import os
+import sys
+import tempfile
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bulk.db')}"
+os.environ["ENABLE_DEFAULT_ADMIN"] = "false"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from main import app  # noqa: E402
+
+PORTFOLIO = [
+    {"bedrooms": 0, "epc_rating": "C", "property_type": "flat"},
+    {"bedrooms": 2, "epc_rating": "C", "property_type": "flat"},
+    {"bedrooms": 3, "epc_rating": "D", "property_type": "house"},
+]
+
+# (label, endpoint, body, expected status, expected rows matched)
+CASES = [
+    ("no filters", "bulk-delete", {}, 400, None),
+    ("bedrooms=0 is a filter", "bulk-update", {"bedrooms": 0, "patch": {"epc_rating": "G"}}, 200, 1),
+    ("blank epc_rating", "bulk-delete", {"epc_rating": ""}, 422, None),
+    ("blank property_type", "bulk-update", {"property_type": "  ", "patch": {"parking": "No"}}, 422, None),
+    ("empty property_types", "bulk-delete", {"property_types": []}, 422, None),
+    ("empty epc_ratings", "bulk-update", {"epc_ratings": [], "patch": {"garden": "Yes"}}, 422, None),
+    ("epc_ratings list is a filter", "bulk-update", {"epc_ratings": ["D"], "patch": {"garden": "Yes"}}, 200, 1),
+]
+
+
+def main() -> int:
+    client = TestClient(app)
+    credentials = {"email": "bulk@example.com", "password": "bulk-password", "full_name": "Bulk"}
+    token = client.post("/api/auth/register", json=credentials).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    for fields in PORTFOLIO:
+        client.post("/api/properties", headers=headers, json={
+            "house_number": "1", "street_name": "High Street", "postcode": "EH1 1AA", **fields,
+        })
+
+    failed = 0
+    for label, endpoint, body, expected_status, expected_matched in CASES:
+        response = client.post(f"/api/properties/{endpoint}", headers=headers, json=body)
+        matched = response.json().get("matched") if response.status_code == 200 else None
+        remaining = len(client.get("/api/properties", headers=headers).json())
+        ok = response.status_code == expected_status and matched == expected_matched and remaining == len(PORTFOLIO)
+        failed += not ok
+        print(f"{'ok' if ok else 'FAIL':>4}  {label}: {response.status_code}, matched {matched}, {remaining} left")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
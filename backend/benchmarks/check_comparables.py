@@ -0,0 +1,83 @@
+"""Check comparable-property search through the API.
+
+Builds two portfolios, one where no property has a size (size is
+optional), and checks each search returns the expected neighbours, never
+reveals another user's ids, rejects other users' properties and follows
+edits. Exits non-zero on any failure.
+"""
+import os
+import sys
+import tempfile
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'comparables.db')}"
+os.environ["ENABLE_DEFAULT_ADMIN"] = "false"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from main import app  # noqa: E402
+
+BASE = {"house_number": "1", "street_name": "High Street", "postcode": "EH1 1AA", "property_type": "flat"}
+
+# No size_sqft anywhere: every size falls back to the typical value
+UNSIZED = [
+    {"bedrooms": 2, "bathrooms": 1, "epc_rating": "C"},
+    {"bedrooms": 2, "bathrooms": 1, "epc_rating": "C"},
+    {"bedrooms": 5, "bathrooms": 3, "epc_rating": "G", "property_type": "house"},
+]
+SIZED = [
+    {"bedrooms": 2, "bathrooms": 1, "epc_rating": "C", "size_sqft": 700},
+    {"bedrooms": 2, "bathrooms": 1, "epc_rating": "C", "size_sqft": 0},
+    {"bedrooms": 4, "bathrooms": 2, "epc_rating": "B", "size_sqft": 1800, "property_type": "house"},
+]
+
+
+def register(client: TestClient, name: str) -> dict:
+    credentials = {"email": f"{name}@example.com", "password": f"{name}-password", "full_name": name}
+    token = client.post("/api/auth/register", json=credentials).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def main() -> int:
+    client = TestClient(app, raise_server_exceptions=False)
+    owners = {"unsized": register(client, "unsized"), "sized": register(client, "sized")}
+    ids = {
+        name: [
+            client.post("/api/properties", headers=owners[name], json={**BASE, **fields}).json()["id"]
+            for fields in portfolio
+        ]
+        for name, portfolio in (("unsized", UNSIZED), ("sized", SIZED))
+    }
+
+    def search(owner: str, property_id: int, **params) -> tuple:
+        response = client.get(f"/api/properties/{property_id}/comparables", headers=owners[owner], params=params)
+        return response.status_code, response.json()["comparables"] if response.status_code == 200 else []
+
+    unsized, sized = ids["unsized"], ids["sized"]
+    status, matches = search("unsized", unsized[0])
+    checks = [
+        ("portfolio without sizes", status, 200),
+        ("identical twin ranks first", [match["id"] for match in matches], [unsized[1], unsized[2]]),
+    ]
+    status, matches = search("sized", sized[1])
+    checks.append(("zero size is searchable", [match["id"] for match in matches][:1], [sized[0]]))
+
+    status, matches = search("unsized", unsized[0], scope="book", k=10)
+    checks.append(("book scope covers other portfolios", len(matches), len(unsized) + len(sized) - 1))
+    foreign = [match["id"] for match in matches if match["id"] not in unsized]
+    checks.append(("other users' matches carry no id", set(foreign), {None}))
+    checks.append(("another user's property", search("sized", unsized[0])[0], 404))
+
+    client.put(f"/api/properties/{unsized[2]}", headers=owners["unsized"], json={**BASE, **UNSIZED[0]})
+    status, matches = search("unsized", unsized[0])
+    checks.append(("edit is picked up", [match["distance"] for match in matches], [0.0, 0.0]))
+
+    failed = 0
+    for label, got, expected in checks:
+        ok = got == expected
+        failed += not ok
+        print(f"{'ok' if ok else 'FAIL':>4}  {label}: {got}" + ("" if ok else f", expected {expected}"))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""Check analyze_portfolio against the old list-based logic.
+
+Builds random small portfolios (including missing, lower-case and unknown
+EPC ratings and zero sizes) and compares the legacy result with both ways
+of filling a PortfolioAccumulator: streaming rows through ``add`` and the
+SQL aggregates behind ``analyze_portfolio``. Exits non-zero on any
+difference. Also checks that portfolios over 100 properties are analysed
+in full.
+"""
+import os
+import random
+import sys
+import tempfile
+from collections import Counter
+
+from benchmarks.common import sqlite_session
+from models import Property
+from schemas import PropertyAnalysis
+from services.portfolio_service import ESTIMATED_VALUE_PER_SQFT, PortfolioAccumulator
+from services.property_service import PropertyService
+
+
+def legacy_analyze_portfolio(properties) -> PropertyAnalysis:
+    """analyze_portfolio as it was before the accumulator, over a list"""
+    if not properties:
+        return PropertyAnalysis(total_properties=0, avg_epc_rating=None, total_value_estimate=None,
+                                recommendations=[], energy_efficiency_score=None, investment_score=None,
+                                risk_assessment="Low")
+    total_properties = len(properties)
+    epc_map = {"A": 7, "B": 6, "C": 5, "D": 4, "E": 3, "F": 2, "G": 1}
+    reverse_epc = {v: k for k, v in epc_map.items()}
+    epc_values = [epc_map[e.upper()] for e in [p.epc_rating or "" for p in properties] if e and e.upper() in epc_map]
+    avg_epc_rating = reverse_epc.get(round(sum(epc_values) / len(epc_values))) if epc_values else None
+    size_estimates = [(p.size_sqft or 0) * ESTIMATED_VALUE_PER_SQFT for p in properties if p.size_sqft]
+    total_value_estimate = float(sum(size_estimates)) if size_estimates else None
+    good_epc_count = len([p for p in properties if (p.epc_rating or "").upper() in {"A", "B", "C"}])
+    energy_efficiency_score = round(100 * good_epc_count / total_properties, 2)
+    score = 0
+    for p in properties:
+        if (p.epc_rating or "").upper() in {"A", "B", "C"}:
+            score += 20
+        if p.solar_panels == "Yes":
+            score += 15
+        if p.garden == "Yes":
+            score += 10
+        if p.parking == "Yes":
+            score += 10
+        if p.new_build == "Yes":
+            score += 15
+    investment_score = min(round(score / total_properties), 100)
+    type_counts = Counter([p.property_type for p in properties if p.property_type])
+    max_concentration = (max(type_counts.values()) / total_properties) if type_counts else 0
+    poor_epc = len([p for p in properties if (p.epc_rating or "").upper() in {"E", "F", "G"}])
+    risk_score = int(max_concentration > 0.7) + int(poor_epc > total_properties * 0.3)
+    risk_assessment = "Low" if risk_score == 0 else ("Medium" if risk_score == 1 else "High")
+    recommendations = []
+    if poor_epc:
+        recommendations.append(f"Consider improving EPC ratings for {poor_epc} properties")
+    if max_concentration > 0.7:
+        recommendations.append("Diversify property types to reduce concentration risk")
+    if not size_estimates:
+        recommendations.append("Add property sizes to improve value estimates")
+    return PropertyAnalysis(total_properties=total_properties, avg_epc_rating=avg_epc_rating,
+                            total_value_estimate=total_value_estimate, recommendations=recommendations,
+                            energy_efficiency_score=energy_efficiency_score, investment_score=investment_score,
+                            risk_assessment=risk_assessment)
+
+
+def random_property(rng: random.Random, user_id: int) -> dict:
+    return {
+        "user_id": user_id, "house_number": "1", "street_name": "Check Street", "postcode": "EH1 1AA",
+        "property_type": rng.choice(["flat", "flat", "flat", "house", "bungalow", ""]),
+        "size_sqft": rng.choice([None, 0, 500, 750, 1200, 2400]),
+        "epc_rating": rng.choice([None, "", "a", "B", "C", "d", "E", "F", "G", "X"]),
+        "solar_panels": rng.choice(["Yes", "No", None]),
+        "garden": rng.choice(["Yes", "No", None]),
+        "parking": rng.choice(["Yes", "No", None]),
+        "new_build": rng.choice(["Yes", "No", None]),
+    }
+
+
+def main() -> int:
+    rng = random.Random(17)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = sqlite_session(os.path.join(tmp, "accumulator.db"))
+        sizes = [0, 1, 2, 3, 5, 10, 40, 100] + [rng.randint(1, 100) for _ in range(200)]
+        rows = [random_property(rng, user_id) for user_id, size in enumerate(sizes, start=1) for _ in range(size)]
+        big_user = len(sizes) + 1
+        rows += [random_property(rng, big_user) for _ in range(250)]
+        db.execute(Property.__table__.insert(), rows)
+        db.commit()
+
+        service = PropertyService(db)
+        mismatches = 0
+        for user_id in range(1, big_user + 1):
+            properties = db.query(Property).filter(Property.user_id == user_id).all()
+            expected = legacy_analyze_portfolio(properties)
+            streamed = PortfolioAccumulator()
+            for row in db.query(*PortfolioAccumulator.COLUMNS).filter(Property.user_id == user_id).yield_per(7):
+                streamed.add(row)
+            for label, got in (("streamed", streamed.result()), ("aggregated", service.analyze_portfolio(user_id))):
+                if got != expected:
+                    mismatches += 1
+                    print(f"user {user_id} ({len(properties)} properties), {label}:\n  expected {expected}\n  got      {got}")
+        db.close()
+
+    print(f"{big_user} portfolios compared, {mismatches} mismatches")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
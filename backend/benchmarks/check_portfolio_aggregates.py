@@ -0,0 +1,89 @@
+"""Check the stored portfolio totals stay exact under every write path.
+
+Runs a random sequence of creates, updates, deletes, bulk updates, bulk
+deletes and imports across a few users, then compares the
+``portfolio_aggregates`` rows with a full recount and the stored-totals
+analysis with the list-based legacy one. Exits non-zero on any drift.
+"""
+import os
+import random
+import sys
+import tempfile
+
+from benchmarks.common import sqlite_session
+from benchmarks.check_portfolio_accumulator import legacy_analyze_portfolio, random_property
+from models import Property
+from schemas import PropertyCreate, PropertyUpdate
+from services.import_service import PropertyImportService
+from services.portfolio_service import check_portfolio_aggregates, read_portfolio
+from services.postcode_service import PostcodeIndex
+from services.property_service import PropertyService
+
+USERS = 4
+STEPS = 600
+
+
+def property_fields(rng: random.Random) -> dict:
+    fields = random_property(rng, 0)
+    del fields["user_id"]
+    return fields
+
+
+def random_patch(rng: random.Random) -> dict:
+    fields = property_fields(rng)
+    return {name: fields[name] for name in rng.sample(sorted(fields), rng.randint(1, 4))}
+
+
+def random_selection(rng: random.Random, ids) -> dict:
+    choice = rng.random()
+    if choice < 0.4 and ids:
+        return {"ids": rng.sample(ids, min(len(ids), rng.randint(1, 5)))}
+    if choice < 0.7:
+        return {"property_types": [rng.choice(["flat", "house", "bungalow", ""])]}
+    return {"epc_ratings": rng.sample(["a", "B", "C", "d", "E", "F", "G", "X"], 2)}
+
+
+def main() -> int:
+    rng = random.Random(19)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = sqlite_session(os.path.join(tmp, "aggregates.db"))
+        service = PropertyService(db)
+        importer = PropertyImportService(db, PostcodeIndex.empty(), chunk_size=7)
+
+        for _ in range(STEPS):
+            user_id = rng.randint(1, USERS)
+            ids = [i for (i,) in db.query(Property.id).filter(Property.user_id == user_id)]
+            action = rng.random()
+            if action < 0.35 or not ids:
+                service.create_property(PropertyCreate(**property_fields(rng)), user_id)
+            elif action < 0.6:
+                patch = random_patch(rng)
+                service.update_property(rng.choice(ids), PropertyUpdate.model_construct(**patch), user_id)
+            elif action < 0.7:
+                service.delete_property(rng.choice(ids), user_id)
+            elif action < 0.82:
+                service.bulk_update_properties(user_id, random_selection(rng, ids), random_patch(rng))
+            elif action < 0.9:
+                service.bulk_delete_properties(user_id, random_selection(rng, ids))
+            else:
+                rows = [(n, property_fields(rng)) for n in range(1, rng.randint(1, 20))]
+                importer.import_rows(iter(rows), user_id)
+
+        drifted = check_portfolio_aggregates(db)
+        mismatches = 0
+        for user_id in range(1, USERS + 1):
+            properties = db.query(Property).filter(Property.user_id == user_id).all()
+            stored = read_portfolio(db, user_id)
+            got = stored.result() if stored else None
+            expected = legacy_analyze_portfolio(properties)
+            if got != expected:
+                mismatches += 1
+                print(f"user {user_id} ({len(properties)} properties):\n  expected {expected}\n  got      {got}")
+        db.close()
+
+    print(f"{STEPS} writes over {USERS} users, {len(drifted)} drifted, {mismatches} analysis mismatches")
+    return 1 if drifted or mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
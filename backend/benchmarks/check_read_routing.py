@@ -0,0 +1,63 @@
+"""Check read/write routing against two local SQLite files.
+
+The "replica" is a second file that only changes when this script copies
+the primary over it, so which database served a read is visible in the
+response. Exits non-zero if a read goes to the wrong place.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+tmp = tempfile.mkdtemp()
+PRIMARY = os.path.join(tmp, "primary.db")
+REPLICA = os.path.join(tmp, "replica.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{PRIMARY}"
+os.environ["DATABASE_READ_URL"] = f"sqlite:///{REPLICA}"
+os.environ["READ_YOUR_WRITES_SECONDS"] = "1"
+os.environ["ENABLE_DEFAULT_ADMIN"] = "false"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from main import app  # noqa: E402
+
+WINDOW = float(os.environ["READ_YOUR_WRITES_SECONDS"])
+
+
+def replicate():
+    with sqlite3.connect(PRIMARY) as source, sqlite3.connect(REPLICA) as target:
+        source.backup(target)
+
+
+def main() -> int:
+    client = TestClient(app)
+    credentials = {"email": "replica@example.com", "password": "replica-password", "full_name": "Replica"}
+    token = client.post("/api/auth/register", json=credentials).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    replicate()
+
+    def listed():
+        return len(client.get("/api/properties", headers=headers).json())
+
+    client.post("/api/properties", headers=headers, json={
+        "house_number": "1", "street_name": "High Street", "postcode": "EH1 1AA", "property_type": "flat",
+    })
+    checks = [("read right after a write sees it (primary)", listed(), 1)]
+
+    time.sleep(WINDOW + 0.1)
+    checks.append(("read after the window goes to the lagging replica", listed(), 0))
+
+    replicate()
+    checks.append(("read after replication catches up", listed(), 1))
+
+    failed = 0
+    for label, got, expected in checks:
+        ok = got == expected
+        failed += not ok
+        print(f"{'ok' if ok else 'FAIL':>4}  {label}: {got} row(s), expected {expected}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""Shared helpers for the benchmark scripts.
+
+Run benchmarks from the ``backend`` directory, e.g.
+``python -m benchmarks.bench_postcode_lookup``.
+"""
+import os
+import time
+from typing import Callable, Tuple
+
+import numpy as np
+import pandas as pd
+
+POSTCODE_CSV = os.path.join(os.path.dirname(__file__), "..", "..", "postcode_to_datazone.csv")
+
+# Roughly the number of live + terminated Scottish postcodes in the NRS release
+FULL_TABLE_ROWS = 230_000
+
+
+def postcode_frame(rows: int = FULL_TABLE_ROWS, seed: int = 0) -> pd.DataFrame:
+    """Load the real postcode table if present, otherwise synthesise one of ``rows`` rows"""
+    if os.path.exists(POSTCODE_CSV):
+        return pd.read_csv(POSTCODE_CSV, usecols=["Postcode", "DataZone2011Code"], dtype=str)
+
+    rng = np.random.default_rng(seed)
+    areas = np.array(["AB", "DD", "DG", "EH", "FK", "G", "HS", "IV", "KA", "KW", "KY", "ML", "PA", "PH", "TD", "ZE"])
+    letters = np.array(list("ABDEFGHJLNPQRSTUWXYZ"))
+    outward = np.char.add(rng.choice(areas, rows), rng.integers(1, 99, rows).astype(str))
+    inward = np.char.add(
+        rng.integers(0, 9, rows).astype(str),
+        np.char.add(rng.choice(letters, rows), rng.choice(letters, rows)),
+    )
+    postcodes = pd.unique(np.char.add(np.char.add(outward, " "), inward))
+    datazones = np.char.add("S0", (1_000_000 + rng.integers(0, 6976, len(postcodes))).astype(str))
+    return pd.DataFrame({"Postcode": postcodes, "DataZone2011Code": datazones})
+
+
+def timed(fn: Callable, *args, **kwargs) -> Tuple[object, float]:
+    """Run ``fn`` once and return ``(result, seconds)``"""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+PROPERTY_TYPES = ["flat", "house", "detached", "semi-detached", "bungalow"]
+EPC_RATINGS = ["A", "B", "C", "D", "E", "F", "G"]
+STREET_NAMES = [
+    "High", "Station", "Main", "Church", "Park", "Victoria", "Mill", "Queen", "King", "George",
+    "Castle", "Bridge", "Market", "Albert", "Princes", "Hope", "Dundas", "Leith", "Morningside", "Bruntsfield",
+    "Marchmont", "Comely Bank", "Great King", "Hanover", "Rose", "Thistle", "Argyle", "Sauchiehall", "Buchanan",
+    "Byres", "Union", "Holburn", "Perth", "Crieff", "Dunkeld", "Atholl", "Ness", "Caledonian", "Forth", "Clyde",
+]
+STREET_SUFFIXES = ["Street", "Road", "Lane", "Avenue", "Terrace", "Place", "Crescent", "Gardens", "Drive", "Court"]
+STREETS = [f"{name} {suffix}" for name in STREET_NAMES for suffix in STREET_SUFFIXES]
+
+
+def synthetic_properties(rows: int, users: int = 1, seed: int = 0) -> pd.DataFrame:
+    """A frame of plausible ``PropertyCreate`` fields plus a ``user_id`` column"""
+    rng = np.random.default_rng(seed)
+    yes_no = np.array(["Yes", "No"])
+    postcodes = postcode_frame()["Postcode"].to_numpy()
+    return pd.DataFrame({
+        "user_id": rng.integers(1, users + 1, rows),
+        "house_number": rng.integers(1, 300, rows).astype(str),
+        "street_name": rng.choice(STREETS, rows),
+        "postcode": rng.choice(postcodes, rows),
+        "property_type": rng.choice(PROPERTY_TYPES, rows),
+        "bedrooms": rng.integers(1, 6, rows),
+        "bathrooms": rng.integers(1, 4, rows),
+        "size_sqft": rng.integers(350, 4000, rows),
+        "epc_rating": rng.choice(EPC_RATINGS, rows),
+        "parking": rng.choice(yes_no, rows),
+        "garden": rng.choice(yes_no, rows),
+        "solar_panels": rng.choice(yes_no, rows, p=[0.2, 0.8]),
+        "new_build": rng.choice(yes_no, rows, p=[0.1, 0.9]),
+    })
+
+
+def sqlite_session(path: str, profile: str = None):
+    """Session on a fresh SQLite file with the app's schema created.
+
+    ``profile`` ("default" / "tuned") builds the engine the way the app does;
+    without it the engine is a bare ``create_engine``.
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    import models
+    from database import create_db_engine
+
+    url = f"sqlite:///{path}"
+    engine = create_db_engine(url, profile) if profile else create_engine(url)
+    models.Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)()
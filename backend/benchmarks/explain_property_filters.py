@@ -0,0 +1,57 @@
+"""Check that every filter_properties shape is served by an index.
+
+Runs EXPLAIN QUERY PLAN on SQLite for each filter/sort combination and
+exits non-zero if any plan falls back to a full scan of ``properties``.
+"""
+import os
+import sys
+import tempfile
+
+from sqlalchemy import text
+
+from benchmarks.common import sqlite_session, synthetic_properties
+from database import create_missing_indexes
+from models import Property
+from services.property_service import PropertyService
+
+FILTER_SHAPES = [
+    ({}, "id"),
+    ({}, "-created_at"),
+    ({"property_types": ["flat", "house"]}, "id"),
+    ({"property_type": "flat", "bedrooms": 2}, "id"),
+    ({"property_types": ["flat"], "bedrooms_min": 2, "bedrooms_max": 3}, "-bedrooms"),
+    ({"epc_ratings": ["A", "B", "C"]}, "id"),
+    ({"size_min": 800, "size_max": 1500}, "size_sqft"),
+    ({"value_min": 200_000}, "-value"),
+    ({"ids": [1, 2, 3]}, "id"),
+]
+
+
+def explain(db, statement) -> list:
+    compiled = statement.compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True})
+    return [row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))]
+
+
+def main() -> int:
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db = sqlite_session(os.path.join(tmp, "explain.db"))
+        create_missing_indexes(db.get_bind())
+        db.execute(Property.__table__.insert(), synthetic_properties(20_000, users=50).to_dict("records"))
+        db.commit()
+        db.execute(text("ANALYZE"))
+
+        service = PropertyService(db)
+        for filters, sort in FILTER_SHAPES:
+            plan = explain(db, service._filter_query(7, filters, sort).statement)
+            full_scan = any(step.startswith("SCAN properties") for step in plan)
+            failures += full_scan
+            print(f"{'FAIL' if full_scan else 'ok  '} {filters} sort={sort}")
+            for step in plan:
+                print(f"       {step}")
+        db.close()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
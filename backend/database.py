@@ -1,23 +1,189 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from typing import Dict, Optional
 from sqlalchemy.ext.declarative import declarative_base
 import os
+import threading
+import time
 
 # Database URL - using SQLite for development, can be changed to PostgreSQL for production
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./property_intel.db")
 
-engine = create_engine(
-    DATABASE_URL, 
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-)
+# Engine tuning profile: "tuned" applies the settings below, "default" leaves
+# SQLAlchemy/driver defaults (kept for comparison benchmarks)
+DATABASE_PROFILE = os.getenv("DATABASE_PROFILE", "tuned")
+
+# Set on every new SQLite connection. WAL lets readers proceed while a writer
+# commits; synchronous=NORMAL is durable across app crashes in WAL mode (only
+# an OS crash can lose the last commits). cache_size is negative KiB.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+# Connection pool settings. The async SQLite engine keeps NullPool: aiosqlite
+# connections are tied to the event loop that opened them
+POOL_OPTIONS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+}
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def engine_options(url: str, profile: str = DATABASE_PROFILE, is_async: bool = False) -> dict:
+    """Keyword arguments for create_engine / create_async_engine under ``profile``"""
+    parsed = make_url(url)
+    options = {}
+    if parsed.get_backend_name() != "sqlite":
+        if profile == "tuned":
+            options.update(POOL_OPTIONS)
+    elif not is_async:
+        options["connect_args"] = {"check_same_thread": False}
+        if profile == "tuned" and parsed.database not in (None, "", ":memory:"):
+            # File databases get a QueuePool; size it like the server pools
+            options.update(
+                pool_size=POOL_OPTIONS["pool_size"],
+                max_overflow=POOL_OPTIONS["max_overflow"],
+                pool_timeout=POOL_OPTIONS["pool_timeout"],
+            )
+    return options
+
+
+def configure_engine(engine, profile: str = DATABASE_PROFILE):
+    """Attach per-connection setup for ``profile``; accepts sync or async engines"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if profile == "tuned" and sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+def create_db_engine(url: str, profile: str = DATABASE_PROFILE):
+    return configure_engine(create_engine(url, **engine_options(url, profile)), profile)
+
+
+def create_async_db_engine(url: str, profile: str = DATABASE_PROFILE):
+    return configure_engine(create_async_engine(url, **engine_options(url, profile, is_async=True)), profile)
+
+
+engine = create_db_engine(DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async drivers for the API; the sync engine above stays for Streamlit,
+# startup tasks, background threads and scripts
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto its async driver (aiosqlite / asyncpg)"""
+    parsed = make_url(url.replace("postgres://", "postgresql://", 1))
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend!r} databases")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+async_engine = create_async_db_engine(os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL))
+
+# expire_on_commit=False: attributes must stay loaded after commit, since an
+# expired attribute cannot lazy-load outside an await
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Optional read replica. Read-only dependencies (listing, get, search,
+# analysis) use it; everything else, and any user who wrote within the last
+# READ_YOUR_WRITES_SECONDS, stays on the primary. Without DATABASE_READ_URL
+# the read factories are bound to the primary.
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+if DATABASE_READ_URL:
+    read_engine = create_db_engine(DATABASE_READ_URL)
+    async_read_engine = create_async_db_engine(
+        os.getenv("ASYNC_DATABASE_READ_URL") or async_database_url(DATABASE_READ_URL)
+    )
+else:
+    read_engine = engine
+    async_read_engine = async_engine
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
+
+class RecentWrites:
+    """Per-process record of when each user last committed to the primary.
+
+    Sessions tagged with ``session.info["user_id"]`` mark the user on
+    commit; reads for that user go to the primary until the window passes,
+    so a replica that lags by less than ``window`` never hides their own
+    writes. With several workers, pair this with sticky sessions or a
+    window that covers the replica's worst-case lag.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._last_write: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def mark(self, user_id: int):
+        with self._lock:
+            self._last_write[user_id] = time.monotonic()
+            if len(self._last_write) > 10_000:
+                cutoff = time.monotonic() - self.window
+                self._last_write = {u: t for u, t in self._last_write.items() if t > cutoff}
+
+    def is_recent(self, user_id: int) -> bool:
+        with self._lock:
+            last_write = self._last_write.get(user_id)
+        return last_write is not None and time.monotonic() - last_write < self.window
+
+
+recent_writes = RecentWrites(READ_YOUR_WRITES_SECONDS)
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_recent_write(session):
+    user_id = session.info.get("user_id")
+    if user_id is not None:
+        recent_writes.mark(user_id)
+
+
+def read_session_factory(user_id: Optional[int] = None, is_async: bool = True):
+    """Session factory for a read on behalf of ``user_id``: the replica, unless they just wrote"""
+    if read_engine is engine or (user_id is not None and recent_writes.is_recent(user_id)):
+        return AsyncSessionLocal if is_async else SessionLocal
+    return AsyncReadSessionLocal if is_async else ReadSessionLocal
+
 Base = declarative_base()
 
+def create_missing_indexes(bind=None):
+    """Create indexes declared on existing tables (create_all only adds them to new tables)"""
+    bind = bind or engine
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,33 +1,60 @@
-from fastapi import FastAPI, HTTPException, Depends, status, UploadFile, File
+from fastapi import FastAPI, HTTPException, Depends, status, UploadFile, File, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import os
 import json
-import pandas as pd
+import logging
 from datetime import datetime, timedelta
 import uuid
+import shutil
 from pathlib import Path
 
-from database import get_db, engine, SessionLocal
-from models import User, Property, PropertyMedia
+from database import (
+    get_db, get_async_db, read_session_factory, engine, SessionLocal, create_missing_indexes
+)
+from models import User, Property, PropertyMedia, AnalysisJob
 from schemas import (
     UserCreate, UserLogin, UserResponse,
-    PropertyCreate, PropertyUpdate, PropertyResponse,
-    PropertyAnalysis, Token
+    PropertyCreate, PropertyUpdate, PropertyResponse, PropertyPage, PropertyImportReport,
+    PropertySelection, PropertyBulkUpdate, PropertyBulkResult, PropertyFilter, PropertySort,
+    PropertyAnalysis, PropertyStatistics, Token, AnalysisJobCreate, AnalysisJobResponse,
+    ComparablesResponse, ComparablesScope, AreaBenchmark, DatazoneStatsStatus,
+    PostcodeResolveRequest, PostcodeResolveResponse, PostcodeResolution,
+    PostcodeDatasetStatus, PostcodeSuggestions
+)
+from auth import (
+    create_access_token, decode_token, get_password_hash, get_password_hash_async, verify_password_async,
+    AuthenticatedUser, token_cache
 )
-from auth import create_access_token, verify_token, get_password_hash, verify_password
-from services.property_service import PropertyService
-from services.analysis_service import AnalysisService
+from services.property_service import PropertyService, AsyncPropertyService, encode_cursor, decode_cursor
+from services.analysis_service import AsyncAnalysisService
+from services.cache_service import analysis_etag
+from services.comparables_service import find_comparables
+from services.datazone_service import datazone_benchmark, datazone_stats_rebuilds, latest_stats_run
+from services.job_service import analysis_jobs, expire_stale_jobs, fail_job, job_result, new_job
+from services.search_service import ensure_search_index
+from services.portfolio_service import PortfolioAccumulator, apply_portfolio_delta_async, backfill_portfolio_aggregates
+from services.import_service import PropertyImportService, detect_import_format
+from services.postcode_service import PostcodeDataset, PostcodeDatasetManager, read_postcodes
 from dotenv import load_dotenv
 
 # Load environment variables at the very beginning
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Create tables
 import models
 models.Base.metadata.create_all(bind=engine)
+create_missing_indexes(engine)
+ensure_search_index(engine)
+backfill_portfolio_aggregates(engine)
 
 app = FastAPI(
     title="Purva.ai Property Intelligence API",
@@ -53,17 +80,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 security = HTTPBearer()
 
-# Load postcode data
-try:
-    postcode_df = pd.read_csv("../postcode_to_datazone.csv")
-    postcode_df["Postcode"] = postcode_df["Postcode"].str.strip().str.upper().str.replace(" ", "")
-except Exception:
-    # Fallback to empty DataFrame if file missing in dev
-    postcode_df = pd.DataFrame({"Postcode": [], "DataZone2011Code": []})
+# Load postcode data (empty index if file missing in dev; see /api/postcodes/dataset)
+postcode_datasets = PostcodeDatasetManager(os.getenv("POSTCODE_DATA_PATH", "../postcode_to_datazone.csv"))
+postcode_datasets.load()
 
 
 def ensure_default_admin():
@@ -98,19 +122,35 @@ def ensure_default_admin():
 @app.on_event("startup")
 def on_startup():
     ensure_default_admin()
+    expired = expire_stale_jobs(engine)
+    if expired:
+        print(f"Marked {expired} stale analysis job(s) as failed")
 
-# Dependency injection for services
-def get_property_service(db: Session = Depends(get_db)) -> PropertyService:
-    return PropertyService(db)
+@app.on_event("shutdown")
+def on_shutdown():
+    analysis_jobs.shutdown()
+
+# Blocking work policy: routes are async and use AsyncSession (get_read_db / get_write_db),
+# so DB I/O never holds a thread. CPU-heavy or file-bound work is moved off
+# the loop: bcrypt runs on the password-hash pool and file writes on the
+# threadpool. Long batch routes (import) and background tasks keep the sync
+# Session and are plain `def`, which FastAPI runs on its threadpool.
 
-def get_analysis_service(db: Session = Depends(get_db)) -> AnalysisService:
-    return AnalysisService(db)
+async def _find_user(db: AsyncSession, email: str) -> Optional[User]:
+    return await db.scalar(select(User).where(User.email == email))
+
+async def _lookup_user(db: AsyncSession, email: str) -> Optional[User]:
+    # Hand the pooled connection back before queueing for bcrypt, or a login
+    # storm pins the whole pool while it waits for a hash worker
+    user = await _find_user(db, email)
+    await db.close()
+    return user
 
 # Auth endpoints
 @app.post("/api/auth/register", response_model=UserResponse)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Check if user exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await _lookup_user(db, user_data.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -118,15 +158,15 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     user = User(
         email=user_data.email,
         full_name=user_data.full_name,
         hashed_password=hashed_password
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     # Create access token
     access_token = create_access_token(data={"sub": user.email})
@@ -140,9 +180,9 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     )
 
 @app.post("/api/auth/login", response_model=UserResponse)
-async def login(user_data: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == user_data.email).first()
-    if not user or not verify_password(user_data.password, user.hashed_password):
+async def login(user_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    user = await _lookup_user(db, user_data.email)
+    if not user or not await verify_password_async(user_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -160,36 +200,205 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-):
-    email = verify_token(credentials.credentials)
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
+    db: AsyncSession = Depends(get_async_db)
+) -> AuthenticatedUser:
+    token = credentials.credentials
+    cached_user = token_cache.get(token)
+    if cached_user is not None:
+        return cached_user
+
+    claims = decode_token(token)
+    user = await _find_user(db, claims["sub"])
+    if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials"
         )
-    return user
+    current_user = AuthenticatedUser.from_user(user)
+    token_cache.put(token, current_user, claims.get("exp"))
+    return current_user
+
+async def get_admin_user(current_user: AuthenticatedUser = Depends(get_current_user)) -> AuthenticatedUser:
+    # Global maintenance touches every user's data; see ADMIN_EMAILS
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
+
+# Sessions: reads go to the replica (if configured) unless the user wrote
+# recently; writes go to the primary and start the user's read-your-writes window
+async def get_read_db(current_user: AuthenticatedUser = Depends(get_current_user)):
+    async with read_session_factory(current_user.id)() as db:
+        yield db
+
+def get_sync_read_db(current_user: AuthenticatedUser = Depends(get_current_user)):
+    db = read_session_factory(current_user.id, is_async=False)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_write_db(
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+) -> AsyncSession:
+    db.info["user_id"] = current_user.id
+    return db
+
+# Dependency injection for services
+def get_read_property_service(db: AsyncSession = Depends(get_read_db)) -> AsyncPropertyService:
+    return AsyncPropertyService(db)
+
+def get_write_property_service(db: AsyncSession = Depends(get_write_db)) -> AsyncPropertyService:
+    return AsyncPropertyService(db)
+
+def get_analysis_service(db: AsyncSession = Depends(get_read_db)) -> AsyncAnalysisService:
+    return AsyncAnalysisService(db)
+
+@app.get("/api/auth/cache-stats")
+async def get_auth_cache_stats(current_user: AuthenticatedUser = Depends(get_current_user)):
+    return token_cache.stats()
 
 # Property endpoints
 @app.get("/api/properties", response_model=List[PropertyResponse])
 async def get_properties(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    property_service: AsyncPropertyService = Depends(get_read_property_service)
+):
+    return await property_service.get_properties(current_user.id, limit=None)
+
+@app.get("/api/properties/page", response_model=PropertyPage)
+async def get_properties_page(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    property_service: AsyncPropertyService = Depends(get_read_property_service)
+):
+    try:
+        after_id = decode_cursor(cursor) if cursor else 0
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+    items, last_id = await property_service.get_properties_page(current_user.id, limit, after_id)
+    return PropertyPage(
+        items=items,
+        next_cursor=encode_cursor(last_id) if last_id is not None else None
+    )
+
+@app.get("/api/properties/search", response_model=List[PropertyResponse])
+async def search_properties(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    property_service: AsyncPropertyService = Depends(get_read_property_service)
 ):
-    properties = db.query(Property).filter(Property.user_id == current_user.id).all()
-    return properties
+    return await property_service.search_properties(current_user.id, q, limit)
+
+@app.get("/api/properties/filter", response_model=List[PropertyResponse])
+async def filter_properties(
+    property_type: List[str] = Query(None),
+    epc_rating: List[str] = Query(None),
+    bedrooms_min: Optional[int] = None,
+    bedrooms_max: Optional[int] = None,
+    size_min: Optional[int] = None,
+    size_max: Optional[int] = None,
+    value_min: Optional[float] = None,
+    value_max: Optional[float] = None,
+    sort: PropertySort = "id",
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    property_service: AsyncPropertyService = Depends(get_read_property_service)
+):
+    # property_type / epc_rating may be repeated for multi-select
+    filters = PropertyFilter(
+        property_types=property_type,
+        epc_ratings=epc_rating,
+        bedrooms_min=bedrooms_min,
+        bedrooms_max=bedrooms_max,
+        size_min=size_min,
+        size_max=size_max,
+        value_min=value_min,
+        value_max=value_max
+    )
+    return await property_service.filter_properties(
+        current_user.id, filters.model_dump(), sort=sort, limit=limit, offset=offset
+    )
+
+@app.get("/api/properties/statistics", response_model=PropertyStatistics)
+async def get_property_statistics(
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    property_service: AsyncPropertyService = Depends(get_read_property_service)
+):
+    # Aggregated in the database; no property rows are loaded
+    return await property_service.get_property_statistics(current_user.id)
+
+def _not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match", "")
+    return etag in (tag.strip() for tag in if_none_match.split(","))
+
+def _revalidate(
+    request: Request, response: Response, user_id: int, kind: str, version: int, params=None
+) -> Optional[Response]:
+    # Reports are pure functions of the portfolio version (and params), so revalidation
+    # costs one version lookup: returns a 304 if the client's copy is current,
+    # otherwise sets the ETag on the response about to be built
+    if not version:
+        return None
+    etag = analysis_etag(user_id, kind, version, params)
+    if _not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return None
+
+@app.get("/api/properties/analysis", response_model=PropertyAnalysis)
+async def get_portfolio_analysis(
+    request: Request,
+    response: Response,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    property_service: AsyncPropertyService = Depends(get_read_property_service)
+):
+    version = await property_service.portfolio_version(current_user.id)
+    params = await property_service.analysis_cache_params()
+    not_modified = _revalidate(request, response, current_user.id, "portfolio", version, params)
+    if not_modified:
+        return not_modified
+
+    analysis_result = await property_service.analyze_portfolio(current_user.id)
+    if not analysis_result.total_properties:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No properties found for analysis"
+        )
+    return analysis_result
+
+@app.get("/api/properties/stream")
+async def stream_properties(current_user: AuthenticatedUser = Depends(get_current_user)):
+    user_id = current_user.id
+
+    async def generate():
+        # Own session: the response body is produced after the request's
+        # dependencies may already have been torn down
+        async with read_session_factory(user_id)() as db:
+            async for property_obj in AsyncPropertyService(db).iter_properties(user_id):
+                yield PropertyResponse.model_validate(property_obj).model_dump_json() + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
 
 @app.post("/api/properties", response_model=PropertyResponse)
 async def create_property(
     property_data: PropertyCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_write_db)
 ):
     # Get datazone from postcode
-    postcode_clean = property_data.postcode.strip().upper().replace(" ", "")
-    dz_match = postcode_df[postcode_df["Postcode"] == postcode_clean]
-    datazone = dz_match.iloc[0]["DataZone2011Code"] if not dz_match.empty else None
+    datazone = postcode_datasets.index.lookup(property_data.postcode)
     
     property_dict = property_data.model_dump()
     property_dict.update({
@@ -200,21 +409,72 @@ async def create_property(
     
     property_obj = Property(**property_dict)
     db.add(property_obj)
-    db.commit()
-    db.refresh(property_obj)
+    delta = PortfolioAccumulator()
+    delta.add(property_obj)
+    await apply_portfolio_delta_async(db, current_user.id, delta)
+    await db.commit()
+    await db.refresh(property_obj)
     
     return property_obj
 
-@app.get("/api/properties/{property_id}", response_model=PropertyResponse)
-async def get_property(
-    property_id: int,
-    current_user: User = Depends(get_current_user),
+@app.post("/api/properties/import", response_model=PropertyImportReport)
+def import_properties(
+    file: UploadFile = File(...),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    property_obj = db.query(Property).filter(
+    # CSV with a header row, or JSONL with one PropertyCreate object per line.
+    # Valid rows are inserted in chunks; invalid ones are reported by row number.
+    fmt = detect_import_format(file.filename, file.content_type)
+    db.info["user_id"] = current_user.id
+    import_service = PropertyImportService(db, postcode_datasets.index)
+    return import_service.import_file(file.file, fmt, current_user.id)
+
+def _require_selection(selection: PropertySelection):
+    # An empty selection would silently target the whole portfolio
+    if not selection.model_dump(exclude_none=True, exclude={"patch"}):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide ids or at least one filter"
+        )
+
+@app.post("/api/properties/bulk-update", response_model=PropertyBulkResult)
+async def bulk_update_properties(
+    request: PropertyBulkUpdate,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    property_service: AsyncPropertyService = Depends(get_write_property_service)
+):
+    _require_selection(request)
+    patch = request.patch.model_dump(exclude_unset=True)
+    if not patch:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Patch has no fields to update"
+        )
+    if "postcode" in patch:
+        patch["datazone"] = postcode_datasets.index.lookup(patch["postcode"])
+
+    selection = request.model_dump(exclude={"patch"})
+    matched = await property_service.bulk_update_properties(current_user.id, selection, patch)
+    return PropertyBulkResult(matched=matched)
+
+@app.post("/api/properties/bulk-delete", response_model=PropertyBulkResult)
+async def bulk_delete_properties(
+    selection: PropertySelection,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    property_service: AsyncPropertyService = Depends(get_write_property_service)
+):
+    _require_selection(selection)
+    deleted, media_deleted = await property_service.bulk_delete_properties(
+        current_user.id, selection.model_dump()
+    )
+    return PropertyBulkResult(matched=deleted, media_deleted=media_deleted)
+
+async def _get_owned_property(db: AsyncSession, property_id: int, user_id: int) -> Property:
+    property_obj = await db.scalar(select(Property).where(
         Property.id == property_id,
-        Property.user_id == current_user.id
-    ).first()
+        Property.user_id == user_id
+    ))
     
     if not property_obj:
         raise HTTPException(
@@ -224,73 +484,70 @@ async def get_property(
     
     return property_obj
 
+@app.get("/api/properties/{property_id}", response_model=PropertyResponse)
+async def get_property(
+    property_id: int,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return await _get_owned_property(db, property_id, current_user.id)
+
 @app.put("/api/properties/{property_id}", response_model=PropertyResponse)
 async def update_property(
     property_id: int,
     property_data: PropertyUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_write_db)
 ):
-    property_obj = db.query(Property).filter(
-        Property.id == property_id,
-        Property.user_id == current_user.id
-    ).first()
+    property_obj = await _get_owned_property(db, property_id, current_user.id)
     
-    if not property_obj:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Property not found"
-        )
+    delta = PortfolioAccumulator()
+    delta.remove(property_obj)
     
     # Update fields
-    for field, value in property_data.model_dump(exclude_unset=True).items():
+    updates = property_data.model_dump(exclude_unset=True)
+    if "postcode" in updates:
+        updates["datazone"] = postcode_datasets.index.lookup(updates["postcode"])
+    for field, value in updates.items():
         setattr(property_obj, field, value)
     
     property_obj.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(property_obj)
+    delta.add(property_obj)
+    await apply_portfolio_delta_async(db, current_user.id, delta)
+    await db.commit()
+    await db.refresh(property_obj)
     
     return property_obj
 
 @app.delete("/api/properties/{property_id}")
 async def delete_property(
     property_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_write_db)
 ):
-    property_obj = db.query(Property).filter(
-        Property.id == property_id,
-        Property.user_id == current_user.id
-    ).first()
+    property_obj = await _get_owned_property(db, property_id, current_user.id)
     
-    if not property_obj:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Property not found"
-        )
-    
-    db.delete(property_obj)
-    db.commit()
+    delta = PortfolioAccumulator()
+    delta.remove(property_obj)
+    await db.delete(property_obj)
+    await apply_portfolio_delta_async(db, current_user.id, delta)
+    await db.commit()
     
     return {"message": "Property deleted successfully"}
 
+def _save_upload(file: UploadFile, file_path: Path) -> int:
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+    return file_path.stat().st_size
+
 @app.post("/api/properties/{property_id}/upload")
 async def upload_property_media(
     property_id: int,
     files: List[UploadFile] = File(...),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_write_db)
 ):
-    property_obj = db.query(Property).filter(
-        Property.id == property_id,
-        Property.user_id == current_user.id
-    ).first()
-    
-    if not property_obj:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Property not found"
-        )
+    await _get_owned_property(db, property_id, current_user.id)
     
     uploaded_files = []
     media_dir = Path(f"media/{current_user.id}/{property_id}")
@@ -299,46 +556,321 @@ async def upload_property_media(
     for file in files:
         file_id = str(uuid.uuid4())
         file_path = media_dir / f"{file_id}_{file.filename}"
-        
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        file_size = await run_in_threadpool(_save_upload, file, file_path)
         
         # Save to database
         media = PropertyMedia(
             property_id=property_id,
             filename=file.filename,
             file_path=str(file_path),
-            file_size=len(content),
+            file_size=file_size,
             mime_type=file.content_type
         )
         db.add(media)
         uploaded_files.append(file.filename)
     
-    db.commit()
+    await db.commit()
     
     return {"uploaded_files": uploaded_files}
 
 @app.post("/api/properties/analyze", response_model=PropertyAnalysis)
 async def analyze_properties(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    analysis_service: AnalysisService = Depends(get_analysis_service)
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    property_service: AsyncPropertyService = Depends(get_read_property_service)
 ):
-    properties = db.query(Property).filter(Property.user_id == current_user.id).all()
+    analysis_result = await property_service.analyze_portfolio(current_user.id)
     
-    if not properties:
+    if not analysis_result.total_properties:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No properties found for analysis"
         )
     
-    # Use PropertyService to get the analysis
-    property_service = PropertyService(db)
-    analysis_result = property_service.analyze_portfolio(current_user.id)
-    
     return analysis_result
 
+# Report endpoints. Each request builds its reports from one portfolio
+# snapshot (AsyncAnalysisService shares it across calls) and every report is
+# memoized per portfolio version, so /reports costs at most one load.
+def _comparison_ids(ids: Optional[List[int]]) -> Optional[List[int]]:
+    if ids is None:
+        return None
+    ids = sorted(set(ids))
+    if len(ids) < 2:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least 2 property ids required for comparison"
+        )
+    return ids
+
+@app.get("/api/analysis/market")
+async def get_market_analysis(
+    request: Request,
+    response: Response,
+    location: Optional[str] = Query(None, description="Postcode substring, e.g. EH1"),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    analysis_service: AsyncAnalysisService = Depends(get_analysis_service)
+):
+    version = await analysis_service.portfolio_version(current_user.id)
+    not_modified = _revalidate(request, response, current_user.id, "market", version, (location or "").upper())
+    if not_modified:
+        return not_modified
+    return await analysis_service.market_analysis(current_user.id, location)
+
+@app.get("/api/analysis/optimization")
+async def get_portfolio_optimization(
+    request: Request,
+    response: Response,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    analysis_service: AsyncAnalysisService = Depends(get_analysis_service)
+):
+    version = await analysis_service.portfolio_version(current_user.id)
+    not_modified = _revalidate(request, response, current_user.id, "optimization", version)
+    if not_modified:
+        return not_modified
+    return await analysis_service.portfolio_optimization(current_user.id)
+
+@app.get("/api/analysis/comparison")
+async def get_property_comparison(
+    request: Request,
+    response: Response,
+    ids: List[int] = Query(..., description="Property ids to compare (at least 2)"),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    analysis_service: AsyncAnalysisService = Depends(get_analysis_service)
+):
+    ids = _comparison_ids(ids)
+    version = await analysis_service.portfolio_version(current_user.id)
+    not_modified = _revalidate(request, response, current_user.id, "comparison", version, ids)
+    if not_modified:
+        return not_modified
+    return await analysis_service.property_comparison(ids, current_user.id)
+
+@app.get("/api/analysis/reports")
+async def get_analysis_reports(
+    request: Request,
+    response: Response,
+    location: Optional[str] = Query(None),
+    ids: Optional[List[int]] = Query(None),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    analysis_service: AsyncAnalysisService = Depends(get_analysis_service)
+):
+    # Market and optimization (plus comparison with ids) in one round trip
+    ids = _comparison_ids(ids)
+    version = await analysis_service.portfolio_version(current_user.id)
+    params = {"location": (location or "").upper(), "ids": ids}
+    not_modified = _revalidate(request, response, current_user.id, "reports", version, params)
+    if not_modified:
+        return not_modified
+    return await analysis_service.reports(current_user.id, location, ids)
+
+@app.get("/api/properties/{property_id}/comparables", response_model=ComparablesResponse)
+def get_comparable_properties(
+    property_id: int,
+    k: int = Query(20, ge=1, le=100),
+    scope: ComparablesScope = Query("portfolio"),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_sync_read_db)
+):
+    # Sync route: the index search is NumPy work, so it runs on the threadpool
+    comparables = find_comparables(db, current_user.id, property_id, k, scope)
+    if comparables is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Property not found"
+        )
+    return comparables
+
+def _job_response(job: AnalysisJob) -> AnalysisJobResponse:
+    return AnalysisJobResponse(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        progress=job.progress,
+        message=job.message,
+        error=job.error,
+        result=job_result(job),
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+# Analysis jobs run on the worker processes (services/job_service.py), so a
+# heavy analysis never ties up an API worker; clients poll the job for
+# progress and the result. Job rows are read from the primary since the
+# workers write them.
+@app.post("/api/analysis/jobs", response_model=AnalysisJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_analysis_job(
+    request: AnalysisJobCreate,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if request.kind == "comparison" and len(request.property_ids or []) < 2:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Comparison needs at least 2 property_ids"
+        )
+    job = new_job(current_user.id, request.kind, request.model_dump(exclude={"kind"}, exclude_none=True))
+    db.add(job)
+    await db.commit()
+    try:
+        analysis_jobs.submit(job.id)
+    except Exception as exc:
+        # The row is already committed; fail it so polls see a terminal state
+        await run_in_threadpool(fail_job, job.id, f"Could not start: {type(exc).__name__}: {exc}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Analysis workers are unavailable, try again shortly"
+        )
+    return _job_response(job)
+
+@app.get("/api/analysis/jobs", response_model=List[AnalysisJobResponse])
+async def list_analysis_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    jobs = await db.scalars(
+        select(AnalysisJob)
+        .where(AnalysisJob.user_id == current_user.id)
+        .order_by(AnalysisJob.created_at.desc())
+        .limit(limit)
+    )
+    return [_job_response(job) for job in jobs]
+
+@app.get("/api/analysis/jobs/{job_id}", response_model=AnalysisJobResponse)
+async def get_analysis_job(
+    job_id: str,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    job = await db.scalar(select(AnalysisJob).where(
+        AnalysisJob.id == job_id,
+        AnalysisJob.user_id == current_user.id
+    ))
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Analysis job not found"
+        )
+    return _job_response(job)
+
+def _postcode_resolve_response(postcodes: List[str]) -> PostcodeResolveResponse:
+    datazones = postcode_datasets.index.resolve_many(postcodes)
+    resolved = sum(1 for dz in datazones if dz is not None)
+    return PostcodeResolveResponse(
+        results=[
+            PostcodeResolution(postcode=postcode, datazone=datazone)
+            for postcode, datazone in zip(postcodes, datazones)
+        ],
+        resolved=resolved,
+        unresolved=len(postcodes) - resolved
+    )
+
+# Postcode endpoints
+@app.post("/api/postcodes/resolve", response_model=PostcodeResolveResponse)
+def resolve_postcodes(
+    request: PostcodeResolveRequest,
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    return _postcode_resolve_response(request.postcodes)
+
+@app.post("/api/postcodes/resolve/file", response_model=PostcodeResolveResponse)
+def resolve_postcodes_file(
+    file: UploadFile = File(...),
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    # One postcode per line (or a CSV whose first column is the postcode)
+    return _postcode_resolve_response(read_postcodes(file.file))
+
+@app.get("/api/postcodes/autocomplete", response_model=PostcodeSuggestions)
+async def autocomplete_postcodes(
+    q: str = Query(..., min_length=1, max_length=10),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    suggestions = postcode_datasets.index.suggest(q, limit)
+    return PostcodeSuggestions(
+        query=q,
+        suggestions=[
+            PostcodeResolution(postcode=postcode, datazone=datazone)
+            for postcode, datazone in suggestions
+        ]
+    )
+
+def _reresolve_datazones(dataset: PostcodeDataset):
+    db = SessionLocal()
+    try:
+        updated = PropertyService(db).resolve_datazones(dataset.index)
+        logger.info("Postcode dataset %s: re-resolved %d property datazones", dataset.version, updated)
+    finally:
+        db.close()
+    if updated:
+        datazone_stats_rebuilds.start(analysis_jobs.run)
+
+@app.get("/api/postcodes/dataset", response_model=PostcodeDatasetStatus)
+async def get_postcode_dataset(current_user: AuthenticatedUser = Depends(get_current_user)):
+    return postcode_datasets.status()
+
+@app.post("/api/postcodes/dataset/reload", response_model=PostcodeDatasetStatus, status_code=status.HTTP_202_ACCEPTED)
+async def reload_postcode_dataset(current_user: AuthenticatedUser = Depends(get_admin_user)):
+    # Builds the new index in the background and swaps it in when ready;
+    # existing properties are then re-resolved in batches. Other workers
+    # notice the new files on their own (PostcodeDatasetManager.check_for_release)
+    if not postcode_datasets.reload_in_background(on_swap=_reresolve_datazones):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A postcode dataset reload is already running"
+        )
+    return postcode_datasets.status()
+
+async def _datazone_stats_status(db: AsyncSession) -> DatazoneStatsStatus:
+    run = await db.run_sync(latest_stats_run)
+    if run is None:
+        return DatazoneStatsStatus(generation=0, rebuilding=datazone_stats_rebuilds.running)
+    return DatazoneStatsStatus(
+        generation=run.generation,
+        datazones=run.datazones,
+        properties=run.properties,
+        finished_at=run.finished_at,
+        rebuilding=datazone_stats_rebuilds.running
+    )
+
+@app.get("/api/datazones/stats", response_model=DatazoneStatsStatus)
+async def get_datazone_stats_status(db: AsyncSession = Depends(get_read_db)):
+    return await _datazone_stats_status(db)
+
+@app.post("/api/datazones/stats/rebuild", response_model=DatazoneStatsStatus, status_code=status.HTTP_202_ACCEPTED)
+async def start_datazone_stats_rebuild(
+    current_user: AuthenticatedUser = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    # Aggregates every portfolio on a job worker process, competing with
+    # user analysis jobs, so only admins may start it; analyses pick up the
+    # new generation once it is committed
+    try:
+        started = datazone_stats_rebuilds.start(analysis_jobs.run)
+    except Exception as exc:
+        logger.warning("Could not start datazone stats rebuild: %s: %s", type(exc).__name__, exc)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Analysis workers are unavailable, try again shortly"
+        )
+    if not started:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A datazone stats rebuild is already running"
+        )
+    return await _datazone_stats_status(db)
+
+@app.get("/api/datazones/{datazone}/stats", response_model=AreaBenchmark)
+async def get_datazone_stats(datazone: str, db: AsyncSession = Depends(get_read_db)):
+    benchmark = await db.run_sync(datazone_benchmark, datazone.strip().upper())
+    if benchmark is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No stats for this datazone"
+        )
+    return benchmark
+
 @app.get("/")
 async def root():
     return {
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import BigInteger, Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -22,6 +22,16 @@ class User(Base):
 
 class Property(Base):
     __tablename__ = "properties"
+    __table_args__ = (
+        # Every listing/filter is scoped by user_id; these serve keyset paging
+        # and the common filter/sort shapes without a table scan
+        Index("ix_properties_user_id_id", "user_id", "id"),
+        Index("ix_properties_user_type_bedrooms", "user_id", "property_type", "bedrooms"),
+        Index("ix_properties_user_epc", "user_id", "epc_rating"),
+        Index("ix_properties_user_size", "user_id", "size_sqft"),
+        # Joins a portfolio's datazones to datazone_stats from the index alone
+        Index("ix_properties_user_datazone", "user_id", "datazone"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -84,3 +94,118 @@ class PropertyMedia(Base):
     
     # Relationships
     property = relationship("Property", back_populates="media")
+
+class PortfolioAggregate(Base):
+    """Per-user running totals behind portfolio analysis, kept current by
+    delta updates in every property write path (see services/portfolio_service.py)"""
+    __tablename__ = "portfolio_aggregates"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    # Bumped on every change; lets readers key caches on the portfolio state
+    version = Column(Integer, nullable=False, default=1)
+
+    total = Column(Integer, nullable=False, default=0)
+    epc_sum = Column(Integer, nullable=False, default=0)
+    epc_count = Column(Integer, nullable=False, default=0)
+    good_epc = Column(Integer, nullable=False, default=0)
+    poor_epc = Column(Integer, nullable=False, default=0)
+    sized = Column(Integer, nullable=False, default=0)
+    size_sum = Column(BigInteger, nullable=False, default=0)
+    parking = Column(Integer, nullable=False, default=0)
+    garden = Column(Integer, nullable=False, default=0)
+    solar_panels = Column(Integer, nullable=False, default=0)
+    new_build = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class PortfolioTypeCount(Base):
+    __tablename__ = "portfolio_type_counts"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    property_type = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class DatazoneStats(Base):
+    """Benchmarks for one datazone across every portfolio, rebuilt in bulk
+    by services/datazone_service.py; rows belong to one stats run"""
+    __tablename__ = "datazone_stats"
+
+    datazone = Column(String, primary_key=True)
+    generation = Column(Integer, nullable=False)
+
+    properties = Column(Integer, nullable=False)
+    sized = Column(Integer, nullable=False)
+    median_size_sqft = Column(Float)
+    # Properties per EPC band; unrated ones are properties minus their sum
+    epc_a = Column(Integer, nullable=False, default=0)
+    epc_b = Column(Integer, nullable=False, default=0)
+    epc_c = Column(Integer, nullable=False, default=0)
+    epc_d = Column(Integer, nullable=False, default=0)
+    epc_e = Column(Integer, nullable=False, default=0)
+    epc_f = Column(Integer, nullable=False, default=0)
+    epc_g = Column(Integer, nullable=False, default=0)
+    parking = Column(Integer, nullable=False, default=0)
+    garden = Column(Integer, nullable=False, default=0)
+    solar_panels = Column(Integer, nullable=False, default=0)
+    new_build = Column(Integer, nullable=False, default=0)
+
+class DatazoneStatsRun(Base):
+    __tablename__ = "datazone_stats_runs"
+
+    # The latest finished run's generation is the one in datazone_stats
+    generation = Column(Integer, primary_key=True, autoincrement=True)
+    datazones = Column(Integer)
+    properties = Column(Integer)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+class PortfolioAnalysisRun(Base):
+    """One batch re-analysis of every portfolio (see services/batch_analysis_service.py)"""
+    __tablename__ = "portfolio_analysis_runs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # running -> succeeded | failed
+    status = Column(String, nullable=False, default="running")
+    workers = Column(Integer)
+    shards = Column(Integer)
+    users = Column(Integer)
+    error = Column(Text)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+class PortfolioAnalysisResult(Base):
+    __tablename__ = "portfolio_analysis_results"
+
+    run_id = Column(Integer, ForeignKey("portfolio_analysis_runs.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True, index=True)
+
+    total_properties = Column(Integer, nullable=False)
+    avg_epc_rating = Column(String)
+    energy_efficiency_score = Column(Float)
+    investment_score = Column(Float)
+    risk_assessment = Column(String)
+    result = Column(Text)  # the full PropertyAnalysis as JSON
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+class AnalysisJob(Base):
+    """An analysis run by the background job workers (see services/job_service.py)"""
+    __tablename__ = "analysis_jobs"
+    __table_args__ = (
+        Index("ix_analysis_jobs_user_created", "user_id", "created_at"),
+    )
+
+    id = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind = Column(String, nullable=False)
+    params = Column(Text)  # JSON
+
+    # queued -> running -> succeeded | failed
+    status = Column(String, nullable=False, default="queued", index=True)
+    progress = Column(Float, nullable=False, default=0.0)
+    message = Column(String)
+    result = Column(Text)  # JSON, set on success
+    error = Column(Text)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
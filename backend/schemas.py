@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field, field_validator
+from typing import Any, Dict, Optional, List, Literal
 from datetime import datetime
 
 # User schemas
@@ -60,7 +60,102 @@ class PropertyResponse(PropertyCreate):
     class Config:
         from_attributes = True
 
+class PropertyPatch(BaseModel):
+    """Partial update applied to every selected property; only set fields are written"""
+    house_number: Optional[str] = None
+    street_name: Optional[str] = None
+    postcode: Optional[str] = None
+    property_type: Optional[str] = None
+    bedrooms: Optional[int] = None
+    bathrooms: Optional[int] = None
+    size_sqft: Optional[int] = None
+    floor_number: Optional[int] = None
+    new_build: Optional[str] = None
+    solar_panels: Optional[str] = None
+    epc_rating: Optional[str] = None
+    council_tax_band: Optional[str] = None
+    parking: Optional[str] = None
+    parking_type: Optional[str] = None
+    garden: Optional[str] = None
+    garden_type: Optional[str] = None
+    lift_available: Optional[str] = None
+    sunroom: Optional[bool] = None
+    basement: Optional[bool] = None
+    loft: Optional[bool] = None
+    parking_additional: Optional[bool] = None
+    misc_notes: Optional[str] = None
+
+    @field_validator("house_number", "street_name", "postcode", "property_type")
+    @classmethod
+    def required_fields_not_null(cls, value):
+        if value is None:
+            raise ValueError("cannot be null")
+        return value
+
+class PropertyFilter(BaseModel):
+    """Equality, multi-select and range filters over a user's properties"""
+    property_type: Optional[str] = None
+    bedrooms: Optional[int] = None
+    epc_rating: Optional[str] = None
+    property_types: Optional[List[str]] = None
+    epc_ratings: Optional[List[str]] = None
+    bedrooms_min: Optional[int] = None
+    bedrooms_max: Optional[int] = None
+    size_min: Optional[int] = None
+    size_max: Optional[int] = None
+    value_min: Optional[float] = None
+    value_max: Optional[float] = None
+
+PropertySort = Literal[
+    "id", "-id", "bedrooms", "-bedrooms", "size_sqft", "-size_sqft",
+    "value", "-value", "created_at", "-created_at"
+]
+
+class PropertySelection(PropertyFilter):
+    """Selects a user's properties by id list and/or filters"""
+    ids: Optional[List[int]] = None
+    property_types: Optional[List[str]] = Field(None, min_length=1)
+    epc_ratings: Optional[List[str]] = Field(None, min_length=1)
+
+    @field_validator("property_type", "epc_rating")
+    @classmethod
+    def not_blank(cls, value):
+        # A blank filter would read as "no filter" and widen a bulk write
+        if value is not None and not value.strip():
+            raise ValueError("cannot be blank")
+        return value
+
+class PropertyBulkUpdate(PropertySelection):
+    patch: PropertyPatch
+
+class PropertyBulkResult(BaseModel):
+    matched: int
+    media_deleted: int = 0
+
+class PropertyPage(BaseModel):
+    items: List[PropertyResponse]
+    next_cursor: Optional[str] = None
+
+class PropertyImportError(BaseModel):
+    row: int
+    errors: List[str]
+
+class PropertyImportReport(BaseModel):
+    imported: int
+    failed: int
+    errors: List[PropertyImportError]
+    errors_truncated: bool = False
+
 # Analysis schemas
+class AreaBenchmark(BaseModel):
+    datazone: str
+    properties: int
+    median_size_sqft: Optional[float] = None
+    # Shares of the area's properties per EPC band / with each feature
+    epc_distribution: Dict[str, float]
+    feature_rates: Dict[str, float]
+    your_properties: Optional[int] = None
+
 class PropertyAnalysis(BaseModel):
     total_properties: int
     avg_epc_rating: Optional[str]
@@ -69,6 +164,97 @@ class PropertyAnalysis(BaseModel):
     energy_efficiency_score: Optional[float]
     investment_score: Optional[float]
     risk_assessment: str
+    # The portfolio's main datazones, from the latest datazone stats run
+    area_benchmarks: List[AreaBenchmark] = []
+
+class DatazoneStatsStatus(BaseModel):
+    generation: int
+    datazones: int = 0
+    properties: int = 0
+    finished_at: Optional[datetime] = None
+    rebuilding: bool = False
+
+class SummaryStatistics(BaseModel):
+    min: float
+    max: float
+    median: float
+    mean: float
+
+class PropertyStatistics(BaseModel):
+    value_statistics: SummaryStatistics
+    size_statistics: SummaryStatistics
+    feature_counts: Dict[str, int]
+    total_properties: int
+
+# Background analysis jobs; "full" runs portfolio, statistics, market and optimization
+AnalysisJobKind = Literal["portfolio", "statistics", "market", "comparison", "optimization", "full"]
+
+class AnalysisJobCreate(BaseModel):
+    kind: AnalysisJobKind = "full"
+    location_filter: Optional[str] = None
+    property_ids: Optional[List[int]] = None
+
+class AnalysisJobResponse(BaseModel):
+    id: str
+    kind: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    progress: float
+    message: Optional[str] = None
+    error: Optional[str] = None
+    # Report name -> report, once succeeded
+    result: Optional[Dict[str, Any]] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+# Comparable-property search; "book" searches every portfolio
+ComparablesScope = Literal["portfolio", "book"]
+
+class ComparableProperty(BaseModel):
+    # None for matches from other users' portfolios
+    id: Optional[int] = None
+    distance: float
+    property_type: str
+    bedrooms: Optional[int] = None
+    bathrooms: Optional[int] = None
+    size_sqft: Optional[int] = None
+    epc_rating: Optional[str] = None
+    datazone: Optional[str] = None
+    parking: Optional[str] = None
+    garden: Optional[str] = None
+    solar_panels: Optional[str] = None
+    new_build: Optional[str] = None
+
+class ComparablesResponse(BaseModel):
+    property_id: int
+    scope: ComparablesScope
+    comparables: List[ComparableProperty]
+
+# Postcode schemas
+class PostcodeResolveRequest(BaseModel):
+    postcodes: List[str] = Field(..., max_length=1_000_000)
+
+class PostcodeResolution(BaseModel):
+    postcode: str
+    datazone: Optional[str] = None
+
+class PostcodeResolveResponse(BaseModel):
+    results: List[PostcodeResolution]
+    resolved: int
+    unresolved: int
+
+class PostcodeSuggestions(BaseModel):
+    query: str
+    suggestions: List[PostcodeResolution]
+
+class PostcodeDatasetStatus(BaseModel):
+    version: Optional[str] = None
+    row_count: int
+    loaded: bool
+    source: Optional[str] = None
+    loaded_at: datetime
+    reloading: bool
+    last_error: Optional[str] = None
 
 # Token schema
 class Token(BaseModel):
@@ -1,185 +1,278 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Any, Optional
 from models import Property
+from services.portfolio_service import ESTIMATED_VALUE_PER_SQFT, portfolio_version
+from services.cache_service import AnalysisCache, cached_report
 import pandas as pd
 import numpy as np
-from collections import defaultdict
-import statistics
+
+
+# Columns the portfolio analyses read; loaded once per call as a DataFrame
+# instead of materialising ORM objects
+ANALYSIS_COLUMNS = [
+    Property.id, Property.postcode, Property.property_type, Property.bedrooms, Property.size_sqft,
+    Property.epc_rating, Property.parking, Property.garden, Property.solar_panels, Property.new_build,
+]
+
+COMPARISON_COLUMNS = ANALYSIS_COLUMNS + [Property.house_number, Property.street_name, Property.bathrooms]
+
+# Low-cardinality text columns held as pandas categoricals: grouping, counting
+# and isin then work on integer codes instead of Python strings
+CATEGORY_COLUMNS = ["property_type", "epc_rating", "parking", "garden", "solar_panels", "new_build"]
+
+POOR_EPC_RATINGS = ["E", "F", "G"]
+
+ALL_PROPERTY_TYPES = {'house', 'flat', 'detached', 'semi-detached', 'bungalow'}
+
+
+def load_portfolio_frame(
+    db: Session, user_id: int, property_ids: Optional[List[int]] = None, columns=ANALYSIS_COLUMNS
+) -> pd.DataFrame:
+    """Load a user's properties into a DataFrame with one round trip"""
+    query = select(*columns).where(Property.user_id == user_id)
+    if property_ids is not None:
+        query = query.where(Property.id.in_(property_ids))
+    result = db.execute(query)
+    return portfolio_frame(pd.DataFrame(result.all(), columns=list(result.keys())))
+
+
+def portfolio_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """Normalise raw property columns for analysis.
+
+    Numeric columns become float64 with NaN for missing (and, for sizes,
+    zero) values, text columns become categoricals with empty strings
+    treated as missing, and ``estimated_value`` is derived from size.
+    """
+    frame = frame.copy()
+    for column in CATEGORY_COLUMNS:
+        if column in frame:
+            values = frame[column].astype("category")
+            if "" in values.cat.categories:
+                values = values.cat.remove_categories([""])
+            frame[column] = values
+    for column in ("bedrooms", "size_sqft"):
+        frame[column] = pd.to_numeric(frame[column], errors="coerce").astype("float64")
+    frame["size_sqft"] = frame["size_sqft"].where(frame["size_sqft"] > 0)
+    frame["estimated_value"] = frame["size_sqft"] * ESTIMATED_VALUE_PER_SQFT
+    return frame
+
+
+def _number(value):
+    """Plain Python number for JSON responses"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def _optional_int(value):
+    return None if value is None else int(value)
+
+
+def _range(values: np.ndarray) -> Dict[str, Any]:
+    return {"min": _number(values.min()), "max": _number(values.max())}
 
 
 class AnalysisService:
-    """Service class for advanced property analysis and market insights"""
-    
-    def __init__(self, db: Session):
+    """Service class for advanced property analysis and market insights.
+
+    Reports compute their statistics column-wise with pandas/NumPy over a
+    portfolio snapshot that is loaded at most once per service instance
+    (``portfolio``), so one request can build several reports from a single
+    query. Reports are cached per portfolio version (``cached_report``), and
+    the snapshot is only loaded on a cache miss.
+    """
+
+    def __init__(self, db: Session, cache: Optional[AnalysisCache] = None):
         self.db = db
-    
+        self.cache = cache
+        self._snapshots: Dict[int, pd.DataFrame] = {}
+
+    def portfolio(self, user_id: int) -> pd.DataFrame:
+        """The user's portfolio frame, shared by every report on this instance (treat as read-only)"""
+        if user_id not in self._snapshots:
+            self._snapshots[user_id] = load_portfolio_frame(self.db, user_id)
+        return self._snapshots[user_id]
+
+    def reports(
+        self, user_id: int, location_filter: Optional[str] = None, property_ids: Optional[List[int]] = None
+    ) -> Dict[str, Any]:
+        """Market and optimization reports (plus a comparison when ids are given) from one snapshot"""
+        reports = {
+            "market": self.market_analysis(user_id, location_filter),
+            "optimization": self.portfolio_optimization(user_id),
+        }
+        if property_ids:
+            reports["comparison"] = self.property_comparison(property_ids, user_id)
+        return reports
+
     def market_analysis(self, user_id: int, location_filter: Optional[str] = None) -> Dict[str, Any]:
         """Perform market analysis for user's portfolio"""
-        properties = self.db.query(Property).filter(Property.user_id == user_id).all()
-        
+        location_filter = (location_filter or "").upper() or None
+        return cached_report(
+            self.db, user_id, "market", lambda: self._market_analysis(user_id, location_filter),
+            params=location_filter, cache=self.cache,
+        )
+
+    def property_comparison(self, property_ids: List[int], user_id: int) -> Dict[str, Any]:
+        """Compare multiple properties"""
+        property_ids = sorted(set(property_ids))
+        return cached_report(
+            self.db, user_id, "comparison", lambda: self._property_comparison(property_ids, user_id),
+            params=property_ids, cache=self.cache,
+        )
+
+    def portfolio_optimization(self, user_id: int) -> Dict[str, Any]:
+        """Provide portfolio optimization suggestions"""
+        return cached_report(
+            self.db, user_id, "optimization", lambda: self._portfolio_optimization(user_id), cache=self.cache
+        )
+
+    def _market_analysis(self, user_id: int, location_filter: Optional[str]) -> Dict[str, Any]:
+        frame = self.portfolio(user_id)
+
         if location_filter:
-            properties = [p for p in properties if p.postcode and location_filter.upper() in p.postcode.upper()]
-        
-        if not properties:
+            postcodes = frame["postcode"].fillna("").str.upper()
+            frame = frame[postcodes.str.contains(location_filter, regex=False)]
+
+        if frame.empty:
             return {
                 "market_trends": {},
                 "price_analysis": {},
                 "investment_metrics": {},
                 "recommendations": []
             }
-        
-        # Market trends analysis
-        market_trends = self._analyze_market_trends(properties)
-        
-        # Price analysis
-        price_analysis = self._analyze_prices(properties)
-        
-        # Investment metrics
-        investment_metrics = self._calculate_investment_metrics(properties)
-        
-        # Generate recommendations
-        recommendations = self._generate_recommendations(properties)
-        
+
         return {
-            "market_trends": market_trends,
-            "price_analysis": price_analysis,
-            "investment_metrics": investment_metrics,
-            "recommendations": recommendations
+            "market_trends": self._analyze_market_trends(frame),
+            "price_analysis": self._analyze_prices(frame),
+            "investment_metrics": self._calculate_investment_metrics(frame),
+            "recommendations": self._generate_recommendations(frame)
         }
-    
-    def property_comparison(self, property_ids: List[int], user_id: int) -> Dict[str, Any]:
-        """Compare multiple properties"""
-        properties = self.db.query(Property).filter(
-            Property.id.in_(property_ids),
-            Property.user_id == user_id
-        ).all()
-        
-        if len(properties) < 2:
+
+    def _property_comparison(self, property_ids: List[int], user_id: int) -> Dict[str, Any]:
+        # A primary-key lookup of just these rows; cheaper than the snapshot,
+        # which also lacks the address columns
+        frame = load_portfolio_frame(self.db, user_id, property_ids, columns=COMPARISON_COLUMNS)
+
+        if len(frame) < 2:
             return {"error": "At least 2 properties required for comparison"}
-        
-        comparison_data = []
-        for prop in properties:
-            comparison_data.append({
-                "id": prop.id,
-                "address": f"{prop.house_number} {prop.street_name}",
-                "postcode": prop.postcode,
-                "property_type": prop.property_type,
-                "bedrooms": prop.bedrooms,
-                "bathrooms": prop.bathrooms,
-                "size_sqft": prop.size_sqft,
-                "estimated_value": prop.estimated_value,
-                "epc_rating": prop.epc_rating,
+
+        records = frame.astype(object).where(frame.notna(), None).to_dict("records")
+        comparison_data = [
+            {
+                "id": row["id"],
+                "address": f"{row['house_number']} {row['street_name']}",
+                "postcode": row["postcode"],
+                "property_type": row["property_type"],
+                "bedrooms": _optional_int(row["bedrooms"]),
+                "bathrooms": _optional_int(row["bathrooms"]),
+                "size_sqft": _optional_int(row["size_sqft"]),
+                "estimated_value": row["estimated_value"],
+                "epc_rating": row["epc_rating"],
                 "features": {
-                    "parking": prop.parking,
-                    "garden": prop.garden,
-                    "solar_panels": prop.solar_panels,
-                    "new_build": prop.new_build
+                    "parking": row["parking"],
+                    "garden": row["garden"],
+                    "solar_panels": row["solar_panels"],
+                    "new_build": row["new_build"]
                 }
-            })
-        
-        # Calculate comparison metrics
-        values = [p.estimated_value for p in properties if p.estimated_value]
-        sizes = [p.size_sqft for p in properties if p.size_sqft]
-        
+            }
+            for row in records
+        ]
+
+        values = frame["estimated_value"].dropna().to_numpy()
+        sizes = frame["size_sqft"].dropna().to_numpy()
+        price_per_sqft = (frame["estimated_value"] / frame["size_sqft"]).dropna()
+
         metrics = {
-            "value_range": {"min": min(values), "max": max(values)} if values else {},
-            "size_range": {"min": min(sizes), "max": max(sizes)} if sizes else {},
-            "price_per_sqft": [v/s for v, s in zip(values, sizes) if v and s],
-            "average_value": statistics.mean(values) if values else 0,
-            "average_size": statistics.mean(sizes) if sizes else 0
+            "value_range": _range(values) if values.size else {},
+            "size_range": _range(sizes) if sizes.size else {},
+            "price_per_sqft": price_per_sqft.tolist(),
+            "average_value": float(values.mean()) if values.size else 0,
+            "average_size": float(sizes.mean()) if sizes.size else 0
         }
-        
+
         return {
             "properties": comparison_data,
             "metrics": metrics,
-            "insights": self._generate_comparison_insights(properties)
+            "insights": self._generate_comparison_insights(frame)
         }
-    
-    def portfolio_optimization(self, user_id: int) -> Dict[str, Any]:
-        """Provide portfolio optimization suggestions"""
-        properties = self.db.query(Property).filter(Property.user_id == user_id).all()
-        
-        if not properties:
+
+    def _portfolio_optimization(self, user_id: int) -> Dict[str, Any]:
+        frame = self.portfolio(user_id)
+
+        if frame.empty:
             return {"message": "No properties found for optimization"}
-        
-        # Analyze current portfolio
-        portfolio_stats = self._calculate_portfolio_stats(properties)
-        
-        # Identify gaps and opportunities
-        gaps = self._identify_portfolio_gaps(properties)
-        
-        # Generate optimization suggestions
-        suggestions = self._generate_optimization_suggestions(properties, portfolio_stats, gaps)
-        
+
+        portfolio_stats = self._calculate_portfolio_stats(frame)
+        gaps = self._identify_portfolio_gaps(frame)
+        suggestions = self._generate_optimization_suggestions(frame, portfolio_stats, gaps)
+
         return {
             "current_portfolio": portfolio_stats,
             "identified_gaps": gaps,
             "optimization_suggestions": suggestions,
-            "risk_analysis": self._analyze_portfolio_risk(properties)
+            "risk_analysis": self._analyze_portfolio_risk(frame)
         }
-    
-    def _analyze_market_trends(self, properties: List[Property]) -> Dict[str, Any]:
-        """Analyze market trends from property data"""
-        # Group by property type
-        type_analysis = defaultdict(list)
-        for prop in properties:
-            if prop.property_type and prop.estimated_value:
-                type_analysis[prop.property_type].append(prop.estimated_value)
-        
-        trends = {}
-        for prop_type, values in type_analysis.items():
-            if values:
-                trends[prop_type] = {
-                    "average_value": statistics.mean(values),
-                    "median_value": statistics.median(values),
-                    "value_range": {"min": min(values), "max": max(values)},
-                    "growth_potential": self._estimate_growth_potential(prop_type)
-                }
-        
-        return trends
-    
-    def _analyze_prices(self, properties: List[Property]) -> Dict[str, Any]:
+
+    def _analyze_market_trends(self, frame: pd.DataFrame) -> Dict[str, Any]:
+        """Value statistics per property type"""
+        valued = frame.dropna(subset=["property_type", "estimated_value"])
+        grouped = valued.groupby("property_type", observed=True)["estimated_value"].agg(
+            ["mean", "median", "min", "max"]
+        )
+
+        return {
+            prop_type: {
+                "average_value": float(row["mean"]),
+                "median_value": float(row["median"]),
+                "value_range": {"min": _number(row["min"]), "max": _number(row["max"])},
+                "growth_potential": self._estimate_growth_potential(prop_type)
+            }
+            for prop_type, row in grouped.iterrows()
+        }
+
+    def _analyze_prices(self, frame: pd.DataFrame) -> Dict[str, Any]:
         """Analyze price patterns"""
-        values = [p.estimated_value for p in properties if p.estimated_value]
-        sizes = [p.size_sqft for p in properties if p.size_sqft]
-        
-        if not values:
+        values = frame["estimated_value"].dropna().to_numpy()
+
+        if not values.size:
             return {}
-        
-        # Price per square foot analysis
-        price_per_sqft = []
-        for prop in properties:
-            if prop.estimated_value and prop.size_sqft:
-                price_per_sqft.append(prop.estimated_value / prop.size_sqft)
-        
+
+        price_per_sqft = (frame["estimated_value"] / frame["size_sqft"]).dropna().to_numpy()
+
         return {
             "value_statistics": {
-                "mean": statistics.mean(values),
-                "median": statistics.median(values),
-                "std_dev": statistics.stdev(values) if len(values) > 1 else 0,
-                "range": {"min": min(values), "max": max(values)}
+                "mean": float(values.mean()),
+                "median": float(np.median(values)),
+                "std_dev": float(values.std(ddof=1)) if values.size > 1 else 0,
+                "range": _range(values)
             },
             "price_per_sqft": {
-                "mean": statistics.mean(price_per_sqft) if price_per_sqft else 0,
-                "median": statistics.median(price_per_sqft) if price_per_sqft else 0,
-                "range": {"min": min(price_per_sqft), "max": max(price_per_sqft)} if price_per_sqft else {}
+                "mean": float(price_per_sqft.mean()) if price_per_sqft.size else 0,
+                "median": float(np.median(price_per_sqft)) if price_per_sqft.size else 0,
+                "range": _range(price_per_sqft) if price_per_sqft.size else {}
             }
         }
-    
-    def _calculate_investment_metrics(self, properties: List[Property]) -> Dict[str, Any]:
+
+    def _calculate_investment_metrics(self, frame: pd.DataFrame) -> Dict[str, Any]:
         """Calculate investment performance metrics"""
-        total_value = sum(p.estimated_value for p in properties if p.estimated_value)
-        total_investment = sum(p.purchase_price for p in properties if p.purchase_price)
-        
+        if "purchase_price" not in frame:
+            # No purchase prices are recorded yet
+            return {"message": "Purchase prices needed for investment analysis"}
+
+        total_value = float(frame["estimated_value"].sum())
+        total_investment = float(frame["purchase_price"].sum())
+
         if total_investment == 0:
             return {"message": "Purchase prices needed for investment analysis"}
-        
+
         roi = ((total_value - total_investment) / total_investment) * 100
-        
+
         # Estimate rental yields (simplified calculation)
         estimated_annual_rental = total_value * 0.05  # 5% yield assumption
         rental_yield = (estimated_annual_rental / total_value) * 100 if total_value > 0 else 0
-        
+
         return {
             "total_investment": total_investment,
             "current_value": total_value,
@@ -188,120 +281,113 @@ class AnalysisService:
             "estimated_rental_yield": rental_yield,
             "portfolio_growth": roi > 0
         }
-    
-    def _generate_recommendations(self, properties: List[Property]) -> List[str]:
+
+    def _generate_recommendations(self, frame: pd.DataFrame) -> List[str]:
         """Generate investment recommendations"""
         recommendations = []
-        
-        # Analyze property types
-        type_counts = defaultdict(int)
-        for prop in properties:
-            if prop.property_type:
-                type_counts[prop.property_type] += 1
-        
+
         # Diversification recommendations
-        if len(type_counts) == 1:
+        if frame["property_type"].nunique() == 1:
             recommendations.append("Consider diversifying your portfolio with different property types")
-        
+
         # EPC recommendations
-        poor_epc = [p for p in properties if p.epc_rating in ['E', 'F', 'G']]
+        poor_epc = int(frame["epc_rating"].isin(POOR_EPC_RATINGS).sum())
         if poor_epc:
-            recommendations.append(f"Consider improving EPC ratings for {len(poor_epc)} properties to increase value")
-        
+            recommendations.append(f"Consider improving EPC ratings for {poor_epc} properties to increase value")
+
         # Location analysis
-        postcodes = [p.postcode for p in properties if p.postcode]
-        if len(set(postcodes)) == 1:
+        if frame["postcode"].nunique() == 1:
             recommendations.append("Consider geographical diversification across different areas")
-        
+
         # Solar panel opportunities
-        no_solar = [p for p in properties if p.solar_panels == 'No']
-        if len(no_solar) > len(properties) * 0.7:
+        if int((frame["solar_panels"] == "No").sum()) > len(frame) * 0.7:
             recommendations.append("Consider solar panel installations to improve sustainability and reduce costs")
-        
+
         return recommendations
-    
-    def _calculate_portfolio_stats(self, properties: List[Property]) -> Dict[str, Any]:
+
+    def _calculate_portfolio_stats(self, frame: pd.DataFrame) -> Dict[str, Any]:
         """Calculate current portfolio statistics"""
+        bedrooms = frame["bedrooms"][frame["bedrooms"] > 0]
         return {
-            "total_properties": len(properties),
-            "property_types": dict(defaultdict(int, [(p.property_type, 1) for p in properties if p.property_type])),
-            "average_bedrooms": statistics.mean([p.bedrooms for p in properties if p.bedrooms]),
-            "locations": len(set([p.postcode for p in properties if p.postcode])),
-            "epc_distribution": dict(defaultdict(int, [(p.epc_rating, 1) for p in properties if p.epc_rating]))
+            "total_properties": len(frame),
+            "property_types": {
+                prop_type: int(count)
+                for prop_type, count in frame["property_type"].value_counts().items()
+            },
+            "average_bedrooms": float(bedrooms.mean()) if len(bedrooms) else 0,
+            "locations": int(frame["postcode"].nunique()),
+            "epc_distribution": {
+                rating: int(count)
+                for rating, count in frame["epc_rating"].value_counts().sort_index().items()
+            }
         }
-    
-    def _identify_portfolio_gaps(self, properties: List[Property]) -> List[str]:
+
+    def _identify_portfolio_gaps(self, frame: pd.DataFrame) -> List[str]:
         """Identify gaps in portfolio"""
         gaps = []
-        
+
         # Check for missing property types
-        current_types = set([p.property_type for p in properties if p.property_type])
-        all_types = {'house', 'flat', 'detached', 'semi-detached', 'bungalow'}
-        missing_types = all_types - current_types
-        
+        current_types = set(frame["property_type"].dropna().unique())
+        missing_types = ALL_PROPERTY_TYPES - current_types
+
         if missing_types:
-            gaps.append(f"Missing property types: {', '.join(missing_types)}")
-        
+            gaps.append(f"Missing property types: {', '.join(sorted(missing_types))}")
+
         # Check bedroom diversity
-        bedrooms = [p.bedrooms for p in properties if p.bedrooms]
-        if bedrooms and len(set(bedrooms)) < 3:
+        bedrooms = frame["bedrooms"][frame["bedrooms"] > 0]
+        if len(bedrooms) and bedrooms.nunique() < 3:
             gaps.append("Limited bedroom diversity - consider varied property sizes")
-        
+
         return gaps
-    
-    def _generate_optimization_suggestions(self, properties: List[Property], stats: Dict, gaps: List[str]) -> List[str]:
+
+    def _generate_optimization_suggestions(self, frame: pd.DataFrame, stats: Dict, gaps: List[str]) -> List[str]:
         """Generate portfolio optimization suggestions"""
         suggestions = []
-        
+
         # Size-based suggestions
         if stats['total_properties'] < 5:
             suggestions.append("Consider expanding portfolio to 5+ properties for better diversification")
-        
+
         # Location suggestions
         if stats['locations'] < 3:
             suggestions.append("Consider investing in 2-3 additional locations for geographical diversification")
-        
+
         # Value suggestions
-        values = [p.estimated_value for p in properties if p.estimated_value]
-        if values and len(set(values)) < 3:
+        values = frame["estimated_value"].dropna()
+        if len(values) and values.nunique() < 3:
             suggestions.append("Consider properties in different value brackets for balanced risk")
-        
+
         return suggestions
-    
-    def _analyze_portfolio_risk(self, properties: List[Property]) -> Dict[str, Any]:
+
+    def _analyze_portfolio_risk(self, frame: pd.DataFrame) -> Dict[str, Any]:
         """Analyze portfolio risk factors"""
         risks = []
         risk_score = 0
-        
+        total = len(frame)
+
         # Concentration risk
-        type_counts = defaultdict(int)
-        for prop in properties:
-            if prop.property_type:
-                type_counts[prop.property_type] += 1
-        
-        max_concentration = max(type_counts.values()) / len(properties)
+        type_counts = frame["property_type"].value_counts()
+        max_concentration = type_counts.max() / total if len(type_counts) else 0
         if max_concentration > 0.7:
             risks.append("High concentration in single property type")
             risk_score += 2
-        
+
         # Location concentration
-        postcodes = [p.postcode for p in properties if p.postcode]
-        if len(set(postcodes)) <= 2:
+        if frame["postcode"].nunique() <= 2:
             risks.append("Limited geographical diversification")
             risk_score += 1
-        
+
         # EPC risk
-        poor_epc_count = len([p for p in properties if p.epc_rating in ['E', 'F', 'G']])
-        if poor_epc_count > len(properties) * 0.3:
+        if int(frame["epc_rating"].isin(POOR_EPC_RATINGS).sum()) > total * 0.3:
             risks.append("High proportion of poor EPC ratings")
             risk_score += 1
-        
+
         return {
             "risk_factors": risks,
             "risk_score": min(risk_score, 5),  # Max 5
             "risk_level": "Low" if risk_score <= 1 else "Medium" if risk_score <= 3 else "High"
         }
-    
+
     def _estimate_growth_potential(self, property_type: str) -> str:
         """Estimate growth potential for property type (simplified)"""
         growth_rates = {
@@ -312,20 +398,54 @@ class AnalysisService:
             'bungalow': 'Medium'
         }
         return growth_rates.get(property_type, 'Medium')
-    
-    def _generate_comparison_insights(self, properties: List[Property]) -> List[str]:
+
+    def _generate_comparison_insights(self, frame: pd.DataFrame) -> List[str]:
         """Generate insights from property comparison"""
         insights = []
-        
-        values = [p.estimated_value for p in properties if p.estimated_value]
-        if values:
-            value_diff = max(values) - min(values)
+
+        values = frame["estimated_value"].dropna()
+        if len(values):
+            value_diff = values.max() - values.min()
             if value_diff > 100000:
                 insights.append(f"Significant value difference: £{value_diff:,.0f}")
-        
+
         # EPC comparison
-        epc_ratings = [p.epc_rating for p in properties if p.epc_rating]
-        if len(set(epc_ratings)) > 1:
+        if frame["epc_rating"].nunique() > 1:
             insights.append("Properties have different EPC ratings - consider improvements for lower-rated properties")
-        
-        return insights
\ No newline at end of file
+
+        return insights
+
+
+class AsyncAnalysisService:
+    """``AnalysisService`` for ``AsyncSession`` callers, run through ``AsyncSession.run_sync``"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self._service: Optional[AnalysisService] = None
+
+    def _sync_service(self, session: Session) -> AnalysisService:
+        # One sync service per instance, so its portfolio snapshot is shared
+        # by every report requested through this wrapper
+        if self._service is None:
+            self._service = AnalysisService(session)
+        return self._service
+
+    async def _run(self, method: str, *args):
+        return await self.db.run_sync(lambda session: getattr(self._sync_service(session), method)(*args))
+
+    async def market_analysis(self, user_id: int, location_filter: Optional[str] = None) -> Dict[str, Any]:
+        return await self._run("market_analysis", user_id, location_filter)
+
+    async def property_comparison(self, property_ids: List[int], user_id: int) -> Dict[str, Any]:
+        return await self._run("property_comparison", property_ids, user_id)
+
+    async def portfolio_optimization(self, user_id: int) -> Dict[str, Any]:
+        return await self._run("portfolio_optimization", user_id)
+
+    async def reports(
+        self, user_id: int, location_filter: Optional[str] = None, property_ids: Optional[List[int]] = None
+    ) -> Dict[str, Any]:
+        return await self._run("reports", user_id, location_filter, property_ids)
+
+    async def portfolio_version(self, user_id: int) -> int:
+        return await self.db.run_sync(portfolio_version, user_id)
@@ -0,0 +1,189 @@
+"""Re-run portfolio analysis for every user in one batch.
+
+Used after scoring rules change. Users are split into shards of contiguous
+ids, and the shards run on a ``ProcessPoolExecutor``. Each worker process
+opens its own engine in the pool initializer. For each shard it recomputes
+the totals from the properties table with grouped SQL, streamed in chunks,
+so stored aggregates that have drifted don't leak into the results. It
+then scores the totals, attaches area benchmarks and bulk-inserts one
+``portfolio_analysis_results`` row per user under the run's id::
+
+    python -m services.batch_analysis_service run [--workers N]
+    python -m services.batch_analysis_service status
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from sqlalchemy import func, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+from database import DATABASE_URL, create_db_engine
+from models import PortfolioAnalysisResult, PortfolioAnalysisRun, Property, User
+from schemas import PropertyAnalysis
+from services.datazone_service import area_benchmarks_by_user
+from services.portfolio_service import PortfolioAccumulator, aggregate_columns
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+BATCH_ANALYSIS_WORKERS = int(os.getenv("BATCH_ANALYSIS_WORKERS", str(os.cpu_count() or 1)))
+BATCH_ANALYSIS_SHARD_USERS = int(os.getenv("BATCH_ANALYSIS_SHARD_USERS", "250"))
+BATCH_ANALYSIS_CHUNK_ROWS = int(os.getenv("BATCH_ANALYSIS_CHUNK_ROWS", "1000"))
+
+# Set in each worker process by _init_worker
+_worker_engine: Optional[Engine] = None
+
+
+def _init_worker(database_url: str):
+    global _worker_engine
+    _worker_engine = create_db_engine(database_url)
+
+
+def analyse_users(db: Session, first_user: int, last_user: int, chunk_size: int) -> List[Tuple[int, PropertyAnalysis]]:
+    """``analyze_portfolio`` for every user with an id in the range, recomputed
+    from the properties table"""
+    totals = {
+        user_id: PortfolioAccumulator()
+        for user_id in db.scalars(select(User.id).where(User.id.between(first_user, last_user)))
+    }
+    in_shard = Property.user_id.between(first_user, last_user)
+    grouped = db.execute(
+        select(Property.user_id, *aggregate_columns()).where(in_shard).group_by(Property.user_id)
+        .execution_options(yield_per=chunk_size)
+    )
+    # Properties whose user_id has no users row are skipped, not fatal to the shard
+    for rows in grouped.partitions():
+        for row in rows:
+            if row.user_id in totals:
+                totals[row.user_id] = PortfolioAccumulator.from_aggregates(row, {})
+    type_counts = db.execute(
+        select(Property.user_id, Property.property_type, func.count())
+        .where(in_shard, Property.property_type != "")
+        .group_by(Property.user_id, Property.property_type)
+        .execution_options(yield_per=chunk_size)
+    )
+    for rows in type_counts.partitions():
+        for user_id, property_type, count in rows:
+            if user_id in totals:
+                totals[user_id].type_counts[property_type] = count
+    benchmarks = area_benchmarks_by_user(db, [in_shard])
+
+    return [
+        (user_id, PropertyAnalysis(**{
+            **accumulator.result().model_dump(),
+            "area_benchmarks": benchmarks.get(user_id, []),
+        }))
+        for user_id, accumulator in sorted(totals.items())
+    ]
+
+
+def run_shard(run_id: int, first_user: int, last_user: int, chunk_size: int = BATCH_ANALYSIS_CHUNK_ROWS) -> int:
+    """Worker entry point: analyse one shard and store its results; returns users written"""
+    with Session(_worker_engine) as db:
+        now = datetime.utcnow()
+        rows = [
+            {
+                "run_id": run_id,
+                "user_id": user_id,
+                "total_properties": analysis.total_properties,
+                "avg_epc_rating": analysis.avg_epc_rating,
+                "energy_efficiency_score": analysis.energy_efficiency_score,
+                "investment_score": analysis.investment_score,
+                "risk_assessment": analysis.risk_assessment,
+                "result": json.dumps(analysis.model_dump()),
+                "computed_at": now,
+            }
+            for user_id, analysis in analyse_users(db, first_user, last_user, chunk_size)
+        ]
+        for start in range(0, len(rows), chunk_size):
+            db.execute(insert(PortfolioAnalysisResult), rows[start:start + chunk_size])
+        db.commit()
+        return len(rows)
+
+
+def user_shards(db: Session, shard_size: int) -> List[Tuple[int, int]]:
+    """``(first, last)`` user id ranges of about ``shard_size`` users each"""
+    user_ids = db.scalars(select(User.id).order_by(User.id)).all()
+    return [
+        (user_ids[start], user_ids[min(start + shard_size, len(user_ids)) - 1])
+        for start in range(0, len(user_ids), shard_size)
+    ]
+
+
+def run_batch_analysis(
+    database_url: str = DATABASE_URL,
+    workers: int = BATCH_ANALYSIS_WORKERS,
+    shard_size: int = BATCH_ANALYSIS_SHARD_USERS,
+    chunk_size: int = BATCH_ANALYSIS_CHUNK_ROWS,
+) -> PortfolioAnalysisRun:
+    """Analyse every user's portfolio on ``workers`` processes and record the run"""
+    engine = create_db_engine(database_url)
+    try:
+        with Session(engine, expire_on_commit=False) as db:
+            shards = user_shards(db, shard_size)
+            run = PortfolioAnalysisRun(status="running", workers=workers, shards=len(shards), started_at=datetime.utcnow())
+            db.add(run)
+            db.commit()
+
+            users = 0
+            started = time.perf_counter()
+            try:
+                with ProcessPoolExecutor(
+                    max_workers=max(1, workers),
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(database_url,),
+                ) as pool:
+                    futures = [pool.submit(run_shard, run.id, first, last, chunk_size) for first, last in shards]
+                    for done, future in enumerate(as_completed(futures), start=1):
+                        users += future.result()
+                        logger.info("Batch analysis %d: %d/%d shards, %d users", run.id, done, len(shards), users)
+            except Exception as exc:
+                run.status, run.error = "failed", f"{type(exc).__name__}: {exc}"
+                raise
+            else:
+                run.status = "succeeded"
+            finally:
+                run.users, run.finished_at = users, datetime.utcnow()
+                db.commit()
+            logger.info(
+                "Batch analysis %d: %d users in %.1f s on %d workers",
+                run.id, users, time.perf_counter() - started, workers,
+            )
+            return run
+    finally:
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch portfolio analysis")
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run = subparsers.add_parser("run", help="re-analyse every user's portfolio")
+    run.add_argument("--workers", type=int, default=BATCH_ANALYSIS_WORKERS)
+    run.add_argument("--shard-size", type=int, default=BATCH_ANALYSIS_SHARD_USERS, help="users per shard")
+    run.add_argument("--chunk-size", type=int, default=BATCH_ANALYSIS_CHUNK_ROWS, help="rows per fetch and insert")
+    subparsers.add_parser("status", help="show recent runs")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.command == "run":
+        result = run_batch_analysis(args.database_url, args.workers, args.shard_size, args.chunk_size)
+        print(f"Run {result.id} {result.status}: {result.users} users, {result.shards} shards")
+    if args.command == "status":
+        engine = create_db_engine(args.database_url)
+        with Session(engine) as db:
+            for past in db.scalars(select(PortfolioAnalysisRun).order_by(PortfolioAnalysisRun.id.desc()).limit(10)):
+                finished = f"{past.finished_at:%Y-%m-%d %H:%M:%S}" if past.finished_at else "..."
+                print(f"Run {past.id} {past.status}: {past.users} users, {past.workers} workers, "
+                      f"{past.started_at:%Y-%m-%d %H:%M:%S} -> {finished}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Cache for analysis results, keyed by user and portfolio version.
+
+Every property write bumps ``portfolio_aggregates.version`` (see
+services/portfolio_service.py), so an entry is valid exactly while its
+version matches the current one and nothing needs explicit invalidation.
+Each (user, report, params) slot holds only its latest version.
+
+Backends:
+
+* ``memory`` - per-process LRU (default)
+* ``file`` - one JSON file per slot under ``ANALYSIS_CACHE_DIR``, shared by
+  every worker process on the host
+* ``none`` - caching disabled
+"""
+from collections import OrderedDict
+from sqlalchemy.orm import Session
+from typing import Any, Callable, Dict, Optional, Tuple
+from services.portfolio_service import portfolio_version
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+ANALYSIS_CACHE_BACKEND = os.getenv("ANALYSIS_CACHE_BACKEND", "memory")
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "4096"))
+ANALYSIS_CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "property_intel_analysis_cache"))
+
+
+def _slot(user_id: int, kind: str, params: Any = None) -> str:
+    if params is None:
+        return f"{user_id}:{kind}"
+    encoded = json.dumps(params, sort_keys=True, default=str)
+    return f"{user_id}:{kind}:{hashlib.sha1(encoded.encode()).hexdigest()[:16]}"
+
+
+def analysis_etag(user_id: int, kind: str, version: int, params: Any = None) -> str:
+    """Strong ETag for a report; changes whenever the portfolio version does"""
+    return f'"{_slot(user_id, kind, params).replace(":", "-")}-v{version}"'
+
+
+class MemoryCacheBackend:
+    """Thread-safe LRU of slot -> (version, value)"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, slot: str) -> Optional[Tuple[int, Any]]:
+        with self._lock:
+            entry = self._entries.get(slot)
+            if entry is not None:
+                self._entries.move_to_end(slot)
+            return entry
+
+    def put(self, slot: str, version: int, value: Any):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[slot] = (version, value)
+            self._entries.move_to_end(slot)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class FileCacheBackend:
+    """One JSON file per slot; writes are atomic renames, so concurrent
+    workers never read a partial entry"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, slot: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(slot.encode()).hexdigest() + ".json")
+
+    def get(self, slot: str) -> Optional[Tuple[int, Any]]:
+        try:
+            with open(self._path(slot), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("slot") != slot:
+            return None
+        return entry["version"], entry["value"]
+
+    def put(self, slot: str, version: int, value: Any):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"slot": slot, "version": version, "value": value}, f)
+            os.replace(tmp_path, self._path(slot))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                os.remove(os.path.join(self.directory, name))
+
+    def __len__(self) -> int:
+        return sum(1 for name in os.listdir(self.directory) if name.endswith(".json"))
+
+
+class AnalysisCache:
+    """Versioned report store over a backend (see ``cached_report``).
+
+    Values must be JSON-serialisable so every backend can hold them.
+    Version 0 means the user has no stored totals yet, so there is no
+    counter to invalidate on and nothing is cached.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int, kind: str, version: int, params: Any = None) -> Optional[Any]:
+        if self.backend is None or not version:
+            return None
+        entry = self.backend.get(_slot(user_id, kind, params))
+        if entry is None or entry[0] != version:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1]
+
+    def put(self, user_id: int, kind: str, version: int, value: Any, params: Any = None):
+        if self.backend is not None and version:
+            self.backend.put(_slot(user_id, kind, params), version, value)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "size": len(self.backend) if self.backend is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def create_analysis_cache(backend: str = ANALYSIS_CACHE_BACKEND) -> AnalysisCache:
+    if backend == "memory":
+        return AnalysisCache(MemoryCacheBackend(ANALYSIS_CACHE_SIZE))
+    if backend == "file":
+        return AnalysisCache(FileCacheBackend(ANALYSIS_CACHE_DIR))
+    if backend == "none":
+        return AnalysisCache()
+    raise ValueError(f"Unknown ANALYSIS_CACHE_BACKEND: {backend!r}")
+
+
+analysis_cache = create_analysis_cache()
+
+
+def cached_report(
+    db: Session, user_id: int, kind: str, compute: Callable[[], Any],
+    params: Any = None, cache: Optional[AnalysisCache] = None,
+) -> Any:
+    """Return the cached ``kind`` report for the user's current portfolio
+    version, computing and storing it on a miss"""
+    cache = analysis_cache if cache is None else cache
+    version = portfolio_version(db, user_id)
+    value = cache.get(user_id, kind, version, params)
+    if value is None:
+        value = compute()
+        # A write committed while computing may already be reflected in
+        # value; don't file it under the older version
+        if portfolio_version(db, user_id) == version:
+            cache.put(user_id, kind, version, value, params)
+    return value
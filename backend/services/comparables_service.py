@@ -0,0 +1,332 @@
+"""Comparable-property (k-nearest neighbour) search.
+
+``ComparablesIndex`` keeps every property as a row of a float32 NumPy matrix
+of normalised features (bedrooms, bathrooms, log size, EPC score and the
+yes/no features) plus integer codes for property type and datazone. The
+distance between two properties is the squared Euclidean distance between
+their rows plus a fixed penalty when the type or the datazone differs, so a
+query is one blocked matrix-vector product over the candidate rows followed
+by a partial sort; no tree structure has to be kept balanced under writes,
+and the categorical penalties need no one-hot columns.
+
+The index follows ``portfolio_aggregates.version``, which every property
+write path bumps: before a search, portfolios whose version moved are
+reloaded (and only those), so writes from any API or worker process are
+picked up without hooks in each write path.
+"""
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional, Tuple
+from models import PortfolioAggregate, Property
+from services.portfolio_service import PortfolioAccumulator
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Book-wide searches re-check every portfolio's version at most this often
+COMPARABLES_SYNC_SECONDS = float(os.getenv("COMPARABLES_SYNC_SECONDS", "1.0"))
+
+INDEX_COLUMNS = [
+    Property.id, Property.user_id, Property.property_type, Property.bedrooms, Property.bathrooms,
+    Property.size_sqft, Property.epc_rating, Property.datazone, *(
+        getattr(Property, feature) for feature in PortfolioAccumulator.FEATURES
+    ),
+]
+
+# Feature scales: a difference of one scale unit adds 1 to the squared
+# distance. One bedroom ~ one bathroom ~ 50% more floor area ~ two EPC
+# bands; each differing yes/no feature adds 0.25.
+BEDROOM_SCALE = 1.0
+BATHROOM_SCALE = 1.0
+SIZE_SCALE = float(np.log(1.5))
+EPC_SCALE = 2.0
+FEATURE_SCALE = 2.0
+TYPE_PENALTY = 2.0
+DATAZONE_PENALTY = 1.0
+
+# Missing values are imputed with a typical property so they neither
+# attract nor repel matches
+TYPICAL_BEDROOMS = 2
+TYPICAL_BATHROOMS = 1
+TYPICAL_SIZE_SQFT = 800
+TYPICAL_EPC_SCORE = PortfolioAccumulator.EPC_SCORES["D"]
+
+DIMENSIONS = 4 + len(PortfolioAccumulator.FEATURES)
+BLOCK_ROWS = 65_536
+LOAD_USERS_PER_QUERY = 500
+
+
+class ComparablesIndex:
+    """In-process k-NN index over all properties, synced per portfolio version"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._size = 0  # high-water mark of used rows
+        # Feature-major (one row per feature) so a block of properties is a
+        # contiguous slice of every feature row
+        self._matrix = np.zeros((DIMENSIONS, 0), dtype=np.float32)
+        self._sqnorms = np.zeros(0, dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._users = np.zeros(0, dtype=np.int64)  # -1 marks a free row
+        self._types = np.zeros(0, dtype=np.int32)
+        self._zones = np.zeros(0, dtype=np.int32)
+        self._row_of = np.zeros(0, dtype=np.int64)  # property id -> row, -1 if absent
+        self._free: List[np.ndarray] = []
+        self._user_rows: Dict[int, np.ndarray] = {}
+        self._versions: Dict[int, int] = {}
+        self._codes: Dict[str, Dict[str, int]] = {"type": {}, "zone": {}}
+        self._synced_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self._user_rows.values())
+
+    # Sync
+
+    def sync(self, db: Session, user_id: Optional[int] = None, max_age: Optional[float] = None) -> int:
+        """Reload portfolios whose version changed; all of them, or just
+        ``user_id``'s. ``max_age`` skips a full sync done that recently.
+        Returns the number of portfolios reloaded."""
+        with self._lock:
+            if user_id is None and max_age is not None and self._synced_at is not None:
+                if time.monotonic() - self._synced_at < max_age:
+                    return 0
+            started = time.monotonic()
+            query = select(PortfolioAggregate.user_id, PortfolioAggregate.version)
+            if user_id is not None:
+                query = query.where(PortfolioAggregate.user_id == user_id)
+            versions = dict(db.execute(query).all())
+
+            stale = [uid for uid, version in versions.items() if self._versions.get(uid) != version]
+            gone = [uid for uid in self._user_rows if uid not in versions] if user_id is None else (
+                [user_id] if user_id not in versions and user_id in self._user_rows else []
+            )
+            for uid in gone:
+                self._release(uid)
+                self._versions.pop(uid, None)
+            # Versions are read before the rows, so a write landing in between
+            # leaves the older version recorded and is reloaded next time
+            for start in range(0, len(stale), LOAD_USERS_PER_QUERY):
+                batch = stale[start:start + LOAD_USERS_PER_QUERY]
+                frame = self._load(db, batch)
+                ids = frame["id"].to_numpy(dtype=np.int64)
+                matrix = self.encode(frame)
+                types = self._code("type", frame["property_type"].str.strip().str.lower())
+                zones = self._code("zone", frame["datazone"])
+                groups = frame.groupby("user_id", sort=False).indices if len(frame) else {}
+                for uid in batch:
+                    positions = groups.get(uid, slice(0))
+                    self._replace(uid, ids[positions], matrix[positions], types[positions], zones[positions])
+                    self._versions[uid] = versions[uid]
+            if user_id is None:
+                self._synced_at = started
+            if stale:
+                logger.debug("Comparables index reloaded %d portfolio(s)", len(stale))
+            return len(stale)
+
+    def rebuild(self, db: Session) -> int:
+        """Drop everything and reload all portfolios"""
+        with self._lock:
+            self._reset()
+            return self.sync(db)
+
+    @staticmethod
+    def _load(db: Session, user_ids: List[int]) -> pd.DataFrame:
+        result = db.execute(select(*INDEX_COLUMNS).where(Property.user_id.in_(user_ids)))
+        return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+    def _release(self, user_id: int):
+        rows = self._user_rows.pop(user_id, None)
+        if rows is not None and len(rows):
+            self._row_of[self._ids[rows]] = -1
+            self._users[rows] = -1
+            self._sqnorms[rows] = np.inf
+            self._free.append(rows)
+
+    def _replace(self, user_id: int, ids: np.ndarray, matrix: np.ndarray, types: np.ndarray, zones: np.ndarray):
+        self._release(user_id)
+        if not len(ids):
+            return
+        rows = self._allocate(len(ids), int(ids.max()))
+        self._matrix[:, rows] = matrix.T
+        self._sqnorms[rows] = np.einsum("ij,ij->i", matrix, matrix)
+        self._ids[rows] = ids
+        self._users[rows] = user_id
+        self._types[rows] = types
+        self._zones[rows] = zones
+        self._row_of[ids] = rows
+        self._user_rows[user_id] = rows
+
+    def _allocate(self, count: int, max_id: int) -> np.ndarray:
+        free = np.concatenate(self._free) if self._free else np.zeros(0, dtype=np.int64)
+        reused, free = free[:count], free[count:]
+        self._free = [free] if len(free) else []
+        fresh = np.arange(self._size, self._size + count - len(reused), dtype=np.int64)
+        self._size += len(fresh)
+        self._grow_rows(self._size)
+        if max_id >= len(self._row_of):
+            grown = np.full(max(max_id + 1, 2 * len(self._row_of)), -1, dtype=np.int64)
+            grown[:len(self._row_of)] = self._row_of
+            self._row_of = grown
+        return np.concatenate([reused, fresh])
+
+    def _grow_rows(self, needed: int):
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+        capacity = max(needed, 2 * capacity, 1024)
+        for name in ("_matrix", "_sqnorms", "_ids", "_users", "_types", "_zones"):
+            old = getattr(self, name)
+            new = np.zeros(old.shape[:-1] + (capacity,), dtype=old.dtype)
+            new[..., :old.shape[-1]] = old
+            setattr(self, name, new)
+        self._users[self._size:] = -1
+        self._sqnorms[self._size:] = np.inf
+
+    def _code(self, kind: str, values: pd.Series) -> np.ndarray:
+        # Small dense integer codes; missing/blank values are -1
+        table = self._codes[kind]
+        values = values.where(values.notna() & (values != ""), None)
+        for value in pd.unique(values.dropna()):
+            table.setdefault(value, len(table))
+        return values.map(table).fillna(-1).to_numpy(dtype=np.int32)
+
+    @staticmethod
+    def encode(frame: pd.DataFrame) -> np.ndarray:
+        """Scaled feature rows for a frame of ``INDEX_COLUMNS``"""
+        def numeric(column: str, typical: float) -> np.ndarray:
+            return pd.to_numeric(frame[column], errors="coerce").fillna(typical).to_numpy(dtype=np.float64)
+
+        # to_numpy may return a read-only view of the frame, so never write into it
+        size = numeric("size_sqft", TYPICAL_SIZE_SQFT)
+        size = np.where(size > 0, size, TYPICAL_SIZE_SQFT)
+        epc = frame["epc_rating"].str.upper().map(PortfolioAccumulator.EPC_SCORES)
+        columns = [
+            numeric("bedrooms", TYPICAL_BEDROOMS) / BEDROOM_SCALE,
+            numeric("bathrooms", TYPICAL_BATHROOMS) / BATHROOM_SCALE,
+            np.log(size) / SIZE_SCALE,
+            epc.fillna(TYPICAL_EPC_SCORE).to_numpy(dtype=np.float64) / EPC_SCALE,
+            *((frame[feature] == "Yes").to_numpy(dtype=np.float64) / FEATURE_SCALE
+              for feature in PortfolioAccumulator.FEATURES),
+        ]
+        return np.column_stack(columns).astype(np.float32)
+
+    # Search
+
+    def owner(self, property_id: int) -> Optional[int]:
+        with self._lock:
+            row = self._row_of[property_id] if 0 <= property_id < len(self._row_of) else -1
+            return int(self._users[row]) if row >= 0 else None
+
+    def nearest(self, property_id: int, k: int = 20, user_id: Optional[int] = None) -> List[Tuple[int, int, float]]:
+        """The ``k`` properties closest to ``property_id`` as ``(id, user_id,
+        distance)``, nearest first; within ``user_id``'s portfolio if given,
+        otherwise across the whole book"""
+        with self._lock:
+            if self.owner(property_id) is None:
+                raise KeyError(property_id)
+            row = self._row_of[property_id]
+            query = self._matrix[:, row].copy()
+            qtype, qzone = self._types[row], self._zones[row]
+            candidates = self._user_rows.get(user_id) if user_id is not None else None
+            total = len(candidates) if candidates is not None else self._size
+
+            best_rows, best_dist = [], []
+            for start in range(0, total, BLOCK_ROWS):
+                if candidates is not None:
+                    rows = candidates[start:start + BLOCK_ROWS]
+                    block = rows
+                else:
+                    rows = None
+                    block = slice(start, min(start + BLOCK_ROWS, total))
+                # |x - q|^2 = |x|^2 - 2 x.q + |q|^2; |q|^2 is the same for
+                # every row, and free rows have an infinite |x|^2
+                dist = query @ self._matrix[:, block]
+                dist *= -2
+                dist += self._sqnorms[block]
+                dist += (self._types[block] != qtype) * np.float32(TYPE_PENALTY)
+                if qzone >= 0:
+                    dist += (self._zones[block] != qzone) * np.float32(DATAZONE_PENALTY)
+                if rows is None:
+                    if block.start <= row < block.stop:
+                        dist[row - block.start] = np.inf
+                else:
+                    dist[rows == row] = np.inf
+                keep = np.argpartition(dist, k)[:k] if len(dist) > k else np.arange(len(dist))
+                best_rows.append(rows[keep] if rows is not None else block.start + keep)
+                best_dist.append(dist[keep])
+
+            if not best_rows:
+                return []
+            rows, dist = np.concatenate(best_rows), np.concatenate(best_dist)
+            order = np.argsort(dist, kind="stable")[:k]
+            rows, dist = rows[order], dist[order]
+            finite = np.isfinite(dist)
+            rows, dist = rows[finite], np.sqrt(np.maximum(dist[finite] + float(self._sqnorms[row]), 0))
+            return [
+                (int(self._ids[r]), int(self._users[r]), round(float(d), 4))
+                for r, d in zip(rows, dist)
+            ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "properties": len(self),
+            "portfolios": len(self._user_rows),
+            "capacity": len(self._ids),
+            "matrix_mb": round(self._matrix.nbytes / 1e6, 1),
+        }
+
+
+comparables_index = ComparablesIndex()
+
+COMPARABLE_COLUMNS = [
+    Property.id, Property.user_id, Property.property_type, Property.bedrooms, Property.bathrooms,
+    Property.size_sqft, Property.epc_rating, Property.datazone, Property.parking, Property.garden,
+    Property.solar_panels, Property.new_build,
+]
+
+
+def find_comparables(
+    db: Session, user_id: int, property_id: int, k: int = 20, scope: str = "portfolio",
+    index: Optional[ComparablesIndex] = None,
+) -> Optional[Dict[str, Any]]:
+    """The ``k`` properties most similar to one of the user's properties,
+    from their portfolio or the whole book; ``None`` if it isn't theirs.
+
+    Matches from other users' portfolios carry no id (or address), only the
+    features that made them comparable.
+    """
+    index = comparables_index if index is None else index
+    # One critical section, so a sync in another thread cannot move the
+    # property between the ownership check and the search
+    with index._lock:
+        if scope == "book":
+            index.sync(db, max_age=COMPARABLES_SYNC_SECONDS)
+        index.sync(db, user_id)
+        if index.owner(property_id) != user_id:
+            return None
+        matches = index.nearest(property_id, k, user_id if scope == "portfolio" else None)
+
+    ids = [match_id for match_id, _, _ in matches]
+    details = {
+        row.id: row._asdict()
+        for row in db.execute(select(*COMPARABLE_COLUMNS).where(Property.id.in_(ids)))
+    } if ids else {}
+
+    comparables = []
+    for match_id, _, distance in matches:
+        fields = details.get(match_id)
+        if fields is None:
+            continue  # deleted since the index was synced
+        if fields.pop("user_id") != user_id:
+            fields["id"] = None
+        comparables.append({**fields, "distance": distance})
+    return {"property_id": property_id, "scope": scope, "comparables": comparables}
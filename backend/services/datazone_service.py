@@ -0,0 +1,245 @@
+"""Datazone benchmarks aggregated across every portfolio.
+
+A stats run groups the whole properties table by ``datazone`` into one
+``datazone_stats`` row per area (counts, median size, EPC bands and
+feature counts). The aggregation runs before anything is written, and the
+new set is swapped in with one short transaction, so property writes are
+not held behind the SQLite write lock and readers see either the previous
+run or the new one. Areas with fewer than ``DATAZONE_STATS_MIN_PROPERTIES``
+properties are left out, so a benchmark never describes one or two other
+users' homes. Portfolio analysis
+then joins a user's datazones to that table through
+``ix_properties_user_datazone`` instead of reading other users' rows.
+
+Run it nightly and after a postcode dataset reload::
+
+    python -m services.datazone_service rebuild
+"""
+from collections import defaultdict
+from concurrent.futures import Future
+from datetime import datetime
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.orm import Session
+from typing import Any, Callable, Dict, List, Optional
+from models import DatazoneStats, DatazoneStatsRun, Property
+from services.portfolio_service import PortfolioAccumulator
+import argparse
+import logging
+import os
+import threading
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Largest datazones of a portfolio that get a benchmark in its analysis
+AREA_BENCHMARK_LIMIT = 50
+
+# Smallest area published; below this a benchmark would expose individual properties
+DATAZONE_STATS_MIN_PROPERTIES = int(os.getenv("DATAZONE_STATS_MIN_PROPERTIES", "5"))
+
+EPC_COLUMNS = {letter: f"epc_{letter.lower()}" for letter in PortfolioAccumulator.EPC_SCORES}
+
+
+def _stats_columns() -> list:
+    def count_if(condition):
+        return func.count(case((condition, 1)))
+
+    epc = func.upper(Property.epc_rating)
+    return [
+        Property.datazone,
+        func.count().label("properties"),
+        count_if(Property.size_sqft > 0).label("sized"),
+        *(count_if(epc == letter).label(column) for letter, column in EPC_COLUMNS.items()),
+        *(count_if(getattr(Property, feature) == "Yes").label(feature) for feature in PortfolioAccumulator.FEATURES),
+    ]
+
+
+def _median_sizes(db: Session) -> Dict[str, float]:
+    # Medians have no portable SQL aggregate; two narrow columns are cheap to group here
+    result = db.execute(
+        select(Property.datazone, Property.size_sqft)
+        .where(Property.datazone.is_not(None), Property.datazone != "", Property.size_sqft > 0)
+    )
+    frame = pd.DataFrame(result.all(), columns=["datazone", "size_sqft"])
+    if frame.empty:
+        return {}
+    return frame.groupby("datazone")["size_sqft"].median().to_dict()
+
+
+def rebuild_datazone_stats(db: Session, min_properties: int = DATAZONE_STATS_MIN_PROPERTIES) -> DatazoneStatsRun:
+    """Recompute every datazone's stats and replace the previous run's rows"""
+    started_at = datetime.utcnow()
+    # Read-only until the aggregation is done; the first write below takes
+    # the write lock only for the swap itself
+    rows = db.execute(
+        select(*_stats_columns())
+        .where(Property.datazone.is_not(None), Property.datazone != "")
+        .group_by(Property.datazone)
+        .having(func.count() >= min_properties)
+    ).mappings().all()
+    medians = _median_sizes(db)
+    # End the read transaction so the swap starts on a fresh snapshot
+    db.commit()
+
+    run = DatazoneStatsRun(started_at=started_at)
+    db.add(run)
+    db.flush()
+    db.execute(delete(DatazoneStats))
+    if rows:
+        db.execute(DatazoneStats.__table__.insert(), [
+            {**row, "generation": run.generation, "median_size_sqft": medians.get(row["datazone"])}
+            for row in rows
+        ])
+    run.datazones = len(rows)
+    run.properties = sum(row["properties"] for row in rows)
+    run.finished_at = datetime.utcnow()
+    db.commit()
+    logger.info("Datazone stats generation %d: %d datazones, %d properties", run.generation, run.datazones, run.properties)
+    return run
+
+
+def stats_generation(db: Session) -> int:
+    """Generation of the current datazone stats; 0 if none have been built"""
+    return db.execute(
+        select(func.max(DatazoneStatsRun.generation)).where(DatazoneStatsRun.finished_at.is_not(None))
+    ).scalar() or 0
+
+
+def latest_stats_run(db: Session) -> Optional[DatazoneStatsRun]:
+    return db.execute(
+        select(DatazoneStatsRun)
+        .where(DatazoneStatsRun.finished_at.is_not(None))
+        .order_by(DatazoneStatsRun.generation.desc())
+        .limit(1)
+    ).scalar()
+
+
+def area_benchmark(stats: DatazoneStats) -> Dict[str, Any]:
+    """API shape of a stats row: shares of the area's properties"""
+    def share(count: int) -> float:
+        return round(count / stats.properties, 4) if stats.properties else 0.0
+
+    return {
+        "datazone": stats.datazone,
+        "properties": stats.properties,
+        "median_size_sqft": stats.median_size_sqft,
+        "epc_distribution": {letter: share(getattr(stats, column)) for letter, column in EPC_COLUMNS.items()},
+        "feature_rates": {feature: share(getattr(stats, feature)) for feature in PortfolioAccumulator.FEATURES},
+    }
+
+
+def datazone_benchmark(db: Session, datazone: str) -> Optional[Dict[str, Any]]:
+    stats = db.get(DatazoneStats, datazone)
+    return area_benchmark(stats) if stats is not None else None
+
+
+def portfolio_area_benchmarks(db: Session, user_id: int, limit: int = AREA_BENCHMARK_LIMIT) -> List[Dict[str, Any]]:
+    """Benchmarks for the datazones holding most of the user's properties,
+    each with ``your_properties``: the user's count in that area"""
+    counts = (
+        select(Property.datazone, func.count().label("your_properties"))
+        .where(Property.user_id == user_id, Property.datazone.is_not(None))
+        .group_by(Property.datazone)
+        .subquery()
+    )
+    rows = db.execute(
+        select(DatazoneStats, counts.c.your_properties)
+        .join(counts, counts.c.datazone == DatazoneStats.datazone)
+        .order_by(counts.c.your_properties.desc(), DatazoneStats.datazone)
+        .limit(limit)
+    ).all()
+    return [{**area_benchmark(stats), "your_properties": mine} for stats, mine in rows]
+
+
+def area_benchmarks_by_user(db: Session, conditions: list, limit: int = AREA_BENCHMARK_LIMIT) -> Dict[int, List[Dict[str, Any]]]:
+    """``portfolio_area_benchmarks`` for every user owning properties that
+    match ``conditions``, in two queries rather than one per user"""
+    counts = defaultdict(list)
+    for user_id, datazone, mine in db.execute(
+        select(Property.user_id, Property.datazone, func.count())
+        .where(*conditions, Property.datazone.is_not(None))
+        .group_by(Property.user_id, Property.datazone)
+    ):
+        counts[user_id].append((datazone, mine))
+    if not counts:
+        return {}
+    # Plain rows rather than ORM objects, each shaped once on first use
+    stats = {row.datazone: row for row in db.execute(select(DatazoneStats.__table__))}
+    shaped = {}
+
+    benchmarks = {}
+    for user_id, areas in counts.items():
+        areas = sorted((area for area in areas if area[0] in stats), key=lambda area: (-area[1], area[0]))
+        benchmarks[user_id] = [
+            {**(shaped.get(datazone) or shaped.setdefault(datazone, area_benchmark(stats[datazone]))), "your_properties": mine}
+            for datazone, mine in areas[:limit]
+        ]
+    return benchmarks
+
+
+def run_datazone_stats_rebuild() -> int:
+    """Process-pool entry point; returns the new generation"""
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return rebuild_datazone_stats(db).generation
+    finally:
+        db.close()
+
+
+class DatazoneStatsRebuilds:
+    """At most one background stats run per API process"""
+
+    def __init__(self):
+        self._future: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._future is not None and not self._future.done()
+
+    def start(self, submit: Callable[..., Future]) -> bool:
+        """Start a run through ``submit`` (e.g. ``analysis_jobs.run``); False
+        if one is still running"""
+        with self._lock:
+            if self.running:
+                return False
+            self._future = submit(run_datazone_stats_rebuild)
+            self._future.add_done_callback(self._log_failure)
+            return True
+
+    @staticmethod
+    def _log_failure(future: Future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("Datazone stats rebuild failed: %s", future.exception())
+
+
+datazone_stats_rebuilds = DatazoneStatsRebuilds()
+
+
+def main():
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Datazone benchmark statistics")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("rebuild", help="recompute stats for every datazone")
+    show = subparsers.add_parser("show", help="print one datazone's stats")
+    show.add_argument("datazone")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            run = rebuild_datazone_stats(db)
+            print(f"Generation {run.generation}: {run.datazones} datazone(s), {run.properties} properties")
+        if args.command == "show":
+            benchmark = datazone_benchmark(db, args.datazone)
+            print(benchmark if benchmark is not None else f"No stats for {args.datazone}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+from sqlalchemy.orm import Session
+from pydantic import ValidationError
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+from datetime import datetime
+from models import Property
+from schemas import PropertyCreate
+from services.postcode_service import PostcodeIndex
+from services.portfolio_service import accumulate, apply_portfolio_delta
+import codecs
+import csv
+import json
+
+
+def detect_import_format(filename: str = "", content_type: str = "") -> str:
+    """Return ``"jsonl"`` or ``"csv"`` for an uploaded file"""
+    name = (filename or "").lower()
+    if name.endswith((".jsonl", ".ndjson", ".json")) or "json" in (content_type or ""):
+        return "jsonl"
+    return "csv"
+
+
+class _DecodedLines:
+    """Upload lines decoded as UTF-8 (BOM stripped). A line that is not
+    valid UTF-8 is passed on with replacement characters so parsing can
+    carry on, and the error is kept for the row it belongs to."""
+
+    def __init__(self, fileobj: BinaryIO):
+        self._lines = iter(fileobj)
+        self._first = True
+        self.error: Optional[ValueError] = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        raw = next(self._lines)
+        if self._first:
+            self._first = False
+            if raw.startswith(codecs.BOM_UTF8):
+                raw = raw[len(codecs.BOM_UTF8):]
+        try:
+            return raw.decode("utf-8")
+        except UnicodeDecodeError as exc:
+            self.error = self.error or ValueError(
+                f"not valid UTF-8 (byte 0x{raw[exc.start]:02x}); save the file as UTF-8"
+            )
+            return raw.decode("utf-8", "replace")
+
+    def take_error(self) -> Optional[ValueError]:
+        error, self.error = self.error, None
+        return error
+
+
+def iter_import_rows(fileobj: BinaryIO, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Yield ``(row_number, row)`` from a CSV or JSONL upload without reading it all.
+
+    Row numbers are 1-based data rows (the CSV header is not counted). A row
+    that cannot be decoded or parsed is yielded as an ``Exception`` so the
+    caller can report it and carry on.
+    """
+    lines = _DecodedLines(fileobj)
+    if fmt == "jsonl":
+        row_number = 0
+        for line in lines:
+            error = lines.take_error()
+            if not line.strip() and error is None:
+                continue
+            row_number += 1
+            if error is not None:
+                yield row_number, error
+                continue
+            try:
+                yield row_number, json.loads(line)
+            except ValueError as exc:
+                yield row_number, exc
+    else:
+        reader = csv.DictReader(lines)
+        row_number = 0
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                break
+            except csv.Error as exc:
+                row = exc
+            row_number += 1
+            # A row with an undecodable line is reported rather than imported garbled
+            error = lines.take_error()
+            if error is not None or isinstance(row, Exception):
+                yield row_number, error or row
+                continue
+            # Empty CSV cells mean "not provided", not an empty string
+            yield row_number, {
+                key.strip(): value.strip()
+                for key, value in row.items()
+                if key and value is not None and value.strip() != ""
+            }
+
+
+class PropertyImportService:
+    """Streams a CSV/JSONL portfolio file into the properties table in chunks"""
+
+    MAX_REPORTED_ERRORS = 1000
+
+    def __init__(self, db: Session, postcode_index: PostcodeIndex, chunk_size: int = 2000):
+        self.db = db
+        self.postcode_index = postcode_index
+        self.chunk_size = chunk_size
+
+    def import_rows(self, rows: Iterator[Tuple[int, Any]], user_id: int) -> Dict[str, Any]:
+        """Validate, resolve and insert rows; returns counts and a per-row error report"""
+        imported = 0
+        failed = 0
+        errors: List[Dict[str, Any]] = []
+        chunk: List[Dict[str, Any]] = []
+
+        for row_number, row in rows:
+            row_errors = self._validate(row, chunk)
+            if row_errors:
+                failed += 1
+                if len(errors) < self.MAX_REPORTED_ERRORS:
+                    errors.append({"row": row_number, "errors": row_errors})
+            if len(chunk) >= self.chunk_size:
+                imported += self._insert_chunk(chunk, user_id)
+                chunk = []
+
+        if chunk:
+            imported += self._insert_chunk(chunk, user_id)
+
+        return {
+            "imported": imported,
+            "failed": failed,
+            "errors": errors,
+            "errors_truncated": failed > len(errors),
+        }
+
+    def import_file(self, fileobj: BinaryIO, fmt: str, user_id: int) -> Dict[str, Any]:
+        return self.import_rows(iter_import_rows(fileobj, fmt), user_id)
+
+    def _validate(self, row: Any, chunk: List[Dict[str, Any]]) -> List[str]:
+        if isinstance(row, Exception):
+            return [f"Could not parse row: {row}"]
+        if not isinstance(row, dict):
+            return ["Row must be an object"]
+        try:
+            chunk.append(PropertyCreate.model_validate(row).model_dump())
+        except ValidationError as exc:
+            return [
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                for error in exc.errors()
+            ]
+        return []
+
+    def _insert_chunk(self, chunk: List[Dict[str, Any]], user_id: int) -> int:
+        """Resolve datazones for the chunk in one pass and insert it with one executemany"""
+        now = datetime.utcnow()
+        datazones = self.postcode_index.resolve_many([row["postcode"] for row in chunk])
+        for row, datazone in zip(chunk, datazones):
+            row.update({
+                "user_id": user_id,
+                "datazone": datazone,
+                "created_at": now,
+                "updated_at": now,
+            })
+        # Core insert: a plain executemany without ORM bulk-persistence overhead
+        self.db.execute(Property.__table__.insert(), chunk)
+        apply_portfolio_delta(self.db, user_id, accumulate(chunk))
+        self.db.commit()
+        return len(chunk)
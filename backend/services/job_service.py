@@ -0,0 +1,262 @@
+"""Background analysis jobs run on a local process pool.
+
+A job is a row in ``analysis_jobs``; the API inserts it and hands its id to
+``analysis_jobs``, a lazily started ``ProcessPoolExecutor``. Each worker
+process opens its own engine (``database`` is imported fresh under the
+spawn start method), runs the job's reports one by one, and records
+progress, the JSON result or the error on the row, so any API worker can
+answer status polls. No broker is needed; the table is the queue's state.
+"""
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy import delete, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import AnalysisJob
+from schemas import PropertyAnalysis
+from services.analysis_service import AnalysisService
+from services.portfolio_service import PortfolioAccumulator, accumulate
+from services.property_service import PropertyService
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_JOB_WORKERS = int(os.getenv("ANALYSIS_JOB_WORKERS", "2"))
+# Jobs still queued/running this long after creation are failed at startup
+ANALYSIS_JOB_TIMEOUT_SECONDS = float(os.getenv("ANALYSIS_JOB_TIMEOUT_SECONDS", "3600"))
+ANALYSIS_JOB_RETENTION_HOURS = float(os.getenv("ANALYSIS_JOB_RETENTION_HOURS", "168"))
+# Row lists shorter than this are folded in-process; below it, starting the
+# pool and pickling chunks costs more than the analysis (~40 ms per 10k rows)
+ANALYSIS_POOL_MIN_ROWS = int(os.getenv("ANALYSIS_POOL_MIN_ROWS", "50000"))
+
+
+def _portfolio(db: Session, user_id: int, params: Dict[str, Any]):
+    return PropertyService(db).analyze_portfolio(user_id).model_dump()
+
+
+def _statistics(db: Session, user_id: int, params: Dict[str, Any]):
+    return PropertyService(db).get_property_statistics(user_id)
+
+
+def _market(db: Session, user_id: int, params: Dict[str, Any]):
+    return AnalysisService(db).market_analysis(user_id, params.get("location_filter"))
+
+
+def _comparison(db: Session, user_id: int, params: Dict[str, Any]):
+    return AnalysisService(db).property_comparison(params.get("property_ids") or [], user_id)
+
+
+def _optimization(db: Session, user_id: int, params: Dict[str, Any]):
+    return AnalysisService(db).portfolio_optimization(user_id)
+
+
+REPORTS: Dict[str, Callable[[Session, int, Dict[str, Any]], Any]] = {
+    "portfolio": _portfolio,
+    "statistics": _statistics,
+    "market": _market,
+    "comparison": _comparison,
+    "optimization": _optimization,
+}
+
+# Reports each job kind runs, in order; progress advances per report
+JOB_REPORTS: Dict[str, List[str]] = {
+    **{name: [name] for name in REPORTS},
+    "full": ["portfolio", "statistics", "market", "optimization"],
+}
+
+
+def _set_progress(db: Session, job_id: str, **values):
+    db.execute(update(AnalysisJob).where(AnalysisJob.id == job_id).values(**values))
+    db.commit()
+
+
+def run_job(job_id: str):
+    """Worker entry point: run a queued job and record its outcome on the row"""
+    db = SessionLocal()
+    try:
+        job = db.get(AnalysisJob, job_id)
+        if job is None or job.status != "queued":
+            return
+        user_id, params = job.user_id, json.loads(job.params or "{}")
+        reports = JOB_REPORTS[job.kind]
+        _set_progress(db, job_id, status="running", started_at=datetime.utcnow(), progress=0.0)
+
+        result = {}
+        try:
+            for done, name in enumerate(reports):
+                _set_progress(db, job_id, progress=done / len(reports), message=f"Running {name} analysis")
+                result[name] = REPORTS[name](db, user_id, params)
+        except Exception as exc:
+            db.rollback()
+            logger.exception("Analysis job %s failed", job_id)
+            _set_progress(
+                db, job_id, status="failed", error=f"{type(exc).__name__}: {exc}",
+                message=None, finished_at=datetime.utcnow(),
+            )
+            return
+
+        _set_progress(
+            db, job_id, status="succeeded", progress=1.0, message=None,
+            result=json.dumps(result), finished_at=datetime.utcnow(),
+        )
+    finally:
+        db.close()
+
+
+def fail_job(job_id: str, error: str):
+    """Mark a job that never reached a terminal state as failed"""
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id == job_id, AnalysisJob.status.in_(["queued", "running"]))
+            .values(status="failed", error=error, message=None, finished_at=datetime.utcnow())
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def fail_lost_job(job_id: str, future: Future):
+    # run_job records its own errors; this only sees the worker dying or
+    # the job being cancelled, either of which leaves the row in flight
+    if future.cancelled():
+        error = "Cancelled before it started"
+    elif future.exception() is not None:
+        error = f"Worker stopped: {type(future.exception()).__name__}: {future.exception()}"
+    else:
+        return
+    logger.error("Analysis job %s: %s", job_id, error)
+    fail_job(job_id, error)
+
+
+class AnalysisJobQueue:
+    """Process pool for analysis jobs, started on first use.
+
+    Uses the spawn start method: forking an API process that already runs
+    an event loop, thread pools and pooled DB connections is not safe. A
+    worker dying (OOM kill, segfault) breaks the whole executor, so a
+    broken one is dropped and the next submission starts a fresh pool.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def run(self, fn: Callable, *args) -> Future:
+        """Submit ``fn(*args)`` to the pool, replacing it once if it is broken"""
+        executor = self.pool()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._discard(executor)
+            executor = self.pool()
+            future = executor.submit(fn, *args)
+        future.add_done_callback(lambda done: self._check_broken(executor, done))
+        return future
+
+    def submit(self, job_id: str) -> Future:
+        future = self.run(run_job, job_id)
+        future.add_done_callback(lambda done: fail_lost_job(job_id, done))
+        return future
+
+    def _check_broken(self, executor: ProcessPoolExecutor, future: Future):
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self._discard(executor)
+
+    def _discard(self, executor: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is not executor:
+                return
+            logger.error("Analysis worker pool is broken; a new one starts on next use")
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=not wait)
+                self._executor = None
+
+
+analysis_jobs = AnalysisJobQueue(ANALYSIS_JOB_WORKERS)
+
+
+def new_job(user_id: int, kind: str, params: Optional[Dict[str, Any]] = None) -> AnalysisJob:
+    """A queued job row; add and commit it, then ``analysis_jobs.submit(job.id)``"""
+    if kind not in JOB_REPORTS:
+        raise ValueError(f"Unknown analysis job kind: {kind!r}")
+    return AnalysisJob(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        kind=kind,
+        params=json.dumps(params or {}),
+        status="queued",
+        progress=0.0,
+        created_at=datetime.utcnow(),
+    )
+
+
+def job_result(job: AnalysisJob) -> Optional[Dict[str, Any]]:
+    return json.loads(job.result) if job.result else None
+
+
+def expire_stale_jobs(engine: Engine) -> int:
+    """Fail jobs orphaned by a restart and purge old finished ones; returns jobs failed"""
+    now = datetime.utcnow()
+    with Session(engine) as db:
+        result = db.execute(
+            update(AnalysisJob)
+            .where(
+                AnalysisJob.status.in_(["queued", "running"]),
+                AnalysisJob.created_at < now - timedelta(seconds=ANALYSIS_JOB_TIMEOUT_SECONDS),
+            )
+            .values(status="failed", error="Timed out (worker stopped?)", finished_at=now)
+        )
+        db.execute(
+            delete(AnalysisJob).where(
+                AnalysisJob.status.in_(["succeeded", "failed"]),
+                AnalysisJob.finished_at < now - timedelta(hours=ANALYSIS_JOB_RETENTION_HOURS),
+            )
+        )
+        db.commit()
+        return result.rowcount
+
+
+def analyse_property_rows(
+    rows: List[Dict[str, Any]], chunk_size: int = 250, on_progress: Optional[Callable[[float], None]] = None
+) -> PropertyAnalysis:
+    """Analyse property dicts that are not in the database (the Streamlit
+    app keeps its own list), folding chunks on the job worker processes
+    once the list is long enough to be worth it"""
+    if len(rows) < ANALYSIS_POOL_MIN_ROWS:
+        result = accumulate(rows).result()
+        if on_progress is not None:
+            on_progress(1.0)
+        return result
+
+    total = PortfolioAccumulator()
+    chunks = [rows[start:start + chunk_size] for start in range(0, len(rows), chunk_size)]
+    futures = [analysis_jobs.run(accumulate, chunk) for chunk in chunks]
+    for done, future in enumerate(as_completed(futures), start=1):
+        total.merge(future.result())
+        if on_progress is not None:
+            on_progress(done / len(chunks))
+    return total.result()
@@ -0,0 +1,397 @@
+from sqlalchemy import case, delete, func, insert, literal, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, Iterable, List, Optional
+from collections import Counter
+from datetime import datetime
+from types import SimpleNamespace
+from models import Property, PortfolioAggregate, PortfolioTypeCount
+from schemas import PropertyAnalysis
+import argparse
+
+
+# Rough value heuristic used wherever an estimated value is needed; there is
+# no persisted valuation
+ESTIMATED_VALUE_PER_SQFT = 250
+
+
+class PortfolioAccumulator:
+    """Running totals behind ``analyze_portfolio``.
+
+    Fed one property at a time (``add`` / ``remove``), built from SQL
+    aggregates (``from_aggregates``) or read back from the
+    ``portfolio_aggregates`` table. The counters are plain sums, so the
+    difference of two accumulators is a delta that can be applied to the
+    stored totals. Memory is constant in the number of properties (the only
+    collection is the per-type counter).
+    """
+
+    COLUMNS = (
+        Property.epc_rating, Property.size_sqft, Property.property_type,
+        Property.solar_panels, Property.garden, Property.parking, Property.new_build,
+    )
+    FIELDS = tuple(column.key for column in COLUMNS)
+
+    # Stored per user in portfolio_aggregates, one column each
+    COUNTERS = (
+        "total", "epc_sum", "epc_count", "good_epc", "poor_epc", "sized", "size_sum",
+        "parking", "garden", "solar_panels", "new_build",
+    )
+
+    # EPC average as a letter (A best, G worst)
+    EPC_SCORES = {"A": 7, "B": 6, "C": 5, "D": 4, "E": 3, "F": 2, "G": 1}
+    EPC_LETTERS = {v: k for k, v in EPC_SCORES.items()}
+
+    GOOD_EPC = ("A", "B", "C")
+    POOR_EPC = ("E", "F", "G")
+
+    FEATURES = ("parking", "garden", "solar_panels", "new_build")
+
+    def __init__(self):
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.type_counts = Counter()
+
+    def add(self, p, sign: int = 1):
+        """Fold in one property (anything with the ``COLUMNS`` attributes)"""
+        self.total += sign
+        epc = (p.epc_rating or "").upper()
+        if epc in self.EPC_SCORES:
+            self.epc_sum += sign * self.EPC_SCORES[epc]
+            self.epc_count += sign
+        if epc in self.GOOD_EPC:
+            self.good_epc += sign
+        elif epc in self.POOR_EPC:
+            self.poor_epc += sign
+        if p.size_sqft:
+            self.size_sum += sign * p.size_sqft
+            self.sized += sign
+        for feature in self.FEATURES:
+            if getattr(p, feature) == "Yes":
+                setattr(self, feature, getattr(self, feature) + sign)
+        if p.property_type:
+            self.type_counts[p.property_type] += sign
+
+    def remove(self, p):
+        self.add(p, sign=-1)
+
+    def merge(self, other: "PortfolioAccumulator", sign: int = 1):
+        for name in self.COUNTERS:
+            setattr(self, name, getattr(self, name) + sign * getattr(other, name))
+        for property_type, count in other.type_counts.items():
+            self.type_counts[property_type] += sign * count
+
+    def is_empty(self) -> bool:
+        return not any(getattr(self, name) for name in self.COUNTERS) and not any(self.type_counts.values())
+
+    @classmethod
+    def from_aggregates(cls, row, type_counts: Dict[str, int]) -> "PortfolioAccumulator":
+        """Totals from a row with one attribute per ``COUNTERS`` name"""
+        accumulator = cls()
+        for name in cls.COUNTERS:
+            setattr(accumulator, name, getattr(row, name) or 0)
+        accumulator.type_counts = Counter({t: c for t, c in type_counts.items() if c})
+        return accumulator
+
+    @property
+    def score(self) -> int:
+        # Investment score weights: A-C EPC 20, solar 15, garden 10, parking 10, new build 15
+        return 20 * self.good_epc + 15 * self.solar_panels + 10 * self.garden + 10 * self.parking + 15 * self.new_build
+
+    def result(self) -> PropertyAnalysis:
+        if not self.total:
+            return PropertyAnalysis(
+                total_properties=0,
+                avg_epc_rating=None,
+                total_value_estimate=None,
+                recommendations=[],
+                energy_efficiency_score=None,
+                investment_score=None,
+                risk_assessment="Low",
+            )
+
+        total = self.total
+        avg_epc_rating = (
+            self.EPC_LETTERS.get(round(self.epc_sum / self.epc_count)) if self.epc_count else None
+        )
+        # Naive total value estimate based on size if available
+        total_value_estimate = float(self.size_sum * ESTIMATED_VALUE_PER_SQFT) if self.sized else None
+        # Energy efficiency score (0-100) based on proportion of A-C ratings
+        energy_efficiency_score = round(100 * self.good_epc / total, 2)
+        investment_score = min(round(self.score / total), 100)
+
+        # Risk assessment based on concentration and EPC distribution
+        type_counts = [count for count in self.type_counts.values() if count > 0]
+        max_concentration = (max(type_counts) / total) if type_counts else 0
+        risk_score = 0
+        if max_concentration > 0.7:
+            risk_score += 1
+        if self.poor_epc > total * 0.3:
+            risk_score += 1
+        risk_assessment = "Low" if risk_score == 0 else ("Medium" if risk_score == 1 else "High")
+
+        # Recommendations
+        recommendations: List[str] = []
+        if self.poor_epc:
+            recommendations.append(
+                f"Consider improving EPC ratings for {self.poor_epc} properties"
+            )
+        if max_concentration > 0.7:
+            recommendations.append("Diversify property types to reduce concentration risk")
+        if not self.sized:
+            recommendations.append("Add property sizes to improve value estimates")
+
+        return PropertyAnalysis(
+            total_properties=total,
+            avg_epc_rating=avg_epc_rating,
+            total_value_estimate=total_value_estimate,
+            recommendations=recommendations,
+            energy_efficiency_score=energy_efficiency_score,
+            investment_score=investment_score,
+            risk_assessment=risk_assessment,
+        )
+
+
+def accumulate(rows: Iterable[Dict[str, Any]]) -> PortfolioAccumulator:
+    """Totals over property dicts (missing keys count as unset)"""
+    accumulator = PortfolioAccumulator()
+    for row in rows:
+        accumulator.add(SimpleNamespace(**{name: row.get(name) for name in PortfolioAccumulator.FIELDS}))
+    return accumulator
+
+
+def aggregate_columns(overrides: Optional[Dict[str, Any]] = None) -> list:
+    """SELECT expressions computing the ``PortfolioAccumulator.COUNTERS``.
+
+    ``overrides`` replaces columns with constants, giving the totals the
+    selected rows *would* have after ``UPDATE ... SET`` those values.
+    """
+    overrides = overrides or {}
+
+    def column(name: str):
+        attribute = getattr(Property, name)
+        return literal(overrides[name], type_=attribute.type) if name in overrides else attribute
+
+    def count_if(condition):
+        return func.count(case((condition, 1)))
+
+    epc = func.upper(column("epc_rating"))
+    size = column("size_sqft")
+    sized = size != 0  # NULL compares as unknown, so also excluded
+    return [
+        func.count().label("total"),
+        func.coalesce(func.sum(case(PortfolioAccumulator.EPC_SCORES, value=epc)), 0).label("epc_sum"),
+        count_if(epc.in_(PortfolioAccumulator.EPC_SCORES)).label("epc_count"),
+        count_if(epc.in_(PortfolioAccumulator.GOOD_EPC)).label("good_epc"),
+        count_if(epc.in_(PortfolioAccumulator.POOR_EPC)).label("poor_epc"),
+        count_if(sized).label("sized"),
+        func.coalesce(func.sum(case((sized, size))), 0).label("size_sum"),
+        *(count_if(column(feature) == "Yes").label(feature) for feature in PortfolioAccumulator.FEATURES),
+    ]
+
+
+def aggregate_portfolio(db: Session, conditions: list, overrides: Optional[Dict[str, Any]] = None) -> PortfolioAccumulator:
+    """Totals over the properties matching ``conditions``, computed in the database"""
+    row = db.execute(select(*aggregate_columns(overrides)).where(*conditions)).one()
+    if overrides and "property_type" in overrides:
+        type_counts = {overrides["property_type"]: row.total} if overrides["property_type"] else {}
+    else:
+        type_counts = dict(db.execute(
+            select(Property.property_type, func.count())
+            .where(*conditions, Property.property_type != "")
+            .group_by(Property.property_type)
+        ).all())
+    return PortfolioAccumulator.from_aggregates(row, type_counts)
+
+
+def apply_portfolio_delta(db: Session, user_id: int, delta: PortfolioAccumulator):
+    """Add ``delta`` to the user's stored totals inside the caller's transaction.
+
+    Call after the property write has been issued and before commit. A user
+    without a stored row gets one built from the (already changed) table.
+    """
+    db.flush()
+    result = db.execute(
+        update(PortfolioAggregate)
+        .where(PortfolioAggregate.user_id == user_id)
+        .values(
+            version=PortfolioAggregate.version + 1,
+            updated_at=datetime.utcnow(),
+            **{name: getattr(PortfolioAggregate, name) + getattr(delta, name) for name in PortfolioAccumulator.COUNTERS}
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        rebuild_portfolio_aggregates(db, [user_id], commit=False)
+        return
+
+    for property_type, count in delta.type_counts.items():
+        if not count:
+            continue
+        result = db.execute(
+            update(PortfolioTypeCount)
+            .where(PortfolioTypeCount.user_id == user_id, PortfolioTypeCount.property_type == property_type)
+            .values(count=PortfolioTypeCount.count + count)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            db.execute(insert(PortfolioTypeCount).values(user_id=user_id, property_type=property_type, count=count))
+
+
+async def apply_portfolio_delta_async(db: AsyncSession, user_id: int, delta: PortfolioAccumulator):
+    await db.run_sync(apply_portfolio_delta, user_id, delta)
+
+
+def read_portfolio(db: Session, user_id: int) -> Optional[PortfolioAccumulator]:
+    """The user's stored totals, or None if they have no aggregates row yet"""
+    row = db.get(PortfolioAggregate, user_id)
+    if row is None:
+        return None
+    type_counts = dict(db.execute(
+        select(PortfolioTypeCount.property_type, PortfolioTypeCount.count)
+        .where(PortfolioTypeCount.user_id == user_id, PortfolioTypeCount.count > 0)
+    ).all())
+    return PortfolioAccumulator.from_aggregates(row, type_counts)
+
+
+def portfolio_version(db: Session, user_id: int) -> int:
+    """Version of the user's stored totals; 0 if none are stored yet"""
+    return db.execute(
+        select(PortfolioAggregate.version).where(PortfolioAggregate.user_id == user_id)
+    ).scalar() or 0
+
+
+def bump_portfolio_versions(db: Session, user_ids: Iterable[int]):
+    """Mark portfolios changed by writes that leave the totals alone (e.g. datazones)"""
+    user_ids = list(user_ids)
+    if user_ids:
+        db.execute(
+            update(PortfolioAggregate)
+            .where(PortfolioAggregate.user_id.in_(user_ids))
+            .values(version=PortfolioAggregate.version + 1, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+
+def _recompute(db: Session, user_ids: Optional[Iterable[int]] = None) -> Dict[int, PortfolioAccumulator]:
+    """Fresh totals for ``user_ids`` (default: every user with properties), grouped in SQL"""
+    conditions = [] if user_ids is None else [Property.user_id.in_(list(user_ids))]
+    totals = {
+        row.user_id: PortfolioAccumulator.from_aggregates(row, {})
+        for row in db.execute(
+            select(Property.user_id, *aggregate_columns()).where(*conditions).group_by(Property.user_id)
+        )
+    }
+    for user_id in user_ids or ():
+        totals.setdefault(user_id, PortfolioAccumulator())
+    for user_id, property_type, count in db.execute(
+        select(Property.user_id, Property.property_type, func.count())
+        .where(*conditions, Property.property_type != "")
+        .group_by(Property.user_id, Property.property_type)
+    ):
+        totals[user_id].type_counts[property_type] = count
+    return totals
+
+
+def rebuild_portfolio_aggregates(db: Session, user_ids: Optional[Iterable[int]] = None, commit: bool = True) -> int:
+    """Recompute stored totals from the properties table; returns users rebuilt"""
+    totals = _recompute(db, user_ids)
+    if user_ids is None:
+        # Also reset users whose properties have all gone
+        for (user_id,) in db.execute(select(PortfolioAggregate.user_id)):
+            totals.setdefault(user_id, PortfolioAccumulator())
+
+    now = datetime.utcnow()
+    for user_id, accumulator in totals.items():
+        counters = {name: getattr(accumulator, name) for name in PortfolioAccumulator.COUNTERS}
+        result = db.execute(
+            update(PortfolioAggregate)
+            .where(PortfolioAggregate.user_id == user_id)
+            .values(version=PortfolioAggregate.version + 1, updated_at=now, **counters)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            db.execute(insert(PortfolioAggregate).values(user_id=user_id, version=1, updated_at=now, **counters))
+        db.execute(delete(PortfolioTypeCount).where(PortfolioTypeCount.user_id == user_id))
+        type_rows = [
+            {"user_id": user_id, "property_type": property_type, "count": count}
+            for property_type, count in accumulator.type_counts.items() if count
+        ]
+        if type_rows:
+            db.execute(insert(PortfolioTypeCount), type_rows)
+    if commit:
+        db.commit()
+    return len(totals)
+
+
+def check_portfolio_aggregates(db: Session) -> List[int]:
+    """Users whose stored totals differ from the properties table"""
+    expected = _recompute(db)
+    stored = {
+        row.user_id: PortfolioAccumulator.from_aggregates(row, {})
+        for row in db.execute(select(PortfolioAggregate))
+        .scalars()
+    }
+    for user_id, property_type, count in db.execute(
+        select(PortfolioTypeCount.user_id, PortfolioTypeCount.property_type, PortfolioTypeCount.count)
+        .where(PortfolioTypeCount.count != 0)
+    ):
+        if user_id in stored:
+            stored[user_id].type_counts[property_type] = count
+
+    drifted = []
+    for user_id in sorted(set(expected) | set(stored)):
+        want = expected.get(user_id, PortfolioAccumulator())
+        have = stored.get(user_id)
+        if have is None:
+            drifted.append(user_id)
+            continue
+        have.merge(want, sign=-1)
+        if not have.is_empty():
+            drifted.append(user_id)
+    return drifted
+
+
+def backfill_portfolio_aggregates(engine: Engine) -> int:
+    """Build stored totals for users who have properties but no aggregates row"""
+    with Session(engine) as db:
+        missing = [
+            user_id for (user_id,) in db.execute(
+                select(Property.user_id).distinct()
+                .where(~Property.user_id.in_(select(PortfolioAggregate.user_id)))
+            )
+        ]
+        if missing:
+            rebuild_portfolio_aggregates(db, missing)
+        return len(missing)
+
+
+def main():
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Portfolio aggregates tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    check = subparsers.add_parser("check", help="compare stored totals with the properties table")
+    check.add_argument("--repair", action="store_true", help="rebuild users that have drifted")
+    rebuild = subparsers.add_parser("rebuild", help="recompute stored totals from the properties table")
+    rebuild.add_argument("--user", type=int, action="append", help="only this user id (repeatable)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "check":
+            drifted = check_portfolio_aggregates(db)
+            print(f"{len(drifted)} user(s) drifted" + (f": {drifted}" if drifted else ""))
+            if drifted and args.repair:
+                rebuild_portfolio_aggregates(db, drifted)
+                print(f"Rebuilt {len(drifted)} user(s)")
+            raise SystemExit(1 if drifted and not args.repair else 0)
+        if args.command == "rebuild":
+            print(f"Rebuilt {rebuild_portfolio_aggregates(db, args.user)} user(s)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+"""Postcode to datazone lookup.
+
+The postcode table is normalised and sorted once into fixed-width NumPy
+arrays so resolving a postcode is a binary search instead of a boolean-mask
+scan over the whole DataFrame. This module only depends on pandas/NumPy so
+it can be shared by the FastAPI backend and the Streamlit app.
+
+The index can also be compiled to a binary file and opened with ``mmap``,
+so every worker shares one page-cache copy and startup skips the CSV parse::
+
+    python -m services.postcode_service build ../postcode_to_datazone.csv
+
+``PostcodeDatasetManager`` holds the live index and can swap in a new
+release built on a background thread without restarting the process. Each
+process also watches the CSV and compiled index on disk, so when a new
+release is written (or one worker is told to reload) every worker picks it
+up within ``POSTCODE_RELOAD_CHECK_SECONDS``.
+"""
+import argparse
+import hashlib
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+POSTCODE_COLUMN = "Postcode"
+DATAZONE_COLUMN = "DataZone2011Code"
+
+_WHITESPACE = re.compile(r"\s+")
+
+# How often each process checks the postcode files for a new release; 0 disables
+POSTCODE_RELOAD_CHECK_SECONDS = float(os.getenv("POSTCODE_RELOAD_CHECK_SECONDS", "5"))
+
+# Compiled index layout: header, sorted keys, datazone ordinals, datazone codes.
+# The header records the mtime and size of the CSV it was built from.
+INDEX_MAGIC = b"PCIDX002"
+# magic, count, key width, ordinal size, datazone count, datazone width, source mtime_ns, source size
+_HEADER = struct.Struct("<8sIIIIIqQ")
+
+
+def normalise_postcode(postcode: str) -> str:
+    """Upper-case a postcode and drop all whitespace (``"eh1 1aa"`` -> ``"EH11AA"``)"""
+    return _WHITESPACE.sub("", postcode.upper())
+
+
+def format_postcode(postcode: str) -> str:
+    """Re-insert the space before the inward code (``"EH11AA"`` -> ``"EH1 1AA"``)"""
+    return f"{postcode[:-3]} {postcode[-3:]}" if len(postcode) > 3 else postcode
+
+
+class PostcodeIndex:
+    """Sorted postcode keys with a datazone ordinal per key"""
+
+    def __init__(
+        self, keys: np.ndarray, ordinals: np.ndarray, datazones: List[str],
+        source: Optional[Tuple[int, int]] = None,
+    ):
+        self.keys = keys
+        self.ordinals = ordinals
+        self.datazones = datazones
+        # (mtime_ns, size) of the CSV a compiled index was built from
+        self.source = source
+
+    @classmethod
+    def empty(cls) -> "PostcodeIndex":
+        return cls(np.array([], dtype="S1"), np.array([], dtype=np.uint32), [])
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "PostcodeIndex":
+        """Build an index from a raw ``postcode_to_datazone`` frame"""
+        df = df[[POSTCODE_COLUMN, DATAZONE_COLUMN]].dropna()
+        postcodes = df[POSTCODE_COLUMN].astype(str).str.upper().str.replace(r"\s+", "", regex=True)
+        # First row wins for duplicated postcodes, matching the old `.iloc[0]`
+        keep = ~postcodes.duplicated(keep="first")
+        postcodes = postcodes[keep].to_numpy()
+        codes = df[DATAZONE_COLUMN][keep].astype(str).to_numpy()
+        if len(postcodes) == 0:
+            return cls.empty()
+
+        width = max(len(p) for p in postcodes)
+        keys = postcodes.astype(f"S{width}")
+        datazones, ordinals = np.unique(codes, return_inverse=True)
+
+        order = np.argsort(keys, kind="stable")
+        return cls(keys[order], ordinals[order].astype(np.uint32), datazones.tolist())
+
+    @classmethod
+    def from_csv(cls, path: str) -> "PostcodeIndex":
+        return cls.from_frame(
+            pd.read_csv(path, usecols=[POSTCODE_COLUMN, DATAZONE_COLUMN], dtype=str)
+        )
+
+    @classmethod
+    def open(cls, path: str) -> "PostcodeIndex":
+        """Open a compiled index; the arrays are views onto a read-only mmap"""
+        with open(path, "rb") as fh:
+            buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(buf) < _HEADER.size or buf[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+            raise ValueError(f"{path} is not a compiled postcode index (or is from an older format)")
+        _, count, key_width, ordinal_size, dz_count, dz_width, source_mtime, source_size = _HEADER.unpack_from(buf, 0)
+
+        offset = _HEADER.size
+        keys = np.frombuffer(buf, dtype=f"S{key_width}", count=count, offset=offset)
+        offset = _align(offset + count * key_width, ordinal_size)
+        ordinals = np.frombuffer(buf, dtype=f"<u{ordinal_size}", count=count, offset=offset)
+        offset += count * ordinal_size
+        datazones = np.frombuffer(buf, dtype=f"S{dz_width}", count=dz_count, offset=offset)
+        return cls(keys, ordinals, [dz.decode("ascii") for dz in datazones], (source_mtime, source_size))
+
+    def save(self, path: str, source: Optional[Tuple[int, int]] = None) -> None:
+        """Write the compiled index atomically so running workers never see a
+        partial file; ``source`` is the CSV's ``(mtime_ns, size)``"""
+        ordinal_size = 2 if len(self.datazones) <= np.iinfo(np.uint16).max + 1 else 4
+        datazones = np.array(self.datazones, dtype="S") if self.datazones else np.array([], dtype="S1")
+        header = _HEADER.pack(
+            INDEX_MAGIC, len(self.keys), self.keys.dtype.itemsize, ordinal_size,
+            len(datazones), datazones.dtype.itemsize, *(source or (0, 0)),
+        )
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, "wb") as fh:
+            fh.write(header)
+            fh.write(self.keys.tobytes())
+            fh.write(b"\0" * (_align(fh.tell(), ordinal_size) - fh.tell()))
+            fh.write(self.ordinals.astype(f"<u{ordinal_size}").tobytes())
+            fh.write(datazones.tobytes())
+        os.replace(tmp_path, path)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, postcode: Optional[str]) -> Optional[str]:
+        """Return the datazone for a postcode, or ``None`` if it is unknown"""
+        if not postcode or not len(self.keys):
+            return None
+        normalised = normalise_postcode(postcode)
+        # Non-ASCII input is invalid, as in resolve_many, rather than stripped
+        if not normalised.isascii():
+            return None
+        key = normalised.encode("ascii")
+        if not key or len(key) > self.keys.dtype.itemsize:
+            return None
+        pos = int(np.searchsorted(self.keys, key))
+        if pos < len(self.keys) and self.keys[pos] == key:
+            return self.datazones[self.ordinals[pos]]
+        return None
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Tuple[str, str]]:
+        """Return up to ``limit`` ``(postcode, datazone)`` pairs starting with ``prefix``.
+
+        Matching keys are a contiguous range of the sorted array, found with
+        two binary searches. If the prefix contains a space the outward code
+        is treated as complete, so ``"EH1 1"`` does not also match ``EH11``.
+        """
+        parts = prefix.upper().split()
+        key = "".join(parts).encode("ascii", "ignore")
+        width = self.keys.dtype.itemsize
+        if not key or limit <= 0 or len(key) > width:
+            return []
+
+        start = int(np.searchsorted(self.keys, key, side="left"))
+        if len(key) < width:
+            end = int(np.searchsorted(self.keys, key + b"\xff", side="left"))
+        else:
+            end = int(np.searchsorted(self.keys, key, side="right"))
+
+        positions = np.arange(start, end)
+        if len(parts) > 1 or prefix[-1].isspace():
+            outward_length = len(parts[0])
+            positions = positions[np.char.str_len(self.keys[start:end]) == outward_length + 3]
+        return [
+            (format_postcode(self.keys[pos].decode("ascii")), self.datazones[self.ordinals[pos]])
+            for pos in positions[:limit]
+        ]
+
+    def resolve_many(self, postcodes: Sequence[Optional[str]]) -> List[Optional[str]]:
+        """Resolve many postcodes in one vectorised pass, preserving input order"""
+        if not len(postcodes):
+            return []
+        if not len(self.keys):
+            return [None] * len(postcodes)
+
+        # A list comprehension beats the pandas `.str` chain for short strings
+        normalised = ["".join(p.split()).upper() if p else "" for p in postcodes]
+        count = len(normalised)
+        width = self.keys.dtype.itemsize
+        lengths = np.fromiter(map(len, normalised), dtype=np.int64, count=count)
+        valid = (lengths > 0) & (lengths <= width) & np.fromiter(map(str.isascii, normalised), dtype=bool, count=count)
+        queries = np.where(valid, np.array(normalised, dtype=object), "").astype(f"S{width}")
+
+        positions = np.searchsorted(self.keys, queries).clip(max=len(self.keys) - 1)
+        hits = valid & (self.keys[positions] == queries)
+        datazones = np.array(self.datazones, dtype=object)[self.ordinals[positions]]
+        return np.where(hits, datazones, None).tolist()
+
+
+def read_postcodes(lines: Iterable[bytes]) -> List[str]:
+    """Read postcodes from a text or CSV upload, one per line.
+
+    For CSV input the first column is used and a ``Postcode`` header row is
+    skipped. Blank lines are kept so results line up with the input rows.
+    """
+    postcodes = []
+    for number, line in enumerate(lines):
+        value = line.decode("utf-8-sig", "replace").split(",", 1)[0].strip().strip('"')
+        if number == 0 and value.lower() == POSTCODE_COLUMN.lower():
+            continue
+        postcodes.append(value)
+    return postcodes
+
+
+def _align(offset: int, size: int) -> int:
+    return (offset + size - 1) // size * size
+
+
+def compiled_index_path(csv_path: str) -> str:
+    """Default location of the compiled index for a postcode CSV"""
+    return os.path.splitext(csv_path)[0] + ".idx"
+
+
+def compile_postcode_index(csv_path: str, out_path: Optional[str] = None) -> str:
+    """Parse the postcode CSV once and write the compiled index next to it"""
+    out_path = out_path or compiled_index_path(csv_path)
+    # Stamped before parsing, so a CSV replaced mid-build reads as changed
+    source = _file_stamp(csv_path)
+    PostcodeIndex.from_csv(csv_path).save(out_path, source)
+    return out_path
+
+
+def _open_index(path: str):
+    """Open the compiled index if it was built from the CSV as it is now
+    (same mtime and size), else parse the CSV"""
+    compiled = compiled_index_path(path)
+    csv_stamp = _file_stamp(path)
+    if os.path.exists(compiled):
+        try:
+            index = PostcodeIndex.open(compiled)
+        except ValueError:
+            if csv_stamp is None:
+                raise
+            logger.warning("Ignoring unreadable compiled index %s", compiled)
+        else:
+            # Timestamps alone miss releases copied with their original mtime
+            if csv_stamp is None or index.source == csv_stamp:
+                return compiled, index
+            logger.info("%s was built from a different %s", compiled, path)
+    index = PostcodeIndex.from_csv(path)
+    logger.info("Parsed %s; run `python -m services.postcode_service build` for faster startup", path)
+    return path, index
+
+
+def load_postcode_index(path: str) -> PostcodeIndex:
+    """Load the postcode index for a CSV path.
+
+    Uses the compiled ``.idx`` file when it was built from the current CSV,
+    otherwise parses the CSV. Falls back to an empty index if neither is
+    available.
+    """
+    try:
+        return _open_index(path)[1]
+    except (OSError, ValueError) as exc:
+        logger.warning("Postcode data unavailable at %s (%s); datazones will not be resolved", path, exc)
+        return PostcodeIndex.empty()
+
+
+@dataclass(frozen=True)
+class PostcodeDataset:
+    """An immutable loaded postcode release"""
+    index: PostcodeIndex
+    version: Optional[str]
+    source: Optional[str]
+    loaded_at: datetime
+
+
+class PostcodeDatasetManager:
+    """Owns the live postcode dataset and hot-swaps new releases.
+
+    Readers take ``manager.index`` once per operation; a reload builds the
+    new index off to the side and replaces the reference in one assignment,
+    so in-flight lookups keep using the release they started with. Taking
+    the index also notices files changed on disk since the last load and
+    starts a background reload, so workers that did not handle a reload
+    request still move to the new release.
+    """
+
+    def __init__(self, path: str, check_seconds: float = POSTCODE_RELOAD_CHECK_SECONDS):
+        self.path = path
+        self.check_seconds = check_seconds
+        self.last_error: Optional[str] = None
+        self._dataset = PostcodeDataset(PostcodeIndex.empty(), None, None, datetime.utcnow())
+        self._lock = threading.Lock()
+        self._reload_thread: Optional[threading.Thread] = None
+        self._files: Optional[tuple] = None
+        self._checked_at = 0.0
+
+    @property
+    def dataset(self) -> PostcodeDataset:
+        return self._dataset
+
+    @property
+    def index(self) -> PostcodeIndex:
+        self.check_for_release()
+        return self._dataset.index
+
+    @property
+    def reloading(self) -> bool:
+        return self._reload_thread is not None and self._reload_thread.is_alive()
+
+    def load(self, path: Optional[str] = None) -> PostcodeDataset:
+        """Build a dataset from ``path`` (default: the configured CSV) and swap it in"""
+        path = path or self.path
+        # Taken before the build so a file replaced mid-load is seen next check
+        files = _release_files(path)
+        try:
+            dataset = self._build(path)
+        except (OSError, ValueError) as exc:
+            self.last_error = str(exc)
+            if path == self.path:
+                self._files = files
+            logger.warning("Postcode data unavailable at %s (%s); keeping version %s", path, exc, self._dataset.version)
+            return self._dataset
+
+        with self._lock:
+            self._dataset = dataset
+            self.path = path
+            self.last_error = None
+            self._files = files
+        logger.info("Loaded postcode dataset %s (%d postcodes) from %s", dataset.version, len(dataset.index), dataset.source)
+        return dataset
+
+    def check_for_release(self) -> bool:
+        """Start a background reload if the CSV or compiled index changed
+        since the last load; checks the disk at most every ``check_seconds``"""
+        if self.check_seconds <= 0:
+            return False
+        now = time.monotonic()
+        if now - self._checked_at < self.check_seconds:
+            return False
+        self._checked_at = now
+        if self.reloading or _release_files(self.path) == self._files:
+            return False
+        logger.info("Postcode data at %s changed on disk; reloading", self.path)
+        return self.reload_in_background()
+
+    def reload_in_background(
+        self,
+        path: Optional[str] = None,
+        on_swap: Optional[Callable[[PostcodeDataset], None]] = None,
+    ) -> bool:
+        """Start a background reload; returns False if one is already running"""
+        with self._lock:
+            if self.reloading:
+                return False
+
+            def run():
+                previous = self._dataset
+                dataset = self.load(path)
+                if on_swap and dataset is not previous:
+                    try:
+                        on_swap(dataset)
+                    except Exception:
+                        logger.exception("Postcode dataset swap hook failed")
+
+            self._reload_thread = threading.Thread(target=run, name="postcode-reload", daemon=True)
+            self._reload_thread.start()
+            return True
+
+    def status(self) -> dict:
+        self.check_for_release()
+        dataset = self._dataset
+        return {
+            "version": dataset.version,
+            "row_count": len(dataset.index),
+            "loaded": dataset.source is not None,
+            "source": dataset.source,
+            "loaded_at": dataset.loaded_at,
+            "reloading": self.reloading,
+            "last_error": self.last_error,
+        }
+
+    @staticmethod
+    def _build(path: str) -> PostcodeDataset:
+        source, index = _open_index(path)
+        return PostcodeDataset(index, _file_version(source), source, datetime.utcnow())
+
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _release_files(path: str) -> tuple:
+    """Modification stamps of a postcode CSV and its compiled index"""
+    return _file_stamp(path), _file_stamp(compiled_index_path(path))
+
+
+def _file_version(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Postcode index tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="compile the postcode CSV into a binary index")
+    build.add_argument("csv_path", nargs="?", default="../postcode_to_datazone.csv")
+    build.add_argument("-o", "--output", help="output path (default: <csv>.idx)")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        out_path = compile_postcode_index(args.csv_path, args.output)
+        print(f"Wrote {len(PostcodeIndex.open(out_path)):,} postcodes to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
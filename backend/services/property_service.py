@@ -1,16 +1,67 @@
+from sqlalchemy import case, delete, func, select, update
+import math
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
-from models import Property
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Dict, Any, AsyncIterator, Iterator, Tuple
+from datetime import datetime
+from models import Property, PropertyMedia
 from schemas import PropertyCreate, PropertyUpdate, PropertyAnalysis
-import statistics
-from collections import defaultdict, Counter
+from services.postcode_service import PostcodeIndex
+from services import search_service
+from services.portfolio_service import (
+    ESTIMATED_VALUE_PER_SQFT,
+    PortfolioAccumulator,
+    aggregate_columns,
+    aggregate_portfolio,
+    apply_portfolio_delta,
+    bump_portfolio_versions,
+    portfolio_version,
+    read_portfolio,
+)
+from services.cache_service import AnalysisCache, cached_report
+from services.datazone_service import portfolio_area_benchmarks, stats_generation
+import base64
+import json
+
+
+# Columns feeding the stored portfolio totals; bulk patches touching any of
+# them adjust the totals
+PORTFOLIO_FIELDS = ("epc_rating", "size_sqft", "property_type", "solar_panels", "garden", "parking", "new_build")
+
+# Sort keys accepted by filter_properties, mapped to columns; "value" sorts by
+# size since value is derived from it
+SORT_COLUMNS = {
+    "id": Property.id,
+    "bedrooms": Property.bedrooms,
+    "size_sqft": Property.size_sqft,
+    "value": Property.size_sqft,
+    "created_at": Property.created_at,
+}
+
+
+def encode_cursor(last_id: int) -> str:
+    """Opaque keyset cursor for the last row of a page"""
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Inverse of ``encode_cursor``; raises ValueError for malformed cursors"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded))["id"]
+    except (ValueError, KeyError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not isinstance(last_id, int):
+        raise ValueError("Invalid cursor")
+    return last_id
 
 
 class PropertyService:
     """Service class for property-related business logic"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, cache: Optional[AnalysisCache] = None):
         self.db = db
+        self.cache = cache
     
     def create_property(self, property_data: PropertyCreate, user_id: int) -> Property:
         """Create a new property"""
@@ -19,6 +70,9 @@ class PropertyService:
         
         property_obj = Property(**property_dict)
         self.db.add(property_obj)
+        delta = PortfolioAccumulator()
+        delta.add(property_obj)
+        apply_portfolio_delta(self.db, user_id, delta)
         self.db.commit()
         self.db.refresh(property_obj)
         return property_obj
@@ -31,20 +85,48 @@ class PropertyService:
         ).first()
     
     def get_properties(self, user_id: int, skip: int = 0, limit: int = 100) -> List[Property]:
-        """Get all properties for a user"""
+        """Offset page of a user's properties for the legacy listing; analysis
+        reads the stored totals instead, so nothing else depends on this cap"""
         return self.db.query(Property).filter(
             Property.user_id == user_id
         ).offset(skip).limit(limit).all()
     
+    def get_properties_page(
+        self, user_id: int, limit: int = 50, after_id: int = 0
+    ) -> Tuple[List[Property], Optional[int]]:
+        """Keyset page of a user's properties ordered by id.
+
+        Returns the page and the id to continue after, or ``None`` on the
+        last page. Uses ``id > after_id`` rather than OFFSET so deep pages
+        cost the same as the first.
+        """
+        rows = self.db.query(Property).filter(
+            Property.user_id == user_id,
+            Property.id > after_id
+        ).order_by(Property.id).limit(limit + 1).all()
+        if len(rows) > limit:
+            return rows[:limit], rows[limit - 1].id
+        return rows, None
+
+    def iter_properties(self, user_id: int, batch_size: int = 500) -> Iterator[Property]:
+        """Stream a user's properties in id order, fetching ``batch_size`` rows at a time"""
+        return iter(self.db.query(Property).filter(
+            Property.user_id == user_id
+        ).order_by(Property.id).yield_per(batch_size))
+
     def update_property(self, property_id: int, property_data: PropertyUpdate, user_id: int) -> Optional[Property]:
         """Update a property"""
         property_obj = self.get_property(property_id, user_id)
         if not property_obj:
             return None
         
+        delta = PortfolioAccumulator()
+        delta.remove(property_obj)
         update_dict = property_data.model_dump(exclude_unset=True)
         for field, value in update_dict.items():
             setattr(property_obj, field, value)
+        delta.add(property_obj)
+        apply_portfolio_delta(self.db, user_id, delta)
         
         self.db.commit()
         self.db.refresh(property_obj)
@@ -56,154 +138,333 @@ class PropertyService:
         if not property_obj:
             return False
         
+        delta = PortfolioAccumulator()
+        delta.remove(property_obj)
         self.db.delete(property_obj)
+        apply_portfolio_delta(self.db, user_id, delta)
         self.db.commit()
         return True
     
-    def analyze_portfolio(self, user_id: int) -> PropertyAnalysis:
-        """Analyze user's property portfolio and map to API schema"""
-        properties = self.get_properties(user_id)
-
-        if not properties:
-            return PropertyAnalysis(
-                total_properties=0,
-                avg_epc_rating=None,
-                total_value_estimate=None,
-                recommendations=[],
-                energy_efficiency_score=None,
-                investment_score=None,
-                risk_assessment="Low",
-            )
+    def resolve_datazones(self, postcode_index: PostcodeIndex, batch_size: int = 5000) -> int:
+        """Re-resolve datazones for all properties against a postcode index.
+
+        Walks the table in id order, resolves each batch in one vectorised
+        pass and writes only rows whose datazone is NULL or changed with a
+        single executemany UPDATE per batch. Postcodes missing from the index
+        keep their current datazone. Returns the number of rows updated.
+        """
+        updated = 0
+        last_id = 0
+        while True:
+            rows = self.db.query(Property.id, Property.user_id, Property.postcode, Property.datazone).filter(
+                Property.id > last_id
+            ).order_by(Property.id).limit(batch_size).all()
+            if not rows:
+                return updated
 
-        total_properties = len(properties)
-
-        # EPC average as a letter (A best, G worst)
-        epc_map = {"A": 7, "B": 6, "C": 5, "D": 4, "E": 3, "F": 2, "G": 1}
-        reverse_epc = {v: k for k, v in epc_map.items()}
-        epc_values = [epc_map[e.upper()] for e in [p.epc_rating or "" for p in properties] if e and e.upper() in epc_map]
-        avg_epc_rating = reverse_epc.get(round(sum(epc_values) / len(epc_values))) if epc_values else None
-
-        # Naive total value estimate based on size if available
-        # Assumes ~£250 per sqft as a rough placeholder
-        per_sqft = 250
-        size_estimates = [(p.size_sqft or 0) * per_sqft for p in properties if p.size_sqft]
-        total_value_estimate = float(sum(size_estimates)) if size_estimates else None
-
-        # Energy efficiency score (0-100) based on proportion of A-C ratings
-        good_epc_count = len([p for p in properties if (p.epc_rating or "").upper() in {"A", "B", "C"}])
-        energy_efficiency_score = round(100 * good_epc_count / total_properties, 2)
-
-        # Investment score (0-100) using simple feature weights
-        score = 0
-        for p in properties:
-            if (p.epc_rating or "").upper() in {"A", "B", "C"}:
-                score += 20
-            if p.solar_panels == "Yes":
-                score += 15
-            if p.garden == "Yes":
-                score += 10
-            if p.parking == "Yes":
-                score += 10
-            if p.new_build == "Yes":
-                score += 15
-        investment_score = min(round(score / total_properties), 100)
-
-        # Risk assessment based on concentration and EPC distribution
-        type_counts = Counter([p.property_type for p in properties if p.property_type])
-        max_concentration = (max(type_counts.values()) / total_properties) if type_counts else 0
-        poor_epc = len([p for p in properties if (p.epc_rating or "").upper() in {"E", "F", "G"}])
-        risk_score = 0
-        if max_concentration > 0.7:
-            risk_score += 1
-        if poor_epc > total_properties * 0.3:
-            risk_score += 1
-        risk_assessment = "Low" if risk_score == 0 else ("Medium" if risk_score == 1 else "High")
-
-        # Recommendations
-        recommendations: List[str] = []
-        if poor_epc:
-            recommendations.append(
-                f"Consider improving EPC ratings for {poor_epc} properties"
+            datazones = postcode_index.resolve_many([row.postcode for row in rows])
+            changes = [
+                {"id": row.id, "datazone": datazone}
+                for row, datazone in zip(rows, datazones)
+                if datazone is not None and datazone != row.datazone
+            ]
+            if changes:
+                self.db.execute(update(Property), changes)
+                changed = {change["id"] for change in changes}
+                bump_portfolio_versions(self.db, {row.user_id for row in rows if row.id in changed})
+                self.db.commit()
+                updated += len(changes)
+            last_id = rows[-1].id
+
+    def portfolio_aggregates(self, user_id: int):
+        """One row of counts and sums over a user's portfolio, computed in the database"""
+        size = case((Property.size_sqft != 0, Property.size_sqft))
+        return self.db.execute(
+            select(
+                *aggregate_columns(),
+                func.min(size).label("size_min"),
+                func.max(size).label("size_max"),
+                func.avg(size).label("size_mean"),
+            ).where(Property.user_id == user_id)
+        ).one()
+
+    def median_size(self, user_id: int) -> Optional[float]:
+        """Median of a user's non-zero sizes via ROW_NUMBER over the (user_id, size_sqft) index"""
+        ranked = select(
+            Property.size_sqft,
+            func.row_number().over(order_by=Property.size_sqft).label("position"),
+            func.count().over().label("count"),
+        ).where(Property.user_id == user_id, Property.size_sqft != 0).subquery()
+        # Positions (n+1)/2 and (n+2)/2 are the middle row(s) in integer division
+        return self.db.execute(
+            select(func.avg(ranked.c.size_sqft)).where(
+                ranked.c.position.in_([(ranked.c.count + 1) // 2, (ranked.c.count + 2) // 2])
             )
-        if max_concentration > 0.7:
-            recommendations.append("Diversify property types to reduce concentration risk")
-        if not size_estimates:
-            recommendations.append("Add property sizes to improve value estimates")
-
-        return PropertyAnalysis(
-            total_properties=total_properties,
-            avg_epc_rating=avg_epc_rating,
-            total_value_estimate=total_value_estimate,
-            recommendations=recommendations,
-            energy_efficiency_score=energy_efficiency_score,
-            investment_score=investment_score,
-            risk_assessment=risk_assessment,
-        )
-    
-    def search_properties(self, user_id: int, query: str) -> List[Property]:
-        """Search properties by address or postcode"""
-        return self.db.query(Property).filter(
-            Property.user_id == user_id,
-            (Property.street_name.ilike(f"%{query}%")) |
-            (Property.postcode.ilike(f"%{query}%")) |
-            (Property.house_number.ilike(f"%{query}%"))
-        ).all()
+        ).scalar()
+
+    def analyze_portfolio(self, user_id: int) -> PropertyAnalysis:
+        """Analyze user's whole property portfolio and map to API schema.
+
+        Reads the stored totals in ``portfolio_aggregates`` (constant cost in
+        portfolio size); users without a row yet fall back to aggregating the
+        properties table. Area benchmarks come from the latest datazone stats
+        run. Results are cached per portfolio version and stats generation.
+        """
+        return PropertyAnalysis(**cached_report(
+            self.db, user_id, "portfolio", lambda: self._analyze_portfolio(user_id).model_dump(),
+            params=self.analysis_cache_params(), cache=self.cache,
+        ))
+
+    def _analyze_portfolio(self, user_id: int) -> PropertyAnalysis:
+        accumulator = read_portfolio(self.db, user_id)
+        if accumulator is None:
+            accumulator = aggregate_portfolio(self.db, [Property.user_id == user_id])
+        return PropertyAnalysis(**{
+            **accumulator.result().model_dump(),
+            "area_benchmarks": portfolio_area_benchmarks(self.db, user_id),
+        })
+
+    def analysis_cache_params(self) -> Dict[str, Any]:
+        """What the portfolio analysis depends on besides the portfolio version"""
+        return {"area_stats": stats_generation(self.db)}
+
+    def portfolio_version(self, user_id: int) -> int:
+        return portfolio_version(self.db, user_id)
+
+    def search_properties(self, user_id: int, query: str, limit: int = 50) -> List[Property]:
+        """Search properties by address or postcode, best matches first"""
+        return search_service.search_properties(self.db, user_id, query, limit)
     
-    def filter_properties(self, user_id: int, filters: Dict[str, Any]) -> List[Property]:
-        """Filter properties based on criteria"""
-        query = self.db.query(Property).filter(Property.user_id == user_id)
-        
-        if filters.get('property_type'):
-            query = query.filter(Property.property_type == filters['property_type'])
-        
-        if filters.get('bedrooms'):
-            query = query.filter(Property.bedrooms == filters['bedrooms'])
-        
-        if filters.get('epc_rating'):
-            query = query.filter(Property.epc_rating == filters['epc_rating'])
-        
-        # Skip value-based filters as there's no persisted estimated value
-        # Could be implemented via size_sqft heuristic if needed
-        
+    def filter_properties(
+        self,
+        user_id: int,
+        filters: Dict[str, Any],
+        sort: str = "id",
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> List[Property]:
+        """Filter properties based on criteria, ordered by ``sort`` (prefix ``-`` for descending)"""
+        query = self._filter_query(user_id, filters, sort)
+        if offset:
+            query = query.offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
         return query.all()
-    
+
+    def bulk_update_properties(
+        self, user_id: int, selection: Dict[str, Any], patch: Dict[str, Any]
+    ) -> int:
+        """Apply ``patch`` to every selected property in one UPDATE; returns rows matched"""
+        conditions = self._filter_conditions(user_id, selection)
+        # Totals of the selection before and after the patch, both taken
+        # before the UPDATE since the patch may change what the filters match.
+        # Other patches apply an empty delta, which still bumps the version.
+        overrides = {name: patch[name] for name in PORTFOLIO_FIELDS if name in patch}
+        delta = PortfolioAccumulator()
+        if overrides:
+            delta = aggregate_portfolio(self.db, conditions, overrides)
+            delta.merge(aggregate_portfolio(self.db, conditions), sign=-1)
+
+        values = dict(patch, updated_at=datetime.utcnow())
+        result = self.db.execute(
+            update(Property)
+            .where(*conditions)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            apply_portfolio_delta(self.db, user_id, delta)
+        self.db.commit()
+        return result.rowcount
+
+    def bulk_delete_properties(self, user_id: int, selection: Dict[str, Any]) -> Tuple[int, int]:
+        """Delete selected properties and their media rows in one transaction.
+
+        Media rows are removed with a single set-based DELETE instead of the
+        ORM cascade, which would load and delete each object individually.
+        Returns ``(properties_deleted, media_deleted)``.
+        """
+        conditions = self._filter_conditions(user_id, selection)
+        delta = PortfolioAccumulator()
+        delta.merge(aggregate_portfolio(self.db, conditions), sign=-1)
+        media_result = self.db.execute(
+            delete(PropertyMedia)
+            .where(PropertyMedia.property_id.in_(select(Property.id).where(*conditions)))
+            .execution_options(synchronize_session=False)
+        )
+        result = self.db.execute(
+            delete(Property).where(*conditions).execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            apply_portfolio_delta(self.db, user_id, delta)
+        self.db.commit()
+        return result.rowcount, media_result.rowcount
+
+    def _filter_query(self, user_id: int, filters: Dict[str, Any], sort: str = "id"):
+        column = SORT_COLUMNS[sort.lstrip("-")]
+        descending = sort.startswith("-")
+        order = [column.desc(), Property.id.desc()] if descending else [column.asc(), Property.id.asc()]
+        if column is Property.id:
+            order = order[:1]
+        return self.db.query(Property).filter(
+            *self._filter_conditions(user_id, filters)
+        ).order_by(*order)
+
+    def _filter_conditions(self, user_id: int, filters: Dict[str, Any]) -> list:
+        """WHERE clauses scoping a query to the user's properties matching ``filters``"""
+        conditions = [Property.user_id == user_id]
+
+        if filters.get('ids') is not None:
+            conditions.append(Property.id.in_(filters['ids']))
+
+        if filters.get('property_type') is not None:
+            conditions.append(Property.property_type == filters['property_type'])
+
+        if filters.get('bedrooms') is not None:
+            conditions.append(Property.bedrooms == filters['bedrooms'])
+
+        if filters.get('epc_rating') is not None:
+            conditions.append(Property.epc_rating == filters['epc_rating'])
+
+        if filters.get('property_types') is not None:
+            conditions.append(Property.property_type.in_(filters['property_types']))
+
+        if filters.get('epc_ratings') is not None:
+            conditions.append(Property.epc_rating.in_(filters['epc_ratings']))
+
+        if filters.get('bedrooms_min') is not None:
+            conditions.append(Property.bedrooms >= filters['bedrooms_min'])
+
+        if filters.get('bedrooms_max') is not None:
+            conditions.append(Property.bedrooms <= filters['bedrooms_max'])
+
+        # Value has no column; it is size_sqft * ESTIMATED_VALUE_PER_SQFT, so
+        # value bounds become size bounds and can use the same index
+        size_min = filters.get('size_min')
+        if filters.get('value_min') is not None:
+            value_size = math.ceil(filters['value_min'] / ESTIMATED_VALUE_PER_SQFT)
+            size_min = value_size if size_min is None else max(size_min, value_size)
+        if size_min is not None:
+            conditions.append(Property.size_sqft >= size_min)
+
+        size_max = filters.get('size_max')
+        if filters.get('value_max') is not None:
+            value_size = math.floor(filters['value_max'] / ESTIMATED_VALUE_PER_SQFT)
+            size_max = value_size if size_max is None else min(size_max, value_size)
+        if size_max is not None:
+            conditions.append(Property.size_sqft <= size_max)
+
+        return conditions
+
     def get_property_statistics(self, user_id: int) -> Dict[str, Any]:
-        """Get detailed property statistics"""
-        properties = self.get_properties(user_id)
-        
-        if not properties:
-            return {}
-        
-        # Value statistics via size heuristic (~£250/sqft)
-        per_sqft = 250
-        values = [p.size_sqft * per_sqft for p in properties if p.size_sqft]
-        value_stats = {
-            'min': min(values) if values else 0,
-            'max': max(values) if values else 0,
-            'median': statistics.median(values) if values else 0,
-            'mean': statistics.mean(values) if values else 0
-        }
-        
-        # Size statistics
-        sizes = [p.size_sqft for p in properties if p.size_sqft]
+        """Get detailed property statistics, aggregated in the database"""
+        row = self.portfolio_aggregates(user_id)
+        median = self.median_size(user_id) if row.sized else None
+
+        # Value statistics via size heuristic
+        per_sqft = ESTIMATED_VALUE_PER_SQFT
         size_stats = {
-            'min': min(sizes) if sizes else 0,
-            'max': max(sizes) if sizes else 0,
-            'median': statistics.median(sizes) if sizes else 0,
-            'mean': statistics.mean(sizes) if sizes else 0
+            'min': row.size_min or 0,
+            'max': row.size_max or 0,
+            'median': float(median) if median is not None else 0,
+            'mean': float(row.size_mean) if row.size_mean is not None else 0
         }
-        
+        value_stats = {key: value * per_sqft for key, value in size_stats.items()}
+
         # Feature analysis
         features = {
-            'parking': sum(1 for p in properties if p.parking == 'Yes'),
-            'garden': sum(1 for p in properties if p.garden == 'Yes'),
-            'solar_panels': sum(1 for p in properties if p.solar_panels == 'Yes'),
-            'new_build': sum(1 for p in properties if p.new_build == 'Yes')
+            'parking': row.parking,
+            'garden': row.garden,
+            'solar_panels': row.solar_panels,
+            'new_build': row.new_build
         }
-        
+
         return {
             'value_statistics': value_stats,
             'size_statistics': size_stats,
             'feature_counts': features,
-            'total_properties': len(properties)
+            'total_properties': row.total
         }
+
+
+class AsyncPropertyService:
+    """``PropertyService`` for ``AsyncSession`` callers.
+
+    Methods run the sync implementation through ``AsyncSession.run_sync``,
+    which drives the async driver from a greenlet, so the query logic lives
+    in one place and no thread is blocked on I/O. Streaming is native since
+    it has to yield between fetches.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _run(self, method: str, *args, **kwargs):
+        return await self.db.run_sync(
+            lambda session: getattr(PropertyService(session), method)(*args, **kwargs)
+        )
+
+    async def get_property(self, property_id: int, user_id: int) -> Optional[Property]:
+        return await self._run("get_property", property_id, user_id)
+
+    async def get_properties(self, user_id: int, skip: int = 0, limit: Optional[int] = 100) -> List[Property]:
+        """Legacy listing only (``limit=None`` returns every property)"""
+        result = await self.db.scalars(
+            select(Property).where(Property.user_id == user_id).offset(skip).limit(limit)
+        )
+        return list(result)
+
+    async def get_properties_page(
+        self, user_id: int, limit: int = 50, after_id: int = 0
+    ) -> Tuple[List[Property], Optional[int]]:
+        return await self._run("get_properties_page", user_id, limit, after_id)
+
+    async def iter_properties(self, user_id: int, batch_size: int = 500) -> AsyncIterator[Property]:
+        result = await self.db.stream_scalars(
+            select(Property).where(Property.user_id == user_id).order_by(Property.id)
+            .execution_options(yield_per=batch_size)
+        )
+        async for property_obj in result:
+            yield property_obj
+
+    async def create_property(self, property_data: PropertyCreate, user_id: int) -> Property:
+        return await self._run("create_property", property_data, user_id)
+
+    async def update_property(self, property_id: int, property_data: PropertyUpdate, user_id: int) -> Optional[Property]:
+        return await self._run("update_property", property_id, property_data, user_id)
+
+    async def delete_property(self, property_id: int, user_id: int) -> bool:
+        return await self._run("delete_property", property_id, user_id)
+
+    async def analyze_portfolio(self, user_id: int) -> PropertyAnalysis:
+        return await self._run("analyze_portfolio", user_id)
+
+    async def portfolio_version(self, user_id: int) -> int:
+        return await self._run("portfolio_version", user_id)
+
+    async def analysis_cache_params(self) -> Dict[str, Any]:
+        return await self._run("analysis_cache_params")
+
+    async def search_properties(self, user_id: int, query: str, limit: int = 50) -> List[Property]:
+        return await self._run("search_properties", user_id, query, limit)
+
+    async def filter_properties(
+        self,
+        user_id: int,
+        filters: Dict[str, Any],
+        sort: str = "id",
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> List[Property]:
+        return await self._run("filter_properties", user_id, filters, sort, limit, offset)
+
+    async def bulk_update_properties(
+        self, user_id: int, selection: Dict[str, Any], patch: Dict[str, Any]
+    ) -> int:
+        return await self._run("bulk_update_properties", user_id, selection, patch)
+
+    async def bulk_delete_properties(self, user_id: int, selection: Dict[str, Any]) -> Tuple[int, int]:
+        return await self._run("bulk_delete_properties", user_id, selection)
+
+    async def get_property_statistics(self, user_id: int) -> Dict[str, Any]:
+        return await self._run("get_property_statistics", user_id)
@@ -0,0 +1,171 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from typing import Dict, List
+from models import Property
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Contentless FTS5 table keyed by properties.id. `owner` holds "u<user_id>" so
+# a search intersects posting lists instead of filtering matches afterwards;
+# `postcode_compact` lets "EH11AA" match "EH1 1AA".
+_SQLITE_SETUP = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS properties_fts USING fts5(
+        owner, house_number, street_name, postcode, postcode_compact,
+        content='', tokenize='unicode61', prefix='1 2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS properties_fts_insert AFTER INSERT ON properties BEGIN
+        INSERT INTO properties_fts(rowid, owner, house_number, street_name, postcode, postcode_compact)
+        VALUES (new.id, 'u' || new.user_id, new.house_number, new.street_name, new.postcode,
+                replace(upper(new.postcode), ' ', ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS properties_fts_delete AFTER DELETE ON properties BEGIN
+        INSERT INTO properties_fts(properties_fts, rowid, owner, house_number, street_name, postcode, postcode_compact)
+        VALUES ('delete', old.id, 'u' || old.user_id, old.house_number, old.street_name, old.postcode,
+                replace(upper(old.postcode), ' ', ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS properties_fts_update
+    AFTER UPDATE OF user_id, house_number, street_name, postcode ON properties BEGIN
+        INSERT INTO properties_fts(properties_fts, rowid, owner, house_number, street_name, postcode, postcode_compact)
+        VALUES ('delete', old.id, 'u' || old.user_id, old.house_number, old.street_name, old.postcode,
+                replace(upper(old.postcode), ' ', ''));
+        INSERT INTO properties_fts(rowid, owner, house_number, street_name, postcode, postcode_compact)
+        VALUES (new.id, 'u' || new.user_id, new.house_number, new.street_name, new.postcode,
+                replace(upper(new.postcode), ' ', ''));
+    END
+    """,
+]
+
+_SQLITE_BACKFILL = """
+    INSERT INTO properties_fts(rowid, owner, house_number, street_name, postcode, postcode_compact)
+    SELECT id, 'u' || user_id, house_number, street_name, postcode, replace(upper(postcode), ' ', '')
+    FROM properties
+"""
+
+_POSTGRES_DOCUMENT = "(house_number || ' ' || street_name || ' ' || postcode)"
+
+_POSTGRES_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS ix_properties_search_trgm ON properties USING gin ({_POSTGRES_DOCUMENT} gin_trgm_ops)",
+]
+
+# bm25 weights per FTS column: owner, house_number, street_name, postcode, postcode_compact
+_BM25_WEIGHTS = "0.0, 2.0, 1.0, 4.0, 4.0"
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# Per-database-URL cache of whether the FTS5 table exists
+_fts_available: Dict[str, bool] = {}
+
+
+def ensure_search_index(engine: Engine) -> bool:
+    """Create the search index and its sync triggers if missing.
+
+    SQLite gets an FTS5 shadow table kept in sync by triggers, so the ORM,
+    bulk Core statements and raw SQL all stay indexed. Postgres gets a
+    trigram GIN index. Returns False if the database has no supported index,
+    in which case searches fall back to ILIKE scans.
+    """
+    dialect = engine.dialect.name
+    try:
+        with engine.begin() as conn:
+            if dialect == "sqlite":
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'properties_fts'")
+                ).first()
+                for statement in _SQLITE_SETUP:
+                    conn.execute(text(statement))
+                if not exists:
+                    conn.execute(text(_SQLITE_BACKFILL))
+                _fts_available[str(engine.url)] = True
+                return True
+            if dialect == "postgresql":
+                for statement in _POSTGRES_SETUP:
+                    conn.execute(text(statement))
+                return True
+    except Exception as exc:
+        logger.warning("Full-text search index unavailable (%s); falling back to ILIKE", exc)
+    return False
+
+
+def search_tokens(query: str) -> List[str]:
+    return [token.lower() for token in _TOKEN.findall(query)]
+
+
+def _has_fts(db: Session) -> bool:
+    bind = db.get_bind()
+    if bind.dialect.name != "sqlite":
+        return False
+    key = str(bind.url)
+    if key not in _fts_available:
+        _fts_available[key] = db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'properties_fts'")
+        ).first() is not None
+    return _fts_available[key]
+
+
+def search_properties(db: Session, user_id: int, query: str, limit: int = 50) -> List[Property]:
+    """Ranked prefix search over a user's house numbers, streets and postcodes.
+
+    Every query token must prefix-match some address field. Results are
+    ordered by relevance (bm25 on SQLite, trigram similarity on Postgres).
+    """
+    tokens = search_tokens(query)
+    if not tokens:
+        return []
+
+    dialect = db.get_bind().dialect.name
+    if _has_fts(db):
+        match = f'owner:u{int(user_id)} AND {{house_number street_name postcode postcode_compact}}: (' + " ".join(
+            f'"{token}"*' for token in tokens
+        ) + ")"
+        ids = [
+            row.rowid
+            for row in db.execute(
+                text(
+                    f"SELECT rowid FROM properties_fts WHERE properties_fts MATCH :match "
+                    f"ORDER BY bm25(properties_fts, {_BM25_WEIGHTS}) LIMIT :limit"
+                ),
+                {"match": match, "limit": limit},
+            )
+        ]
+        return _in_order(db, user_id, ids)
+
+    if dialect == "postgresql":
+        # Conditions on the indexed expression so the trigram GIN index serves them
+        conditions = [
+            text(f"{_POSTGRES_DOCUMENT} ILIKE :token_{i}").bindparams(**{f"token_{i}": f"%{token}%"})
+            for i, token in enumerate(tokens)
+        ]
+        return db.query(Property).filter(Property.user_id == user_id, *conditions).order_by(
+            text(f":search_query <<-> {_POSTGRES_DOCUMENT}").bindparams(search_query=" ".join(tokens))
+        ).limit(limit).all()
+
+    conditions = [Property.user_id == user_id]
+    for token in tokens:
+        pattern = f"%{token}%"
+        conditions.append(
+            Property.street_name.ilike(pattern)
+            | Property.postcode.ilike(pattern)
+            | Property.house_number.ilike(pattern)
+        )
+    return db.query(Property).filter(*conditions).limit(limit).all()
+
+
+def _in_order(db: Session, user_id: int, ids: List[int]) -> List[Property]:
+    if not ids:
+        return []
+    by_id = {
+        p.id: p
+        for p in db.query(Property).filter(Property.user_id == user_id, Property.id.in_(ids))
+    }
+    return [by_id[i] for i in ids if i in by_id]
@@ -50,6 +50,12 @@ source venv/bin/activate
 echo "📥 Installing Python dependencies..."
 pip install -r requirements.txt
 
+# Compile the postcode index so workers can mmap it instead of parsing the CSV
+if [ -f "../postcode_to_datazone.csv" ]; then
+    echo "🗺️  Compiling postcode index..."
+    python -m services.postcode_service build ../postcode_to_datazone.csv
+fi
+
 echo "✅ Backend setup complete!"
 
 # Setup Frontend
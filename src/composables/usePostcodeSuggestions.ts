@@ -0,0 +1,32 @@
+import { ref, watch } from "vue";
+import { postcodeService } from "@/services/api";
+import type { PostcodeSuggestion } from "@/types";
+
+// Debounced type-ahead for postcode inputs, backed by /postcodes/autocomplete
+export function usePostcodeSuggestions(query: () => string, delay = 150) {
+  const suggestions = ref<PostcodeSuggestion[]>([]);
+  let timer: ReturnType<typeof setTimeout> | undefined;
+  let latestRequest = 0;
+
+  watch(query, (value) => {
+    clearTimeout(timer);
+    if (!value || value.trim().length < 2) {
+      suggestions.value = [];
+      return;
+    }
+    timer = setTimeout(async () => {
+      const requestId = ++latestRequest;
+      try {
+        const data = await postcodeService.autocomplete(value);
+        // Ignore responses that arrive after a newer keystroke
+        if (requestId === latestRequest) {
+          suggestions.value = data.suggestions;
+        }
+      } catch (error) {
+        suggestions.value = [];
+      }
+    }, delay);
+  });
+
+  return { suggestions };
+}
@@ -38,11 +38,39 @@ api.interceptors.response.use(
   },
 );
 
+// Last ETag and payload per analysis URL; the backend answers 304 until the
+// portfolio changes
+const analysisCache = new Map<string, { etag: string; data: any }>();
+
+const getAnalysisReport = async (url: string, params?: Record<string, any>) => {
+  const key = `${url}?${JSON.stringify(params ?? {})}`;
+  const cached = analysisCache.get(key);
+  const response = await api.get(url, {
+    params,
+    paramsSerializer: { indexes: null },
+    headers: cached ? { "If-None-Match": cached.etag } : {},
+    validateStatus: (status) => status === 200 || status === 304,
+  });
+  if (response.status === 304 && cached) {
+    return cached.data;
+  }
+  if (response.headers.etag) {
+    analysisCache.set(key, { etag: response.headers.etag, data: response.data });
+  }
+  return response.data;
+};
+
 export const propertyService = {
   getAll: async () => {
     const response = await api.get("/properties");
     return response.data;
   },
+  getPage: async (limit = 50, cursor?: string) => {
+    const response = await api.get("/properties/page", {
+      params: { limit, cursor },
+    });
+    return response.data;
+  },
   getById: async (id: number) => {
     const response = await api.get(`/properties/${id}`);
     return response.data;
@@ -59,10 +87,47 @@ export const propertyService = {
     const response = await api.delete(`/properties/${id}`);
     return response.data;
   },
-  getAnalysis: async () => {
-    const response = await api.post("/properties/analyze");
+  getAnalysis: async () => getAnalysisReport("/properties/analysis"),
+  // Most similar properties; scope "book" also searches other portfolios (anonymised)
+  getComparables: async (id: number, k = 20, scope: "portfolio" | "book" = "portfolio") => {
+    const response = await api.get(`/properties/${id}/comparables`, {
+      params: { k, scope },
+    });
     return response.data;
-  }
+  },
+};
+
+export const analysisService = {
+  // Market and optimization (and a comparison when ids are given) from one portfolio load
+  getReports: async (location?: string, ids?: number[]) =>
+    getAnalysisReport("/analysis/reports", { location, ids }),
+  getMarket: async (location?: string) => getAnalysisReport("/analysis/market", { location }),
+  getOptimization: async () => getAnalysisReport("/analysis/optimization"),
+  getComparison: async (ids: number[]) => getAnalysisReport("/analysis/comparison", { ids }),
+};
+
+export const postcodeService = {
+  autocomplete: async (query: string, limit = 10) => {
+    const response = await api.get("/postcodes/autocomplete", {
+      params: { q: query, limit },
+    });
+    return response.data;
+  },
+};
+
+export const datazoneService = {
+  getStatsStatus: async () => {
+    const response = await api.get("/datazones/stats");
+    return response.data;
+  },
+  rebuildStats: async () => {
+    const response = await api.post("/datazones/stats/rebuild");
+    return response.data;
+  },
+  getStats: async (datazone: string) => {
+    const response = await api.get(`/datazones/${encodeURIComponent(datazone)}/stats`);
+    return response.data;
+  },
 };
 
 export default api;
@@ -55,6 +55,11 @@ export interface PropertyAnalysis {
   risk_assessment: string;
 }
 
+export interface PostcodeSuggestion {
+  postcode: string;
+  datazone?: string;
+}
+
 export interface APIResponse<T> {
   data: T;
   message?: string;